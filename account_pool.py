@@ -0,0 +1,303 @@
+"""
+Пул аккаунтов Lolz Market: несколько файлов cookies, у каждого свой клиент
+LolzPayment с собственной сессией, кэшем токенов и состоянием здоровья.
+"""
+
+import glob
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Union
+
+from idempotency import IdempotencyStore
+from lolz_payment import LolzPayment
+from models import PaymentInfo, PaymentResponse
+
+# Стратегии выбора аккаунта для нового платежа
+LEAST_IN_FLIGHT = "least_in_flight"
+WEIGHTED_ROUND_ROBIN = "weighted_round_robin"
+
+
+@dataclass
+class AccountState:
+    name: str
+    client: LolzPayment
+    weight: float = 1.0
+    in_flight: int = 0
+    # Текущий вес плавного взвешенного round-robin
+    current_weight: float = 0.0
+    disabled_until: float = 0.0
+    last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.disabled_until <= time.monotonic()
+
+
+class AccountPool:
+    """
+    Распределение платежей между несколькими аккаунтами.
+
+    Новые платежи отправляются аккаунту с наименьшим числом запросов в работе
+    или по взвешенному round-robin. Аккаунт выводится из ротации на время
+    cooldown, если сайт показывает форму входа или подряд возвращает ошибки.
+    Проверка платежа направляется аккаунту, который его создал.
+    """
+
+    def __init__(
+        self,
+        cookies: Union[str, Iterable[str]],
+        strategy: str = LEAST_IN_FLIGHT,
+        weights: Optional[Dict[str, float]] = None,
+        cooldown: float = 300.0,
+        max_errors: int = 3,
+        max_owners: int = 10000,
+        logger: Optional[logging.Logger] = None,
+        **client_kwargs,
+    ) -> None:
+        """
+        Args:
+            cookies: Каталог с файлами cookies (*.json), glob-шаблон или список путей
+            strategy: LEAST_IN_FLIGHT или WEIGHTED_ROUND_ROBIN
+            weights: Веса аккаунтов по имени (имя - файл cookies без .json)
+            cooldown: На сколько секунд аккаунт выводится из ротации при сбое
+            max_errors: Сколько ошибок подряд допускается до вывода из ротации
+            max_owners: Сколько последних платежей помнят свой аккаунт в памяти
+                (владельцев более старых платежей находит ledger, если он задан)
+            logger: Опциональный логгер
+            **client_kwargs: Параметры, передаваемые каждому LolzPayment
+                (хранилище ключей идемпотентности у аккаунтов общее)
+        """
+        if strategy not in (LEAST_IN_FLIGHT, WEIGHTED_ROUND_ROBIN):
+            raise ValueError(f"Неизвестная стратегия выбора аккаунта: {strategy}")
+
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.max_errors = max_errors
+        self.logger = logger or logging.getLogger("LolzPayment")
+        weights = weights or {}
+        # Повтор с тем же ключом может попасть на другой аккаунт
+        client_kwargs.setdefault("idempotency_store", IdempotencyStore())
+        self.idempotency_store = client_kwargs["idempotency_store"]
+
+        self.accounts: Dict[str, AccountState] = {}
+        for path in self._resolve_paths(cookies):
+            name = os.path.splitext(os.path.basename(path))[0]
+            client = LolzPayment(path, logger=self.logger, **client_kwargs)
+            self.accounts[name] = AccountState(name, client, weights.get(name, 1.0))
+
+        if not self.accounts:
+            raise ValueError(f"Не найдено ни одного файла cookies: {cookies}")
+
+        # ID платежа -> имя аккаунта, создавшего платеж (последние max_owners)
+        self.max_owners = max_owners
+        self._owners: "OrderedDict[str, str]" = OrderedDict()
+        # Общий журнал платежей клиентов: владельцы платежей после перезапуска
+        self.ledger = client_kwargs.get("ledger")
+        self._lock = threading.Lock()
+        self._rr_offset = 0
+
+    @staticmethod
+    def _resolve_paths(cookies: Union[str, Iterable[str]]) -> List[str]:
+        if isinstance(cookies, str):
+            if os.path.isdir(cookies):
+                return sorted(glob.glob(os.path.join(cookies, "*.json")))
+            return sorted(glob.glob(cookies))
+        return list(cookies)
+
+    def __enter__(self) -> "AccountPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Закрытие соединений всех аккаунтов"""
+        for account in self.accounts.values():
+            account.client.close()
+
+    def healthy_accounts(self) -> List[AccountState]:
+        return [account for account in self.accounts.values() if account.healthy]
+
+    def _acquire(self) -> Optional[AccountState]:
+        """Выбор аккаунта для нового платежа"""
+        with self._lock:
+            candidates = self.healthy_accounts()
+            if not candidates:
+                return None
+
+            for account in candidates:
+                if account.disabled_until:
+                    # Пауза закончилась: аккаунт проверяется заново
+                    account.disabled_until = 0.0
+                    account.client.authorized = None
+                    account.client.consecutive_errors = 0
+
+            if self.strategy == WEIGHTED_ROUND_ROBIN:
+                # Плавный взвешенный round-robin (как в nginx)
+                total = sum(account.weight for account in candidates)
+                for account in candidates:
+                    account.current_weight += account.weight
+                chosen = max(candidates, key=lambda account: account.current_weight)
+                chosen.current_weight -= total
+            else:
+                # Сдвиг начала списка, чтобы при равной загрузке аккаунты чередовались
+                self._rr_offset = (self._rr_offset + 1) % len(candidates)
+                rotated = candidates[self._rr_offset :] + candidates[: self._rr_offset]
+                chosen = min(
+                    rotated, key=lambda account: account.in_flight / account.weight
+                )
+
+            chosen.in_flight += 1
+            return chosen
+
+    def _release(self, account: AccountState, error: Optional[str] = None) -> None:
+        """Возврат аккаунта после запроса (с выводом из ротации при сбоях)"""
+        with self._lock:
+            account.in_flight -= 1
+            account.last_error = error
+            client = account.client
+            if account.healthy and (
+                client.authorized is False
+                or client.consecutive_errors >= self.max_errors
+            ):
+                account.disabled_until = time.monotonic() + self.cooldown
+                self.logger.warning(
+                    f"Аккаунт {account.name} выведен из ротации на {self.cooldown} с: {error}"
+                )
+
+    def create_payment(
+        self,
+        amount: float,
+        payment_method: str,
+        phone: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> PaymentResponse:
+        """
+        Создание платежа через один из здоровых аккаунтов.
+
+        На другом аккаунте платеж повторяется, только если форма платежа
+        не отправлялась (не удалось получить токены, форма входа). После
+        отправки (таймаут, ошибка 5xx) счет мог быть создан, и повтор
+        на другом аккаунте создал бы второй счет.
+
+        Args:
+            amount: Сумма платежа
+            payment_method: Метод оплаты ('card', 'sbp', 'binance', 'steam')
+            phone: Номер телефона (обязателен для СБП)
+            idempotency_key: Ключ идемпотентности (см. LolzPayment.create_payment)
+        """
+        owner = self._in_doubt_owner(idempotency_key)
+        if owner is not None:
+            # Счет с потерянным ответом ищется в списке аккаунта, отправившего форму
+            return owner.client.create_payment(
+                amount, payment_method, phone, idempotency_key=idempotency_key
+            )
+
+        tried = 0
+        response = PaymentResponse(error="Нет доступных аккаунтов для создания платежа")
+        while tried < len(self.accounts):
+            account = self._acquire()
+            if account is None:
+                break
+            tried += 1
+
+            response = account.client.create_payment(
+                amount, payment_method, phone, idempotency_key=idempotency_key
+            )
+            self._release(account, response.error)
+
+            if response.payment_id:
+                self._remember_owner(response.payment_id, account.name)
+                return response
+            if not response.retryable:
+                # Ошибка проверки параметров или ответ на отправленную форму
+                return response
+
+        if tried == 0:
+            self.logger.error(response.error)
+        return response
+
+    def _in_doubt_owner(self, idempotency_key: Optional[str]) -> Optional[AccountState]:
+        """Аккаунт, ответ на форму которого по этому ключу был потерян"""
+        if not idempotency_key:
+            return None
+        record = self.idempotency_store.get(idempotency_key)
+        if record is None or record.completed:
+            return None
+        for account in self.accounts.values():
+            if account.client.cookies_path == record.owner:
+                return account
+        return None
+
+    def _remember_owner(self, payment_id: str, name: str) -> None:
+        with self._lock:
+            self._owners[payment_id] = name
+            self._owners.move_to_end(payment_id)
+            while len(self._owners) > self.max_owners:
+                self._owners.popitem(last=False)
+
+    def owner_of(self, payment_id: str) -> Optional[str]:
+        """Имя аккаунта, создавшего платеж (если он создан через этот пул)"""
+        with self._lock:
+            owner = self._owners.get(payment_id)
+            if owner is not None:
+                self._owners.move_to_end(payment_id)
+        if owner is None and self.ledger:
+            entry = self.ledger.get(payment_id)
+            if entry and entry.account in self.accounts:
+                owner = entry.account
+        return owner
+
+    def check_payment(self, payment_id: str) -> Optional[PaymentInfo]:
+        """Проверка статуса платежа на аккаунте, который его создал"""
+        return self.check_payments([payment_id])[payment_id]
+
+    def check_payments(
+        self, payment_ids: Iterable[str]
+    ) -> Dict[str, Optional[PaymentInfo]]:
+        """
+        Проверка нескольких платежей: ID группируются по аккаунтам-владельцам.
+        Платежи с неизвестным владельцем ищутся по очереди на всех аккаунтах.
+        """
+        results: Dict[str, Optional[PaymentInfo]] = dict.fromkeys(payment_ids)
+        by_account: Dict[str, List[str]] = {}
+        unknown: List[str] = []
+        for payment_id in results:
+            owner = self.owner_of(payment_id)
+            if owner:
+                by_account.setdefault(owner, []).append(payment_id)
+            else:
+                unknown.append(payment_id)
+
+        for name, ids in by_account.items():
+            results.update(self.accounts[name].client.check_payments(ids))
+
+        for account in self.accounts.values():
+            if not unknown:
+                break
+            found = account.client.check_payments(unknown)
+            for payment_id, payment_info in found.items():
+                if payment_info:
+                    results[payment_id] = payment_info
+                    self._remember_owner(payment_id, account.name)
+            unknown = [payment_id for payment_id in unknown if not results[payment_id]]
+
+        return results
+
+    def stats(self) -> List[Dict[str, object]]:
+        """Состояние аккаунтов пула"""
+        with self._lock:
+            return [
+                {
+                    "name": account.name,
+                    "weight": account.weight,
+                    "in_flight": account.in_flight,
+                    "healthy": account.healthy,
+                    "last_error": account.last_error,
+                }
+                for account in self.accounts.values()
+            ]
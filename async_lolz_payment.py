@@ -0,0 +1,692 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from batch import AsyncPaymentBatch, BatchItem
+from cookie_store import CookieStore
+from idempotency import IdempotencyRecord, IdempotencyStore
+from ledger import PaymentLedger
+from lolz_payment import BaseLolzPayment
+from metrics import Metrics, timed
+from models import PaymentRequest, PaymentResponse, PaymentInfo
+from parsing import is_token_error, payment_row_scanner
+from payment_events import EventDispatcher
+from payment_sync import PaymentDiff
+from rate_limiter import BUDGET_DEPOSIT, BUDGET_LIST, BUDGET_METHOD, RateLimiter
+from retry import RetryPolicy
+from token_cache import TokenCache
+
+
+class AsyncLolzPayment(BaseLolzPayment):
+    """
+    Асинхронный клиент для работы с платежами Lolz Market на asyncio.
+    Возвращает те же модели, что и LolzPayment, и использует общий разбор ответов.
+    """
+
+    def __init__(
+        self,
+        cookies_path: str,
+        logger: Optional[logging.Logger] = None,
+        base_url: str = "https://lzt.market",
+        max_concurrency: int = 100,
+        limit: int = 100,
+        limit_per_host: int = 32,
+        keepalive_timeout: float = 30.0,
+        timeout: float = 30.0,
+        token_ttl: float = 300.0,
+        token_cache: Optional[TokenCache] = None,
+        parser_backend: Optional[str] = None,
+        stream_list: bool = False,
+        stream_chunk_size: int = 16384,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        idempotency_store: Optional[IdempotencyStore] = None,
+        ledger: Optional[PaymentLedger] = None,
+        metrics: Optional[Metrics] = None,
+        events: Optional[EventDispatcher] = None,
+        cookie_store: Optional[CookieStore] = None,
+    ) -> None:
+        """
+        Инициализация асинхронного клиента.
+
+        Args:
+            cookies_path: Путь к файлу с cookies в формате JSON
+            logger: Опциональный логгер для записи сообщений
+            base_url: Адрес сайта (можно заменить на локальный сервер для тестов)
+            max_concurrency: Максимум одновременно выполняемых запросов
+            limit: Максимум соединений в пуле
+            limit_per_host: Максимум соединений к одному хосту
+            keepalive_timeout: Время жизни простаивающего соединения в секундах
+            timeout: Общий таймаут запроса в секундах
+            token_ttl: Время жизни закэшированных токенов в секундах
+            token_cache: Общий кэш токенов (например, для нескольких клиентов)
+            parser_backend: Бэкенд разбора HTML ("lxml", "html.parser" или None)
+            stream_list: Читать /payment/list потоком при проверке одного платежа
+            stream_chunk_size: Размер куска при потоковом чтении в байтах
+            rate_limiter: Лимиты частоты и параллельности запросов
+                (по умолчанию RateLimiter() с настройками по умолчанию)
+            retry_policy: Политика повторов GET-запросов (NO_RETRY - без повторов)
+            idempotency_store: Хранилище ключей идемпотентности create_payment
+                (по умолчанию - в памяти процесса)
+            ledger: Журнал платежей: созданные платежи и их статусы сохраняются,
+                а оплаченные проверяются без запроса к сайту
+            metrics: Метрики и трассировка этапов (по умолчанию отключены)
+            events: Диспетчер событий: для платежей, оплата которых обнаружена
+                при проверке или синхронизации, создаются события payment.completed
+            cookie_store: Источник cookies; запущенный (CookieStore.start)
+                перечитывает файл при изменении, и клиент переключается на новые
+                cookies без перезапуска (по умолчанию файл читается один раз)
+        """
+        super().__init__(
+            cookies_path,
+            logger=logger,
+            base_url=base_url,
+            token_ttl=token_ttl,
+            token_cache=token_cache,
+            parser_backend=parser_backend,
+            stream_list=stream_list,
+            stream_chunk_size=stream_chunk_size,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            idempotency_store=idempotency_store,
+            ledger=ledger,
+            metrics=metrics,
+            events=events,
+            cookie_store=cookie_store,
+        )
+        self.max_concurrency = max_concurrency
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Цикл событий сессии: в нем получаются токены при смене cookies
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Ключ идемпотентности -> [блокировка, число ожидающих корутин]
+        self._key_locks: Dict[str, list] = {}
+        self._sync_lock: Optional[asyncio.Lock] = None
+        # Cookies сменились: cookies сессии, выставленные сайтом, сбрасываются
+        # перед следующим запросом (внутри цикла событий)
+        self._cookies_rotated = False
+
+    async def __aenter__(self) -> "AsyncLolzPayment":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Закрытие сессии и всех соединений пула"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _warm_up_cookies(self, cookies: Dict[str, str]) -> None:
+        """
+        Токены для новых cookies до переключения на них. Загрузка выполняется
+        в цикле событий клиента; поток CookieStore ждет ее, как и у
+        синхронного клиента, а в самом цикле она только запускается.
+        """
+        loop = self._loop
+        key = self.token_cache.cookie_key(cookies)
+        if loop is None or not loop.is_running() or self.token_cache.peek(key):
+            return
+        warm_up = self.token_cache.aget(key, lambda: self._get_tokens(cookies))
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(warm_up)
+            return
+
+        future = asyncio.run_coroutine_threadsafe(warm_up, loop)
+        try:
+            tokens = future.result(self.timeout.total)
+        except Exception as e:
+            future.cancel()
+            tokens = None
+            self.logger.warning(f"Ошибка получения токенов для новых cookies: {e}")
+        if tokens:
+            self.logger.info("Токены для новых cookies получены")
+        else:
+            self.logger.warning(
+                "Не удалось получить токены для новых cookies, "
+                "они будут запрошены при первом платеже"
+            )
+
+    def _cookies_swapped(self, old: Dict[str, str], new: Dict[str, str]) -> None:
+        super()._cookies_swapped(old, new)
+        self._cookies_rotated = True
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Сессия создается лениво, внутри работающего цикла событий"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=self.timeout,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = asyncio.get_running_loop()
+        return self._session
+
+    def _session_with_cookies(self) -> Tuple[aiohttp.ClientSession, Dict[str, str]]:
+        """
+        Сессия и cookies для очередного запроса. Cookies передаются с каждым
+        запросом, так как они могут смениться (cookie_store); после смены
+        cookies, выставленные сайтом для прежней сессии, сбрасываются.
+        """
+        session = self._get_session()
+        if self._cookies_rotated:
+            self._cookies_rotated = False
+            session.cookie_jar.clear()
+        return session, self.cookies
+
+    async def _request(
+        self, method: str, url: str, budget: Optional[str] = None, **kwargs
+    ) -> Tuple[int, str]:
+        """Выполнение HTTP-запроса, возвращает статус и тело ответа"""
+        session, cookies = self._session_with_cookies()
+        kwargs.setdefault("cookies", cookies)
+        attempt = 0
+        while True:
+            attempt += 1
+            headers = None
+            async with self._semaphore:
+                await self.rate_limiter.acquire_async(budget)
+                started = time.monotonic()
+                status = None
+                try:
+                    with self.metrics.stage("http_request", budget=budget):
+                        async with session.request(method, url, **kwargs) as response:
+                            status = response.status
+                            headers = response.headers
+                            # Повторяются только идемпотентные GET-запросы
+                            retry = method == "GET" and self.retry_policy.should_retry(
+                                attempt, status
+                            )
+                            if not retry:
+                                body = await response.read()
+                                self.metrics.count(
+                                    "http_bytes", len(body), budget=budget
+                                )
+                                return status, await response.text()
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    if method != "GET" or not self.retry_policy.should_retry(
+                        attempt, None
+                    ):
+                        raise
+                finally:
+                    self.rate_limiter.release(status, time.monotonic() - started)
+                    self._record_status(status, budget)
+
+            delay = self.retry_policy.delay(attempt, headers)
+            self.logger.warning(
+                f"Повтор запроса {url} через {delay:.2f} с (попытка {attempt + 1}, статус {status})"
+            )
+            self.metrics.count("retries", budget=budget)
+            await asyncio.sleep(delay)
+
+    @timed("get_tokens")
+    async def _get_tokens(
+        self, cookies: Optional[Dict[str, str]] = None
+    ) -> Optional[Dict[str, str]]:
+        """
+        Получение токенов xf_token и service_id со страницы депозита.
+
+        Args:
+            cookies: Cookies запроса (по умолчанию - текущие)
+        """
+        try:
+            kwargs = {"cookies": cookies} if cookies is not None else {}
+            status, text = await self._request(
+                "GET", self._deposit_url(), BUDGET_DEPOSIT, **kwargs
+            )
+
+            if status != 200:
+                error_msg = f"Ошибка: Получен статус код {status}"
+                self.logger.error(error_msg)
+                return None
+
+            return self._tokens_from_html(text)
+        except Exception as e:
+            error_msg = f"Ошибка получения токенов: {e}"
+            self.logger.error(error_msg)
+            return None
+
+    async def get_tokens(self) -> Optional[Dict[str, str]]:
+        """Получение токенов с учетом кэша"""
+        return await self.token_cache.aget(self._token_key, self._get_tokens)
+
+    async def warm_up(self) -> bool:
+        """
+        Подготовка клиента к платежам при запуске сервиса: открывает
+        соединение, получает токены (и этим проверяет сессию) и готовит
+        шаблоны форм, чтобы первый платеж не ждал страницу депозита.
+
+        Returns:
+            bool: True, если токены получены
+        """
+        tokens = await self.get_tokens()
+        if not tokens:
+            self.logger.error("Прогрев клиента: не удалось получить токены")
+            return False
+        self._prepare_forms(tokens)
+        self.logger.info("Клиент готов к созданию платежей")
+        return True
+
+    async def create_payment(
+        self,
+        amount: float,
+        payment_method: str,
+        phone: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> PaymentResponse:
+        """
+        Создание нового платежа в системе Lolz Market.
+
+        Args:
+            amount: Сумма платежа
+            payment_method: Метод оплаты ('card', 'sbp', 'binance', 'steam')
+            phone: Номер телефона (обязателен для СБП)
+            idempotency_key: Ключ идемпотентности: повторный вызов с тем же ключом
+                вернет уже созданный платеж вместо создания нового. Если ответ
+                на форму с этим ключом был потерян, форма не отправляется
+                повторно: счет ищется в списке платежей
+
+        Returns:
+            PaymentResponse: Ответ с информацией о платеже или ошибкой
+        """
+        if not idempotency_key:
+            return await self._create_payment(amount, payment_method, phone)
+
+        store = self.idempotency_store
+        fingerprint = store.fingerprint(amount, payment_method, phone)
+        # Блокировка ключа внутри цикла событий; хранилище может быть общим с потоками
+        entry = self._key_locks.setdefault(idempotency_key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                record = store.get(idempotency_key)
+                if record:
+                    existing = self._idempotent_response(record, fingerprint)
+                    if existing:
+                        return existing
+                    return await self._reconcile_payment(
+                        record, amount, payment_method
+                    )
+
+                store.reserve(idempotency_key, fingerprint, self.cookies_path)
+                response = await self._create_payment(amount, payment_method, phone)
+                store.finish(idempotency_key, response)
+                return response
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._key_locks[idempotency_key]
+
+    async def _reconcile_payment(
+        self, record: IdempotencyRecord, amount: float, payment_method: str
+    ) -> PaymentResponse:
+        """Поиск счета с потерянным ответом на первой странице списка платежей"""
+        html = None
+        try:
+            status, text = await self._request("GET", self._list_url(), BUDGET_LIST)
+            if status == 200:
+                html = text
+            else:
+                self.logger.error(f"Ошибка: Получен статус код {status}")
+        except Exception as e:
+            self.logger.error(f"Ошибка загрузки списка платежей: {e}")
+        return self._reconciled_response(record, html, amount, payment_method)
+
+    async def _create_payment(
+        self, amount: float, payment_method: str, phone: Optional[str]
+    ) -> PaymentResponse:
+        """Создание платежа без учета ключа идемпотентности"""
+        try:
+            request = self._prepare_request(amount, payment_method, phone)
+        except Exception as e:
+            error_msg = f"Произошла ошибка: {str(e)}"
+            self.logger.error(error_msg)
+            return PaymentResponse(error=error_msg)
+
+        if isinstance(request, PaymentResponse):
+            return request
+        return await self._submit_payment(request)
+
+    @timed("create_payment")
+    async def _submit_payment(self, request: PaymentRequest) -> PaymentResponse:
+        """Отправка проверенного запроса с получением (или обновлением) токенов"""
+        sent = False
+        try:
+            cache_key = self._token_key
+            self._count_token_cache(cache_key)
+            tokens = await self.get_tokens()
+            if not tokens:
+                return self._tokens_error()
+
+            sent = True
+            status_code, response_json = await self._post_payment(request, tokens)
+
+            if is_token_error(status_code, response_json):
+                self.metrics.count("token_rejected")
+                # Токены устарели: сбрасываем кэш и повторяем запрос один раз
+                self.logger.warning(
+                    "Сервер отклонил токены, получаем новые и повторяем запрос"
+                )
+                self.token_cache.rejected(cache_key, tokens)
+                tokens = await self.get_tokens()
+                if not tokens:
+                    return self._tokens_error()
+                status_code, response_json = await self._post_payment(
+                    request, tokens
+                )
+
+            response = self._payment_response(status_code, response_json)
+            self._ledger_record_created(request, response)
+            return response
+
+        except Exception as e:
+            error_msg = f"Произошла ошибка: {str(e)}"
+            self.logger.error(error_msg)
+            # Таймаут или разрыв соединения после отправки формы
+            return PaymentResponse(error=error_msg, in_doubt=sent)
+
+    async def _post_payment(
+        self, request: PaymentRequest, tokens: Dict[str, str]
+    ) -> Tuple[int, Any]:
+        """Отправка формы создания платежа, возвращает статус и JSON ответа"""
+        url, headers, data = self._build_payment_form(request, tokens)
+        with self.metrics.stage("post_payment"):
+            status, text = await self._request(
+                "POST", url, BUDGET_METHOD, headers=headers, data=data
+            )
+        if status != 200:
+            return status, None
+        with self.metrics.stage("decode_json"):
+            return status, json.loads(text)
+
+    def create_payments(
+        self, requests: Iterable[PaymentRequest], max_workers: int = 8
+    ) -> AsyncPaymentBatch:
+        """
+        Пакетное создание платежей.
+
+        Все запросы проверяются до отправки, токены получаются один раз и
+        используются всеми запросами, а POST-запросы выполняются конкурентно,
+        не больше max_workers одновременно (с учетом rate_limiter).
+
+        Args:
+            requests: Запросы на создание платежей
+            max_workers: Максимум одновременно отправляемых запросов
+
+        Returns:
+            AsyncPaymentBatch: Асинхронный итератор BatchItem в порядке
+                завершения запросов со сводкой в свойстве summary
+
+        Пример:
+            batch = lolz.create_payments(requests)
+            async for item in batch:
+                print(item.index, item.response.to_dict())
+            print(batch.summary.to_dict())
+        """
+        accepted, rejected = self._prepare_batch(requests)
+        total = len(accepted) + len(rejected)
+        return AsyncPaymentBatch(
+            self._run_batch(accepted, rejected, max_workers), total
+        )
+
+    async def _run_batch(
+        self,
+        accepted: List[Tuple[int, PaymentRequest, PaymentRequest]],
+        rejected: List[BatchItem],
+        max_workers: int,
+    ) -> AsyncIterator[BatchItem]:
+        for item in rejected:
+            yield item
+        if not accepted:
+            return
+
+        # Токены получаются до отправки, чтобы задачи не ждали друг друга
+        if not await self.get_tokens():
+            for index, request, _ in accepted:
+                yield BatchItem(index, request, self._tokens_error())
+            return
+
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def submit(
+            index: int, request: PaymentRequest, prepared: PaymentRequest
+        ) -> BatchItem:
+            async with semaphore:
+                started = time.monotonic()
+                response = await self._submit_payment(prepared)
+                return BatchItem(index, request, response, time.monotonic() - started)
+
+        tasks = [
+            asyncio.ensure_future(submit(index, request, prepared))
+            for index, request, prepared in accepted
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # При досрочном выходе из перебора незавершенные запросы отменяются
+            for task in tasks:
+                task.cancel()
+
+    @timed("check_payment")
+    async def check_payment(
+        self, payment_id: str, stream: Optional[bool] = None
+    ) -> Optional[PaymentInfo]:
+        """
+        Проверка статуса платежа в системе Lolz Market.
+
+        Args:
+            payment_id: Идентификатор платежа для проверки
+            stream: Читать страницу потоком и прервать загрузку, как только
+                найдена строка платежа (по умолчанию - настройка stream_list)
+
+        Returns:
+            Optional[PaymentInfo]: Информация о платеже или None в случае ошибки
+        """
+        completed = self._ledger_completed([payment_id])
+        if completed:
+            # Оплаченный платеж уже не изменится: ответ из журнала
+            return completed[payment_id]
+
+        try:
+            if self.stream_list if stream is None else stream:
+                payment_info = await self._check_payment_streamed(payment_id)
+            else:
+                status, text = await self._request(
+                    "GET", self._list_url(), BUDGET_LIST
+                )
+
+                if status != 200:
+                    error_msg = f"Ошибка: Получен статус код {status}"
+                    self.logger.error(error_msg)
+                    return None
+
+                payment_info = self._payment_info_from_html(text, payment_id)
+
+        except Exception as e:
+            error_msg = f"Ошибка получения информации о платеже: {e}"
+            self.logger.error(error_msg)
+            return None
+
+        self._ledger_update([payment_info])
+        return payment_info
+
+    async def _check_payment_streamed(self, payment_id: str) -> Optional[PaymentInfo]:
+        """
+        Потоковый поиск платежа: страница читается кусками, и соединение
+        закрывается сразу после того, как строка платежа прочитана целиком.
+        """
+        session, cookies = self._session_with_cookies()
+        async with self._semaphore:
+            await self.rate_limiter.acquire_async(BUDGET_LIST)
+            started = time.monotonic()
+            status = None
+            try:
+                response = await session.get(self._list_url(), cookies=cookies)
+                status = response.status
+            finally:
+                self.rate_limiter.release(status, time.monotonic() - started)
+                self._record_status(status, BUDGET_LIST)
+
+            async with response:
+                if response.status != 200:
+                    error_msg = f"Ошибка: Получен статус код {response.status}"
+                    self.logger.error(error_msg)
+                    return None
+
+                decoder = self._stream_decoder(response.charset)
+                scanner = payment_row_scanner(payment_id, self.parser_backend)
+                payment_info = None
+                bytes_read = 0
+                async for chunk in response.content.iter_chunked(
+                    self.stream_chunk_size
+                ):
+                    bytes_read += len(chunk)
+                    payment_info = scanner.feed(decoder.decode(chunk))
+                    if payment_info:
+                        # Недочитанный ответ: закрываем соединение
+                        response.close()
+                        break
+                else:
+                    scanner.feed(decoder.decode(b"", final=True))
+                    payment_info = scanner.close()
+
+        self.logger.debug(f"Прочитано {bytes_read} байт списка платежей")
+        self.metrics.count("http_bytes", bytes_read, budget=BUDGET_LIST)
+        self._log_payment_lookup(payment_id, payment_info)
+        return payment_info
+
+    @timed("check_payments")
+    async def check_payments(
+        self, payment_ids: Iterable[str], max_pages: int = 50
+    ) -> Dict[str, Optional[PaymentInfo]]:
+        """
+        Проверка статуса нескольких платежей за одну загрузку списка.
+
+        Args:
+            payment_ids: Идентификаторы платежей
+            max_pages: Максимум загружаемых страниц списка
+
+        Returns:
+            Dict[str, Optional[PaymentInfo]]: Информация по каждому ID
+                (None, если платеж не найден или произошла ошибка)
+        """
+        results: Dict[str, Optional[PaymentInfo]] = dict.fromkeys(payment_ids)
+        completed = self._ledger_completed(results)
+        results.update(completed)
+        pending = set(results) - set(completed)
+        url: Optional[str] = self._list_url()
+
+        try:
+            for _ in range(max_pages):
+                if not url or not pending:
+                    break
+
+                status, text = await self._request("GET", url, BUDGET_LIST)
+                if status != 200:
+                    error_msg = f"Ошибка: Получен статус код {status}"
+                    self.logger.error(error_msg)
+                    break
+
+                url = self._collect_payments(text, url, pending, results)
+        except Exception as e:
+            error_msg = f"Ошибка получения информации о платежах: {e}"
+            self.logger.error(error_msg)
+
+        self._ledger_update(
+            info for payment_id, info in results.items() if payment_id not in completed
+        )
+        self._log_batch_result(results)
+        return results
+
+    @timed("sync_payments")
+    async def sync_payments(self, max_pages: int = 10) -> PaymentDiff:
+        """
+        Инкрементальная синхронизация списка платежей.
+
+        Страницы читаются потоком, и загрузка прерывается, как только таблица
+        доходит до уже известной и не меняющейся истории. Первая синхронизация
+        возвращает все прочитанные платежи как новые.
+
+        Args:
+            max_pages: Максимум загружаемых страниц списка
+
+        Returns:
+            PaymentDiff: Новые и изменившиеся с прошлой синхронизации платежи
+        """
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+
+        diff = PaymentDiff()
+        url: Optional[str] = self._list_url()
+
+        async with self._sync_lock:
+            try:
+                for _ in range(max_pages):
+                    if not url:
+                        break
+                    url = await self._sync_page(url, diff)
+            except Exception as e:
+                error_msg = f"Ошибка синхронизации списка платежей: {e}"
+                self.logger.error(error_msg)
+
+            self.payment_sync.finish(diff)
+
+        self._log_sync_result(diff)
+        return diff
+
+    async def _sync_page(self, url: str, diff: PaymentDiff) -> Optional[str]:
+        """Потоковое чтение одной страницы, возвращает URL следующей"""
+        session, cookies = self._session_with_cookies()
+        async with self._semaphore:
+            await self.rate_limiter.acquire_async(BUDGET_LIST)
+            started = time.monotonic()
+            status = None
+            try:
+                response = await session.get(url, cookies=cookies)
+                status = response.status
+            finally:
+                self.rate_limiter.release(status, time.monotonic() - started)
+                self._record_status(status, BUDGET_LIST)
+
+            async with response:
+                if response.status != 200:
+                    error_msg = f"Ошибка: Получен статус код {response.status}"
+                    self.logger.error(error_msg)
+                    return None
+
+                decoder = self._stream_decoder(response.charset)
+                page = self.payment_sync.page(url, self.parser_backend, diff)
+                bytes_read = 0
+                async for chunk in response.content.iter_chunked(
+                    self.stream_chunk_size
+                ):
+                    bytes_read += len(chunk)
+                    if page.feed(decoder.decode(chunk)):
+                        # Недочитанный ответ: закрываем соединение
+                        response.close()
+                        break
+                else:
+                    page.feed(decoder.decode(b"", final=True))
+                    page.close()
+                self.metrics.count("http_bytes", bytes_read, budget=BUDGET_LIST)
+                return page.next_url
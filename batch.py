@@ -0,0 +1,113 @@
+"""
+Результаты пакетного создания платежей (create_payments).
+
+Результаты отдаются по мере завершения запросов, а после (или во время)
+перебора доступна сводка: сколько создано, сколько ошибок и с какой скоростью.
+"""
+
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from models import PaymentRequest, PaymentResponse
+
+
+@dataclass
+class BatchItem:
+    index: int  # Позиция запроса во входной последовательности
+    request: PaymentRequest
+    response: PaymentResponse
+    elapsed: float = 0.0  # Время выполнения запроса в секундах
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.response.payment_id)
+
+
+@dataclass
+class BatchSummary:
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    # Текст ошибки -> количество
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def per_second(self) -> float:
+        """Созданных платежей в секунду"""
+        return self.succeeded / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "elapsed": round(self.elapsed, 3),
+            "per_second": round(self.per_second, 3),
+            "errors": dict(self.errors),
+        }
+
+
+class _BatchBase:
+    def __init__(self, total: int) -> None:
+        self._started = time.monotonic()
+        self._finished: Optional[float] = None
+        self._total = total
+        self._succeeded = 0
+        self._errors: Counter = Counter()
+
+    def _record(self, item: BatchItem) -> None:
+        if item.ok:
+            self._succeeded += 1
+        else:
+            self._errors[item.response.error or "Неизвестная ошибка"] += 1
+
+    @property
+    def summary(self) -> BatchSummary:
+        """Сводка по уже полученным результатам"""
+        end = self._finished or time.monotonic()
+        return BatchSummary(
+            total=self._total,
+            succeeded=self._succeeded,
+            failed=sum(self._errors.values()),
+            elapsed=end - self._started,
+            errors=dict(self._errors),
+        )
+
+
+class PaymentBatch(_BatchBase):
+    """Результаты create_payments синхронного клиента в порядке завершения"""
+
+    def __init__(self, items: Iterator[BatchItem], total: int) -> None:
+        super().__init__(total)
+        self._items = items
+
+    def __iter__(self) -> Iterator[BatchItem]:
+        for item in self._items:
+            self._record(item)
+            yield item
+        self._finished = time.monotonic()
+
+    def close(self) -> None:
+        """Отмена еще не начатых запросов при досрочном прекращении перебора"""
+        self._items.close()
+
+
+class AsyncPaymentBatch(_BatchBase):
+    """Результаты create_payments асинхронного клиента в порядке завершения"""
+
+    def __init__(self, items: AsyncIterator[BatchItem], total: int) -> None:
+        super().__init__(total)
+        self._items = items
+
+    async def __aiter__(self) -> AsyncIterator[BatchItem]:
+        async for item in self._items:
+            self._record(item)
+            yield item
+        self._finished = time.monotonic()
+
+    async def aclose(self) -> None:
+        """Отмена незавершенных запросов при досрочном прекращении перебора"""
+        await self._items.aclose()
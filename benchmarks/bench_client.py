@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+"""
+Нагрузочный бенчмарк клиентов на локальном фейковом сервере (benchmarks/fake_server.py).
+
+Для каждого сценария и уровня параллельности измеряется пропускная способность
+(операций в секунду), задержка одной операции (p50/p99/max), доля ошибок и
+прирост RSS процесса. Сценарии:
+    create_payment - LolzPayment.create_payment из пула потоков
+    check_payment - LolzPayment.check_payment из пула потоков
+    create_payments - пакетный LolzPayment.create_payments
+    async_create_payment - AsyncLolzPayment.create_payment через asyncio.gather
+    async_check_payment - AsyncLolzPayment.check_payment через asyncio.gather
+    async_create_payments - пакетный AsyncLolzPayment.create_payments
+
+Лимиты частоты запросов в клиентах отключены, чтобы измерялся сам клиент,
+а не RateLimiter. Сервер запускается в том же процессе, поэтому результаты
+сравнимы между собой только на одной машине.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_client.py --concurrency 1 8 32 --json client.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_parsers import current_rss_kb  # noqa: E402
+from fake_server import FakeServer  # noqa: E402
+from lolz_payment import LolzPayment  # noqa: E402
+from models import PaymentMethod, PaymentRequest  # noqa: E402
+from rate_limiter import AdaptiveConcurrency, RateLimiter  # noqa: E402
+
+# Логгер клиентов: сообщения о каждом платеже искажали бы замер
+QUIET_LOGGER = logging.getLogger("bench_client")
+QUIET_LOGGER.addHandler(logging.StreamHandler())
+QUIET_LOGGER.setLevel(logging.WARNING)
+
+SCENARIOS = (
+    "create_payment",
+    "check_payment",
+    "create_payments",
+    "async_create_payment",
+    "async_check_payment",
+    "async_create_payments",
+)
+
+
+def unlimited_rate_limiter(concurrency: int) -> RateLimiter:
+    """RateLimiter без ведер токенов с фиксированным лимитом параллельности"""
+    return RateLimiter(
+        budgets={},
+        concurrency=AdaptiveConcurrency(
+            initial=concurrency, minimum=concurrency, maximum=concurrency
+        ),
+    )
+
+
+def percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[position]
+
+
+class RssSampler:
+    """Пиковый прирост RSS за время замера (выборки в фоновом потоке)"""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.baseline = current_rss_kb()
+        self.peak = self.baseline
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._done.is_set():
+            self.peak = max(self.peak, current_rss_kb())
+            time.sleep(self.interval)
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_kb())
+
+    @property
+    def growth_kb(self) -> int:
+        return self.peak - self.baseline
+
+
+def summarize(
+    scenario: str,
+    concurrency: int,
+    latencies: List[float],
+    errors: int,
+    elapsed: float,
+    rss: RssSampler,
+) -> dict:
+    operations = len(latencies)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "operations": operations,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "ops_per_s": round(operations / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 3),
+        "rss_growth_kb": rss.growth_kb,
+    }
+
+
+def recent_payment_ids(server: FakeServer, count: int) -> List[str]:
+    """ID платежей с первой страницы списка (меняются по мере создания новых)"""
+    with server.state.lock:
+        return [str(row[0]) for row in server.state.payments[:count]]
+
+
+def payment_requests(count: int) -> List[PaymentRequest]:
+    return [
+        PaymentRequest(100 + index % 10, PaymentMethod.CARD) for index in range(count)
+    ]
+
+
+def run_threaded(
+    operation: Callable[[int], bool], operations: int, concurrency: int
+) -> tuple:
+    """Выполнение operation(i) в пуле потоков; возвращает (задержки, ошибки, время)"""
+    latencies: List[float] = []
+    errors = 0
+
+    def timed_call(index: int) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        ok = operation(index)
+        latencies.append(time.perf_counter() - started)
+        if not ok:
+            errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed_call, range(operations)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_gathered(operation, operations: int, concurrency: int) -> tuple:
+    """Выполнение корутин operation(i) не больше concurrency одновременно"""
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed_call(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            ok = await operation(index)
+            latencies.append(time.perf_counter() - started)
+        if not ok:
+            errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed_call(index) for index in range(operations)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def sync_client(cookies_path: str, url: str, concurrency: int) -> LolzPayment:
+    return LolzPayment(
+        cookies_path,
+        logger=QUIET_LOGGER,
+        base_url=url,
+        pool_maxsize=max(concurrency, 10),
+        rate_limiter=unlimited_rate_limiter(concurrency),
+    )
+
+
+def async_client(cookies_path: str, url: str, concurrency: int):
+    from async_lolz_payment import AsyncLolzPayment
+
+    return AsyncLolzPayment(
+        cookies_path,
+        logger=QUIET_LOGGER,
+        base_url=url,
+        max_concurrency=concurrency,
+        limit_per_host=concurrency,
+        rate_limiter=unlimited_rate_limiter(concurrency),
+    )
+
+
+def bench_sync(
+    scenario: str,
+    cookies_path: str,
+    server: FakeServer,
+    operations: int,
+    concurrency: int,
+    page_size: int,
+) -> dict:
+    client = sync_client(cookies_path, server.url, concurrency)
+    try:
+        # Прогрев: соединение и токены в кэше
+        client.create_payment(100, PaymentMethod.CARD)
+        payment_ids = recent_payment_ids(server, page_size)
+        with RssSampler() as rss:
+            if scenario == "create_payment":
+                latencies, errors, elapsed = run_threaded(
+                    lambda index: bool(
+                        client.create_payment(100, PaymentMethod.CARD).payment_id
+                    ),
+                    operations,
+                    concurrency,
+                )
+            elif scenario == "check_payment":
+                latencies, errors, elapsed = run_threaded(
+                    lambda index: client.check_payment(
+                        payment_ids[index % len(payment_ids)]
+                    )
+                    is not None,
+                    operations,
+                    concurrency,
+                )
+            else:
+                started = time.perf_counter()
+                batch = client.create_payments(
+                    payment_requests(operations), max_workers=concurrency
+                )
+                items = list(batch)
+                elapsed = time.perf_counter() - started
+                latencies = [item.elapsed for item in items]
+                errors = sum(1 for item in items if not item.ok)
+    finally:
+        client.close()
+    return summarize(scenario, concurrency, latencies, errors, elapsed, rss)
+
+
+async def bench_async(
+    scenario: str,
+    cookies_path: str,
+    server: FakeServer,
+    operations: int,
+    concurrency: int,
+    page_size: int,
+) -> dict:
+    async with async_client(cookies_path, server.url, concurrency) as client:
+        await client.create_payment(100, PaymentMethod.CARD)
+        payment_ids = recent_payment_ids(server, page_size)
+
+        async def create(index: int) -> bool:
+            response = await client.create_payment(100, PaymentMethod.CARD)
+            return bool(response.payment_id)
+
+        async def check(index: int) -> bool:
+            info = await client.check_payment(payment_ids[index % len(payment_ids)])
+            return info is not None
+
+        with RssSampler() as rss:
+            if scenario == "async_create_payment":
+                latencies, errors, elapsed = await run_gathered(
+                    create, operations, concurrency
+                )
+            elif scenario == "async_check_payment":
+                latencies, errors, elapsed = await run_gathered(
+                    check, operations, concurrency
+                )
+            else:
+                started = time.perf_counter()
+                batch = client.create_payments(
+                    payment_requests(operations), max_workers=concurrency
+                )
+                items = [item async for item in batch]
+                elapsed = time.perf_counter() - started
+                latencies = [item.elapsed for item in items]
+                errors = sum(1 for item in items if not item.ok)
+    return summarize(scenario, concurrency, latencies, errors, elapsed, rss)
+
+
+def environment() -> Dict[str, Optional[str]]:
+    """Сведения для сравнения результатов разных запусков"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    server_options = {
+        "rows": args.rows,
+        "page_size": args.page_size,
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+    }
+    results = []
+    with FakeServer(**server_options) as server, tempfile.TemporaryDirectory() as tmp:
+        cookies_path = os.path.join(tmp, "cookies.json")
+        with open(cookies_path, "w", encoding="utf-8") as file:
+            json.dump([{"name": "xf_user", "value": "bench"}], file)
+
+        for scenario in args.scenarios:
+            if scenario.startswith("async_"):
+                try:
+                    import aiohttp  # noqa: F401
+                except ImportError:
+                    print(f"Пропуск {scenario}: не установлен aiohttp", file=sys.stderr)
+                    continue
+            for concurrency in args.concurrency:
+                if scenario.startswith("async_"):
+                    result = asyncio.run(
+                        bench_async(
+                            scenario,
+                            cookies_path,
+                            server,
+                            args.operations,
+                            concurrency,
+                            args.page_size,
+                        )
+                    )
+                else:
+                    result = bench_sync(
+                        scenario,
+                        cookies_path,
+                        server,
+                        args.operations,
+                        concurrency,
+                        args.page_size,
+                    )
+                results.append(result)
+                print(
+                    f"{result['scenario']:<22} {result['concurrency']:>5} "
+                    f"{result['ops_per_s']:>10} {result['p50_ms']:>9} "
+                    f"{result['p99_ms']:>9} {result['errors']:>7} "
+                    f"{result['rss_growth_kb']:>9}"
+                )
+        requests_served = server.state.requests
+    return {
+        "environment": environment(),
+        "server": {**server_options, "requests_served": requests_served},
+        "operations": args.operations,
+        "results": results,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк клиентов")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32], help="Уровни параллельности")
+    parser.add_argument("--operations", type=int, default=200, help="Операций на замер")
+    parser.add_argument("--rows", type=int, default=1000, help="Платежей на фейковом сервере")
+    parser.add_argument("--page-size", type=int, default=100, help="Строк на странице списка")
+    parser.add_argument("--latency", type=float, default=0.005, help="Задержка ответа сервера, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 503")
+    parser.add_argument("--json", type=str, help="Файл для сохранения результатов")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<22} {'conc':>5} {'ops/s':>10} {'p50, ms':>9} {'p99, ms':>9} {'errors':>7} {'RSS, KB':>9}")
+    report = run(args)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+Микробенчмарк подготовки запроса создания платежа.
+
+Сравниваются два способа собрать URL, заголовки и тело POST /payment/method:
+    dict - как раньше: копия заголовков, словарь формы из 13 полей и
+        urlencode словаря (его выполнял requests при отправке)
+    template - BaseLolzPayment._build_payment_form: общие заголовки и тело
+        из заранее закодированного шаблона (payment_form.PaymentFormTemplate)
+Для каждого способа выводится время одного вызова (медиана по --repeat
+повторам timeit), память на вызов по tracemalloc (блоки и байты результата,
+пик выделенного во время вызова), а также время requests.Request(...).prepare()
+с полученными данными.
+Перед замером проверяется, что оба способа дают одинаковое тело запроса.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_form.py --number 20000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from typing import Callable, Dict, Tuple
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lolz_payment import LolzPayment  # noqa: E402
+from models import PaymentMethod, PaymentRequest  # noqa: E402
+
+TOKENS = {"xf_token": "1760700000,0123456789abcdef", "service_id": "42"}
+
+
+def dict_form(
+    client: LolzPayment, request: PaymentRequest, tokens: Dict[str, str]
+) -> Tuple[str, Dict[str, str], str]:
+    """Прежняя сборка формы (с urlencode, который выполнял requests)"""
+    url = f"{client.base_url}/payment/method"
+    modified_headers = client.headers.copy()
+    modified_headers["Content-Type"] = "application/x-www-form-urlencoded"
+    modified_headers["Accept"] = "application/json, text/javascript, */*; q=0.01"
+    modified_headers["Referer"] = client._deposit_url()
+
+    phone = request.phone
+    data = {
+        "currency": "rub",
+        "amount": str(request.amount),
+        "method": client.method_mapping[request.payment_method.value],
+        "extra[phone]": phone
+        if request.payment_method == PaymentMethod.SBP and phone
+        else "",
+        "service_type": "refill-balance",
+        "service_id": tokens["service_id"],
+        "redirect": f"{client.base_url}/",
+        "_xfConfirm": "1",
+        "_xfToken": tokens["xf_token"],
+        "_xfRequestUri": "/payment/balance/deposit",
+        "_xfNoRedirect": "1",
+        "_xfResponseType": "json",
+    }
+    return url, modified_headers, urlencode(data)
+
+
+def template_form(client: LolzPayment, request: PaymentRequest, tokens: Dict[str, str]):
+    return client._build_payment_form(request, tokens)
+
+
+def allocations(build: Callable[[], object], calls: int = 1000) -> Dict[str, float]:
+    """
+    Память на один вызов: блоков и байт в удерживаемом результате
+    и пик выделенного во время вызова (включая освобожденное до возврата)
+    """
+    build()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        results = [build() for _ in range(calls)]
+        after = tracemalloc.take_snapshot()
+        del results
+
+        peaks = []
+        for _ in range(100):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = build()
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+            del result
+    finally:
+        tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    count = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    size = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+    # Список results добавляет около одного блока и 8 байт на вызов
+    return {
+        "retained_blocks": round(count / calls, 1),
+        "retained_bytes": round(size / calls, 1),
+        "peak_bytes": statistics.median(peaks),
+    }
+
+
+def call_us(build: Callable[[], object], number: int, repeat: int) -> float:
+    timings = timeit.repeat(build, number=number, repeat=repeat)
+    return round(statistics.median(timings) / number * 1e6, 3)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Микробенчмарк формы создания платежа")
+    parser.add_argument("--number", type=int, default=20000, help="Вызовов на повтор")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов timeit")
+    parser.add_argument("--json", type=str, help="Файл для сохранения результатов")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as file:
+        json.dump([{"name": "xf_user", "value": "bench"}], file)
+    try:
+        client = LolzPayment(file.name, base_url="http://127.0.0.1:8080")
+    finally:
+        os.unlink(file.name)
+
+    import requests
+
+    requests_cases = {
+        "card": PaymentRequest(150.0, PaymentMethod.CARD),
+        "sbp": PaymentRequest(99.5, PaymentMethod.SBP, "+79001234567"),
+    }
+    for request in requests_cases.values():
+        expected = dict_form(client, request, TOKENS)[2].encode("ascii")
+        if template_form(client, request, TOKENS)[2] != expected:
+            print("Тела запросов различаются", file=sys.stderr)
+            return 1
+
+    builders = {"dict": dict_form, "template": template_form}
+    results = []
+    print(
+        f"{'case':<6} {'builder':<9} {'build, us':>10} {'blocks':>7} "
+        f"{'bytes':>7} {'peak':>7} {'prepare, us':>12}"
+    )
+    for case, request in requests_cases.items():
+        for name, builder in builders.items():
+
+            def build(builder=builder, request=request):
+                return builder(client, request, TOKENS)
+
+            def prepare(build=build):
+                url, headers, body = build()
+                request = requests.Request("POST", url, headers=headers, data=body)
+                return request.prepare()
+
+            result = {
+                "case": case,
+                "builder": name,
+                "build_us": call_us(build, args.number, args.repeat),
+                **allocations(build),
+                "prepare_us": call_us(prepare, args.number // 10, args.repeat),
+            }
+            results.append(result)
+            print(
+                f"{case:<6} {name:<9} {result['build_us']:>10} "
+                f"{result['retained_blocks']:>7} {result['retained_bytes']:>7} "
+                f"{result['peak_bytes']:>7} {result['prepare_us']:>12}"
+            )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"results": results}, file, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
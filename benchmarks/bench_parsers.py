@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Сравнение бэкендов разбора HTML на сохраненных страницах из benchmarks/fixtures.
+
+Для каждого бэкенда измеряется время разбора страницы депозита, поиска одного
+платежа и индексации всей страницы списка, а также пиковая память. Список
+платежей размножается до --rows строк, чтобы приблизить его к большим аккаунтам.
+Память измеряется в отдельном процессе на каждый замер: прирост RSS по
+выборкам из /proc/self/statm (учитывает выделения на C внутри lxml) и пик
+tracemalloc (только объекты Python).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_parsers.py --rows 5000
+"""
+
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import parsing  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+
+PAGE_SIZE_KB = os.sysconf("SC_PAGE_SIZE") // 1024 if hasattr(os, "sysconf") else 4
+
+ROW_PATTERN = re.compile(r"\s*<tr class=\"dataRow\">.*?</tr>", re.S)
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+        return file.read()
+
+
+def payment_list_html(rows: int) -> str:
+    """Страница списка, размноженная до заданного числа строк с уникальными ID"""
+    html = load_fixture("payment_list.html")
+    templates = ROW_PATTERN.findall(html)
+    generated = []
+    for index in range(rows):
+        row = templates[index % len(templates)]
+        generated.append(
+            re.sub(r'(<td class="paymentId">)\d+', rf"\g<1>{90000000 - index}", row)
+        )
+    start = html.index(templates[0])
+    end = html.index(templates[-1]) + len(templates[-1])
+    return html[:start] + "".join(generated) + html[end:]
+
+
+def cases(payment_list: str, rows: int):
+    deposit = load_fixture("deposit.html")
+    # Ищем платеж в конце таблицы: худший случай для поиска
+    last_id = str(90000000 - rows + 1)
+    return {
+        "deposit_tokens": lambda backend: parsing.parse_deposit_page(deposit, backend),
+        "find_payment": lambda backend: parsing.find_payment(
+            payment_list, last_id, backend
+        ),
+        "parse_payment_list": lambda backend: parsing.parse_payment_list(
+            payment_list, "", backend
+        ),
+    }
+
+
+def current_rss_kb() -> int:
+    """Текущий RSS процесса (Linux); на других системах - пиковый RSS"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * PAGE_SIZE_KB
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure_memory(backend: str, case: str, list_path: str, rows: int) -> dict:
+    """Замер памяти в текущем процессе (вызывается в дочернем процессе)"""
+    with open(list_path, encoding="utf-8") as file:
+        func = cases(file.read(), rows)[case]
+    parsing.get_backend(backend)
+
+    baseline_rss = current_rss_kb()
+    peak_rss = baseline_rss
+    done = threading.Event()
+
+    def sample() -> None:
+        nonlocal peak_rss
+        while not done.is_set():
+            peak_rss = max(peak_rss, current_rss_kb())
+            time.sleep(0.0005)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    tracemalloc.start()
+    func(backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    done.set()
+    sampler.join()
+    return {
+        "peak_rss_kb": peak_rss - baseline_rss,
+        "tracemalloc_peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run(rows: int, repeat: int, list_path: str) -> list:
+    payment_list = payment_list_html(rows)
+    # Дочерние процессы читают готовую страницу из файла, чтобы ее генерация
+    # не попадала в пиковый RSS
+    with open(list_path, "w", encoding="utf-8") as file:
+        file.write(payment_list)
+
+    results = []
+    for backend in parsing.BACKENDS:
+        try:
+            parsing.get_backend(backend)
+        except ImportError as e:
+            print(f"Пропуск бэкенда {backend}: {e}", file=sys.stderr)
+            continue
+
+        for case, func in cases(payment_list, rows).items():
+            timings = timeit.repeat(lambda: func(backend), number=1, repeat=repeat)
+            child = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--memory",
+                    backend,
+                    case,
+                    list_path,
+                    str(rows),
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            results.append(
+                {
+                    "backend": backend,
+                    "case": case,
+                    "rows": rows,
+                    "best_ms": round(min(timings) * 1000, 3),
+                    "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+                    **json.loads(child.stdout),
+                }
+            )
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк бэкендов разбора HTML")
+    parser.add_argument("--rows", type=int, default=2000, help="Строк в списке платежей")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов каждого замера")
+    parser.add_argument("--json", type=str, help="Файл для сохранения результатов")
+    parser.add_argument("--memory", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.memory:
+        backend, case, list_path, rows = args.memory
+        print(json.dumps(measure_memory(backend, case, list_path, int(rows))))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = run(args.rows, args.repeat, os.path.join(tmp_dir, "list.html"))
+
+    print(f"{'backend':<12} {'case':<20} {'best, ms':>10} {'mean, ms':>10} {'RSS, KB':>9} {'py, KB':>9}")
+    for item in results:
+        print(
+            f"{item['backend']:<12} {item['case']:<20} {item['best_ms']:>10} "
+            f"{item['mean_ms']:>10} {item['peak_rss_kb']:>9} {item['tracemalloc_peak_kb']:>9}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
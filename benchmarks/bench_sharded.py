@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+"""
+Масштабирование ShardedPoller по числу процессов на фейковом сервере
+(benchmarks/fake_server.py).
+
+Фейковый сервер запускается отдельным процессом, чтобы не делить GIL
+с замеряемым кодом. Каждому из --accounts аккаунтов назначаются свои
+--pending неоплаченных платежей из начала списка, и ShardedPoller опрашивает
+их без паузы между проходами (poll_interval=0) в течение --duration секунд.
+Для каждого числа процессов выводится число проверок платежей в секунду
+и ускорение относительно первого замера.
+Рост близок к линейному, пока процессов не больше, чем ядер, и сервер
+успевает отвечать.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_sharded.py --processes 1 2 4 --json sharded.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_client import environment  # noqa: E402
+from ledger import PaymentLedger  # noqa: E402
+from models import PaymentStatus  # noqa: E402
+from parsing import parse_payment_list  # noqa: E402
+from sharded_poller import ShardedPoller  # noqa: E402
+
+FAKE_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_server.py")
+
+
+def start_server(rows: int, page_size: int, latency: float) -> tuple:
+    """Фейковый сервер в отдельном процессе: (процесс, URL)"""
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-u",
+            FAKE_SERVER,
+            "--port",
+            "0",
+            "--rows",
+            str(rows),
+            "--page-size",
+            str(page_size),
+            "--latency",
+            str(latency),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = process.stdout.readline()
+    return process, line.rsplit(" ", 1)[-1].strip()
+
+
+def unpaid_ids(url: str, count: int) -> List[str]:
+    """Первые count неоплаченных платежей списка"""
+    ids: List[str] = []
+    page_url = f"{url}/payment/list"
+    while page_url and len(ids) < count:
+        with urllib.request.urlopen(page_url) as response:
+            page = parse_payment_list(response.read().decode("utf-8"), page_url)
+        ids += [
+            payment_id
+            for payment_id, info in page.payments.items()
+            if info.status == PaymentStatus.PENDING
+        ]
+        page_url = page.next_url
+    return ids[:count]
+
+
+def bench(
+    processes: int,
+    cookies: List[str],
+    assignments: Dict[str, List[str]],
+    url: str,
+    duration: float,
+    parser_backend: str,
+    tmp: str,
+) -> dict:
+    ledger_path = os.path.join(tmp, f"ledger-{processes}.db")
+    with PaymentLedger(ledger_path) as ledger:
+        for account, payment_ids in assignments.items():
+            for payment_id in payment_ids:
+                ledger.watch(payment_id, account)
+
+    poller = ShardedPoller(
+        cookies,
+        ledger_path,
+        processes=processes,
+        poll_interval=0.0,
+        rate_budgets={},
+        base_url=url,
+        parser_backend=parser_backend,
+    )
+    with poller:
+        # Запуск процессов и первые проходы не учитываются
+        time.sleep(2.0)
+        before = poller.stats()
+        started = time.perf_counter()
+        time.sleep(duration)
+        after = poller.stats()
+        elapsed = time.perf_counter() - started
+
+    checked = sum(item["checked"] for item in after) - sum(
+        item["checked"] for item in before
+    )
+    rounds = sum(item["rounds"] for item in after) - sum(
+        item["rounds"] for item in before
+    )
+    return {
+        "processes": processes,
+        "checks_per_s": round(checked / elapsed, 1),
+        "rounds_per_s": round(rounds / elapsed, 2),
+        "accounts_per_process": [len(item["accounts"]) for item in after],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк ShardedPoller")
+    parser.add_argument("--processes", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--accounts", type=int, default=16, help="Аккаунтов (файлов cookies)")
+    parser.add_argument("--pending", type=int, default=50, help="Неоплаченных платежей на аккаунт")
+    parser.add_argument("--page-size", type=int, default=100, help="Строк на странице списка")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа сервера, с")
+    parser.add_argument("--duration", type=float, default=5.0, help="Длительность замера, с")
+    parser.add_argument("--parser", type=str, default="html.parser", help="Бэкенд разбора HTML")
+    parser.add_argument("--json", type=str, help="Файл для сохранения результатов")
+    args = parser.parse_args()
+
+    logging.getLogger("LolzPayment").addHandler(logging.NullHandler())
+    # На каждые 3 строки списка приходится 2 неоплаченных платежа
+    rows = args.accounts * args.pending * 3 // 2 + args.page_size
+    server, url = start_server(rows, args.page_size, args.latency)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cookies = []
+            for index in range(args.accounts):
+                path = os.path.join(tmp, f"account{index}.json")
+                with open(path, "w", encoding="utf-8") as file:
+                    json.dump([{"name": "xf_user", "value": f"bench{index}"}], file)
+                cookies.append(path)
+
+            # Платежи аккаунтов чередуются, чтобы каждый проход читал весь список
+            ids = unpaid_ids(url, args.accounts * args.pending)
+            assignments = {
+                f"account{index}": ids[index :: args.accounts]
+                for index in range(args.accounts)
+            }
+
+            print(f"{'processes':>9} {'checks/s':>10} {'speedup':>8} {'accounts':>12}")
+            for processes in args.processes:
+                result = bench(
+                    processes, cookies, assignments, url, args.duration, args.parser, tmp
+                )
+                first = results[0]["checks_per_s"] if results else result["checks_per_s"]
+                result["speedup"] = round(result["checks_per_s"] / first, 2)
+                results.append(result)
+                shares = "/".join(map(str, result["accounts_per_process"]))
+                print(
+                    f"{processes:>9} {result['checks_per_s']:>10} "
+                    f"{result['speedup']:>8} {shares:>12}"
+                )
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        report = {
+            "environment": {**environment(), "cpu_count": os.cpu_count()},
+            "accounts": args.accounts,
+            "pending_per_account": args.pending,
+            "parser": args.parser,
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
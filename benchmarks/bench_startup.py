@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+"""
+Время запуска: импорт модулей клиента и холодный старт lolz_cli.py check.
+
+Каждый замер выполняется в новом процессе интерпретатора, берется медиана:
+    python - запуск пустого интерпретатора (нижняя граница)
+    import:<модуль> - время импорта по -X importtime (кумулятивное)
+    cli_check - lolz_cli.py check против фейкового сервера (benchmarks/fake_server.py)
+    cli_check_service - lolz_cli.py --service ... check через lolz_cli.py serve
+
+Кроме времени проверяется, что импорт lolz_payment и lolz_cli не загружает
+тяжелые зависимости (requests, bs4, lxml, aiohttp, asyncio): они должны
+импортироваться только при первом использовании.
+
+С --baseline результаты сравниваются с сохраненным ранее --json, и скрипт
+завершается с кодом 1, если какой-либо замер вырос больше чем на --tolerance
+или тяжелая зависимость стала импортироваться сразу.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_startup.py --json startup.json
+    python benchmarks/bench_startup.py --baseline startup.json
+"""
+
+import argparse
+import compileall
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_server import FakeServer  # noqa: E402
+
+CLI = os.path.join(ROOT, "lolz_cli.py")
+
+# Модули, время импорта которых замеряется
+MODULES = ("models", "parsing", "lolz_payment", "async_lolz_payment", "lolz_cli")
+
+# Зависимости, которые не должны загружаться при импорте модулей из LAZY_MODULES
+HEAVY_MODULES = ("requests", "urllib3", "bs4", "lxml", "aiohttp", "asyncio")
+LAZY_MODULES = ("lolz_payment", "lolz_cli")
+
+
+def run_python(args: List[str], env: Dict[str, str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def python_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT
+    return env
+
+
+def wall_ms(args: List[str], runs: int, env: Dict[str, str]) -> float:
+    """Медиана времени работы процесса python <args> в мс"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run_python(args, env)
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2)
+
+
+def import_ms(module: str, runs: int, env: Dict[str, str]) -> float:
+    """Медиана кумулятивного времени импорта модуля по -X importtime в мс"""
+    timings = []
+    for _ in range(runs):
+        stderr = run_python(["-X", "importtime", "-c", f"import {module}"], env).stderr
+        for line in stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module and parts[2][1] != " ":
+                timings.append(int(parts[1]) / 1000)
+    return round(statistics.median(timings), 2) if timings else 0.0
+
+
+def eager_heavy_modules(module: str, env: Dict[str, str]) -> List[str]:
+    """Тяжелые зависимости, загруженные импортом module"""
+    code = (
+        f"import sys, json, {module}; "
+        f"print(json.dumps(sorted(set({HEAVY_MODULES!r}) & set(sys.modules))))"
+    )
+    return json.loads(run_python(["-c", code], env).stdout)
+
+
+def measure_cli(runs: int, env: Dict[str, str]) -> Dict[str, float]:
+    """Холодный старт lolz_cli.py check напрямую и через сервис"""
+    from lolz_payment import LolzPayment
+    from payment_service import PaymentService
+
+    results = {}
+    with FakeServer(rows=100) as server, tempfile.TemporaryDirectory() as tmp:
+        cookies_path = os.path.join(tmp, "cookies.json")
+        with open(cookies_path, "w", encoding="utf-8") as file:
+            json.dump([{"name": "xf_user", "value": "bench"}], file)
+        payment_id = str(server.state.payments[0][0])
+        common = [CLI, "--cookies", cookies_path, "--base-url", server.url]
+
+        results["cli_check"] = wall_ms([*common, "check", payment_id], runs, env)
+
+        logger = logging.getLogger("bench_startup")
+        logger.addHandler(logging.NullHandler())
+        client = LolzPayment(cookies_path, logger, base_url=server.url)
+        service = PaymentService(client, logger=logger)
+        http_server = service.tcp_server("127.0.0.1", 0)
+        thread = threading.Thread(target=service.serve, args=(http_server,))
+        thread.start()
+        try:
+            host, port = http_server.server_address[:2]
+            results["cli_check_service"] = wall_ms(
+                [*common, "--service", f"http://{host}:{port}", "check", payment_id],
+                runs,
+                env,
+            )
+        finally:
+            service.stop()
+            thread.join()
+    return results
+
+
+def run(runs: int) -> dict:
+    env = python_env()
+    # Компиляция .pyc заранее, чтобы она не попала в замеры
+    compileall.compile_dir(ROOT, maxlevels=0, quiet=1)
+
+    timings: Dict[str, float] = {"python": wall_ms(["-c", "pass"], runs, env)}
+    for module in MODULES:
+        if module == "async_lolz_payment":
+            try:
+                import aiohttp  # noqa: F401
+            except ImportError:
+                continue
+        timings[f"import:{module}"] = import_ms(module, runs, env)
+    timings.update(measure_cli(runs, env))
+
+    return {
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "timings_ms": timings,
+        "eager_heavy_modules": {
+            module: eager_heavy_modules(module, env) for module in LAZY_MODULES
+        },
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Регрессии относительно baseline"""
+    problems = []
+    for name, value in report["timings_ms"].items():
+        previous = baseline.get("timings_ms", {}).get(name)
+        if previous and value > previous * (1 + tolerance):
+            problems.append(f"{name}: {previous} мс -> {value} мс")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк времени запуска")
+    parser.add_argument("--runs", type=int, default=7, help="Запусков на замер")
+    parser.add_argument("--json", type=str, help="Файл для сохранения результатов")
+    parser.add_argument("--baseline", type=str, help="Результаты для сравнения (--json)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Допустимый рост (доля)")
+    args = parser.parse_args()
+
+    report = run(args.runs)
+
+    print(f"{'measure':<28} {'median, ms':>11}")
+    for name, value in report["timings_ms"].items():
+        print(f"{name:<28} {value:>11}")
+
+    problems = []
+    for module, modules in report["eager_heavy_modules"].items():
+        if modules:
+            problems.append(f"import {module} загружает {', '.join(modules)}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            problems += compare(report, json.load(file), args.tolerance)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+    for problem in problems:
+        print(f"Регрессия: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+"""
+Локальный сервер, имитирующий lzt.market для нагрузочного тестирования клиента.
+
+Обслуживает:
+    GET  /payment/balance/deposit - форма с токенами (или форма входа для
+         cookies из --login-required)
+    POST /payment/method - JSON с ссылкой на оплату и новым ID платежа
+    GET  /payment/list[?page=N] - таблица платежей в формате benchmarks/fixtures
+         с постраничной навигацией (с ETag: на If-None-Match без изменений
+         отвечает 304)
+
+Задержка ответа, доля ошибок 5xx/429, отклонение токенов и разрыв
+соединения после создания счета (ответ на форму теряется) настраиваются,
+созданные через /payment/method платежи появляются в начале списка и
+становятся оплаченными через --pay-after секунд.
+
+Запуск отдельно:
+    python benchmarks/fake_server.py --port 8080 --rows 5000 --latency 0.02
+В коде:
+    with FakeServer(rows=1000) as server:
+        lolz = LolzPayment(cookies_path, base_url=server.url)
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+DEPOSIT_PAGE = """<!DOCTYPE html>
+<html><head><title>Пополнение баланса</title></head><body>
+<form action="/payment/method" method="post" class="xenForm">
+  <input type="hidden" name="_xfToken" value="{token}">
+  <input type="hidden" name="service_id" value="42">
+  <input type="text" name="amount" value="">
+</form>
+</body></html>"""
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><title>Вход</title></head><body>
+<form action="/login/login" method="post"><input name="login"></form>
+</body></html>"""
+
+LIST_HEAD = """<!DOCTYPE html>
+<html><head><title>Платежи</title>{next_link}</head><body>
+<table class="dataTable">
+  <thead><tr><th>ID</th><th>Дата</th><th>Статус</th><th>Услуга</th><th>Сумма</th><th>Метод</th></tr></thead>
+  <tbody>
+"""
+
+LIST_ROW = """    <tr class="dataRow">
+      <td class="paymentId">{payment_id}</td>
+      <td><abbr class="DateTime" data-time="{ts}">{date}</abbr></td>
+      <td class="paymentStatus">{status}</td>
+      <td><span class="muted">refill-balance</span></td>
+      <td class="amount">{amount} ₽</td>
+      <td>{method}</td>
+    </tr>
+"""
+
+LIST_TAIL = """  </tbody>
+</table>
+{next_anchor}
+</body></html>"""
+
+# Ответ сайта на устаревший _xfToken
+TOKEN_ERROR = {
+    "error": [
+        "Security error occurred. Please press back, refresh the page, and try again."
+    ]
+}
+
+# Время на сайте указано по Москве (UTC+3)
+MSK = 3 * 3600
+
+METHOD_NAMES = {
+    "Paymentlnk_Card": "Карта",
+    "Paymentlnk_Sbp": "СБП",
+    "Settlepay_Binance": "Binance",
+    "Ruks_SkinPay": "Steam",
+}
+
+
+class FakeState:
+    """Платежи и настройки сервера, общие для всех потоков обработчика"""
+
+    def __init__(
+        self,
+        rows: int = 200,
+        page_size: int = 100,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        token_error_rate: float = 0.0,
+        drop_rate: float = 0.0,
+        pay_after: float = 0.0,
+        login_required: Optional[Set[str]] = None,
+        seed: int = 1,
+    ) -> None:
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.token_error_rate = token_error_rate
+        # Доля созданных счетов, после которых соединение закрывается без ответа
+        self.drop_rate = drop_rate
+        self.pay_after = pay_after
+        # Значения cookie xf_user, для которых показывается форма входа
+        self.login_required = login_required or set()
+        self.token = "1760700000,fake-token"
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.bytes_sent = 0
+
+        now = time.time()
+        self.next_id = 48000000 + rows
+        # От новых к старым: (ID, время создания, сумма, метод, время оплаты)
+        self.payments: List[Tuple[int, float, int, str, float]] = [
+            (
+                self.next_id - index,
+                now - index * 60,
+                self.random.choice((100, 250, 500, 1000)),
+                self.random.choice(list(METHOD_NAMES.values())),
+                0.0 if index % 3 else now,
+            )
+            for index in range(1, rows + 1)
+        ]
+
+    def chance(self, rate: float) -> bool:
+        if not rate:
+            return False
+        with self.lock:
+            return self.random.random() < rate
+
+    def create(self, amount: str, method: str) -> int:
+        with self.lock:
+            self.next_id += 1
+            payment_id = self.next_id
+            now = time.time()
+            amount_value = int(float(amount or 0))
+            self.payments.insert(
+                0,
+                (
+                    payment_id,
+                    now,
+                    amount_value,
+                    METHOD_NAMES.get(method, method),
+                    now + self.pay_after if self.pay_after >= 0 else 0.0,
+                ),
+            )
+            return payment_id
+
+    def page(self, number: int) -> Tuple[list, bool]:
+        start = (number - 1) * self.page_size
+        with self.lock:
+            rows = self.payments[start : start + self.page_size]
+            has_next = start + self.page_size < len(self.payments)
+        return rows, has_next
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело пишутся отдельно: без TCP_NODELAY каждый ответ ждал бы
+    # отложенного ACK клиента (~40 мс)
+    disable_nagle_algorithm = True
+    state: FakeState
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _delay(self) -> None:
+        state = self.state
+        if state.latency or state.jitter:
+            time.sleep(state.latency + (state.random.random() * state.jitter))
+
+    def _send(
+        self,
+        status: int,
+        body: str,
+        content_type: str = "text/html",
+        etag: Optional[str] = None,
+    ) -> None:
+        data = body.encode("utf-8")
+        # Счетчики обновляются до отправки: клиент, получивший ответ, видит
+        # его в state.requests и state.bytes_sent
+        with self.state.lock:
+            self.state.requests += 1
+            self.state.bytes_sent += len(data)
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if etag:
+            self.send_header("ETag", etag)
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _injected_error(self) -> bool:
+        if self.state.chance(self.state.throttle_rate):
+            self._send(429, "Too Many Requests", "text/plain")
+            return True
+        if self.state.chance(self.state.error_rate):
+            self._send(503, "Service Unavailable", "text/plain")
+            return True
+        return False
+
+    def _logged_in(self) -> bool:
+        cookie = self.headers.get("Cookie") or ""
+        pairs = dict(
+            part.strip().split("=", 1) for part in cookie.split(";") if "=" in part
+        )
+        return pairs.get("xf_user") not in self.state.login_required
+
+    def do_GET(self) -> None:
+        self._delay()
+        if self._injected_error():
+            return
+        url = urlparse(self.path)
+        if url.path == "/payment/balance/deposit":
+            if not self._logged_in():
+                return self._send(200, LOGIN_PAGE)
+            return self._send(200, DEPOSIT_PAGE.format(token=self.state.token))
+        if url.path == "/payment/list":
+            number = int(parse_qs(url.query).get("page", ["1"])[0])
+            body = self._list_page(number)
+            etag = f'"{hashlib.md5(body.encode("utf-8")).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, "", etag=etag)
+            return self._send(200, body, etag=etag)
+        self._send(404, "Not Found", "text/plain")
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        self._delay()
+        if self._injected_error():
+            return
+        if urlparse(self.path).path != "/payment/method":
+            return self._send(404, "Not Found", "text/plain")
+
+        token = form.get("_xfToken", [""])[0]
+        if token != self.state.token or self.state.chance(self.state.token_error_rate):
+            return self._send(200, json.dumps(TOKEN_ERROR), "application/json")
+
+        payment_id = self.state.create(
+            form.get("amount", ["0"])[0], form.get("method", [""])[0]
+        )
+        if self.state.chance(self.state.drop_rate):
+            # Счет создан, но клиент не узнает его ID
+            self.close_connection = True
+            return
+        body = {
+            "_redirectTarget": f"https://pay.example/invoice/{payment_id}",
+            "_redirectMessage": f"payment_id={payment_id}",
+        }
+        self._send(200, json.dumps(body), "application/json")
+
+    def _list_page(self, number: int) -> str:
+        rows, has_next = self.state.page(number)
+        now = time.time()
+        next_href = f"/payment/list?page={number + 1}"
+        parts = [
+            LIST_HEAD.format(
+                next_link=f'<link rel="next" href="{next_href}">' if has_next else ""
+            )
+        ]
+        for payment_id, created, amount, method, paid_at in rows:
+            parts.append(
+                LIST_ROW.format(
+                    payment_id=payment_id,
+                    ts=int(created),
+                    date=time.strftime("%d.%m.%Y в %H:%M", time.gmtime(created + MSK)),
+                    status="Оплачен" if paid_at and paid_at <= now else "Не оплачен",
+                    amount=amount,
+                    method=method,
+                )
+            )
+        parts.append(
+            LIST_TAIL.format(
+                next_anchor=f'<a class="PageNavNext" href="{next_href}">Вперед</a>'
+                if has_next
+                else ""
+            )
+        )
+        return "".join(parts)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Очередь по умолчанию (5) при десятках одновременных подключений
+    # приводит к повторной отправке SYN и задержкам около секунды
+    request_queue_size = 256
+
+
+class FakeServer:
+    """Фоновый фейковый сервер на случайном (или заданном) порту"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **state_kwargs) -> None:
+        """
+        Args:
+            host: Адрес для прослушивания
+            port: Порт (0 - любой свободный)
+            **state_kwargs: Параметры FakeState (rows, latency, error_rate, ...)
+        """
+        self.state = FakeState(**state_kwargs)
+        handler = type("Handler", (FakeHandler,), {"state": self.state})
+        self.httpd = _HTTPServer((host, port), handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Фейковый сервер lzt.market")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--rows", type=int, default=200, help="Платежей в списке")
+    parser.add_argument("--page-size", type=int, default=100, help="Строк на странице")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Случайная добавка к задержке, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument("--token-error-rate", type=float, default=0.0, help="Доля отклоненных токенов")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Доля созданных счетов без ответа")
+    parser.add_argument("--pay-after", type=float, default=0.0, help="Через сколько секунд платеж оплачивается (-1 - никогда)")
+    parser.add_argument("--login-required", nargs="*", default=[], help="Значения cookie xf_user с формой входа")
+    args = parser.parse_args()
+
+    server = FakeServer(
+        args.host,
+        args.port,
+        rows=args.rows,
+        page_size=args.page_size,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        token_error_rate=args.token_error_rate,
+        drop_rate=args.drop_rate,
+        pay_after=args.pay_after,
+        login_required=set(args.login_required),
+    )
+    print(f"Фейковый сервер: {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,236 @@
+"""
+Cookies аккаунта с перезагрузкой при изменении файла.
+
+CookieStore читает файл cookies (JSON-список {"name", "value"}) и, если
+запущено наблюдение (start), перечитывает его после каждого изменения:
+через inotify на Linux или по времени изменения файла на остальных системах.
+Новые cookies подменяют старые одной операцией присваивания, поэтому уже
+начатые запросы дорабатывают со старыми cookies, а новые идут с новыми.
+
+Перед подменой вызываются подписчики warm_up (клиенты получают в них токены
+для новых cookies, чтобы первый платеж после ротации не ждал страницу
+депозита), после подмены - подписчики swapped (сброс кэшей старых cookies).
+"""
+
+import json
+import logging
+import os
+import select
+import sys
+import threading
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Флаги inotify (linux/inotify.h)
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_WATCH_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+)
+
+# Пауза после события inotify: редактор или скрипт ротации может записывать
+# файл в несколько приемов
+_SETTLE_DELAY = 0.05
+
+
+def load_cookies_file(path: str) -> Dict[str, str]:
+    """Чтение файла cookies (исключение, если файл отсутствует или поврежден)"""
+    with open(path, "r", encoding="utf-8") as file:
+        cookies_list = json.load(file)
+    return {cookie["name"]: cookie["value"] for cookie in cookies_list}
+
+
+def _inotify_fd(directory: str) -> Optional[int]:
+    """Дескриптор inotify с наблюдением за каталогом (None - недоступно)"""
+    if not sys.platform.startswith("linux"):
+        return None
+    import ctypes
+    import ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, directory.encode(), _WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _callback_ref(callback: Callable) -> Callable[[], Optional[Callable]]:
+    """Слабая ссылка на метод (подписка не продлевает жизнь клиента)"""
+    if hasattr(callback, "__self__"):
+        return weakref.WeakMethod(callback)
+    return lambda: callback
+
+
+class CookieStore:
+    """
+    Текущие cookies одного файла.
+
+    Пример:
+        store = CookieStore("cookies/lolz.json").start()
+        lolz = LolzPayment("cookies/lolz.json", cookie_store=store)
+        # После замены файла клиент получит токены для новых cookies
+        # в фоне и переключится на них без перезапуска
+    """
+
+    def __init__(
+        self,
+        path: str,
+        poll_interval: float = 1.0,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        """
+        Args:
+            path: Путь к файлу с cookies в формате JSON
+            poll_interval: Период проверки файла без inotify в секундах
+            logger: Опциональный логгер
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        self.logger = logger or logging.getLogger("LolzPayment")
+        # Номер версии cookies: увеличивается при каждой подмене
+        self.version = 0
+        self._warm_up: List[Callable[[], Optional[Callable]]] = []
+        self._swapped: List[Callable[[], Optional[Callable]]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._signature = self._file_signature()
+        try:
+            self._cookies = load_cookies_file(path)
+        except Exception as e:
+            error_msg = f"Ошибка загрузки cookies: {e}"
+            print(error_msg)
+            self.logger.error(error_msg)
+            self._cookies = {}
+
+    @property
+    def cookies(self) -> Dict[str, str]:
+        """Текущие cookies (словарь не изменяется, при ротации заменяется целиком)"""
+        return self._cookies
+
+    def subscribe(
+        self,
+        warm_up: Optional[Callable[[Dict[str, str]], Any]] = None,
+        swapped: Optional[Callable[[Dict[str, str], Dict[str, str]], Any]] = None,
+    ) -> None:
+        """
+        Подписка на ротацию cookies. Методы объектов хранятся по слабой ссылке.
+
+        Args:
+            warm_up: Вызывается с новыми cookies до подмены
+            swapped: Вызывается со старыми и новыми cookies после подмены
+        """
+        if warm_up:
+            self._warm_up.append(_callback_ref(warm_up))
+        if swapped:
+            self._swapped.append(_callback_ref(swapped))
+
+    def start(self) -> "CookieStore":
+        """Запуск наблюдения за файлом в фоновом потоке"""
+        if not (self._thread and self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="cookie-store", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def reload(self) -> bool:
+        """
+        Перечитать файл, если он изменился с прошлой загрузки.
+
+        Returns:
+            bool: True, если cookies заменены
+        """
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+
+        try:
+            cookies = load_cookies_file(self.path)
+        except Exception as e:
+            # Недописанный или поврежденный файл: остаются прежние cookies
+            self.logger.error(f"Ошибка загрузки cookies из {self.path}: {e}")
+            return False
+        if cookies == self._cookies:
+            return False
+
+        for callback in self._callbacks(self._warm_up):
+            try:
+                callback(cookies)
+            except Exception as e:
+                self.logger.warning(f"Ошибка подготовки новых cookies: {e}")
+
+        old, self._cookies = self._cookies, cookies
+        self.version += 1
+        self.logger.info(f"Cookies из {self.path} обновлены (версия {self.version})")
+
+        for callback in self._callbacks(self._swapped):
+            try:
+                callback(old, cookies)
+            except Exception as e:
+                self.logger.warning(f"Ошибка обработки смены cookies: {e}")
+        return True
+
+    @staticmethod
+    def _callbacks(refs: List[Callable[[], Optional[Callable]]]) -> List[Callable]:
+        callbacks = [ref() for ref in refs]
+        refs[:] = [ref for ref, callback in zip(refs, callbacks) if callback]
+        return [callback for callback in callbacks if callback]
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _run(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd = _inotify_fd(directory)
+        if fd is None:
+            self.logger.debug("inotify недоступен, cookies проверяются по mtime")
+        try:
+            while not self._stop.is_set():
+                if fd is None:
+                    self._stop.wait(self.poll_interval)
+                else:
+                    # Таймаут - и проверка остановки, и страховка от пропущенных
+                    # событий (например, на сетевых файловых системах)
+                    ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                    if ready:
+                        self._drain(fd)
+                        self._stop.wait(_SETTLE_DELAY)
+                if self._stop.is_set():
+                    break
+                try:
+                    self.reload()
+                except Exception as e:
+                    self.logger.error(f"Ошибка перезагрузки cookies: {e}")
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    @staticmethod
+    def _drain(fd: int) -> None:
+        try:
+            while os.read(fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
@@ -4,10 +4,10 @@
 
 import logging
 import random
-import time
 
 from models import PaymentMethod
 from lolz_payment import LolzPayment
+from payment_watcher import WATCH_COMPLETED, PaymentWatcher, PollSchedule
 
 
 def setup_logger() -> logging.Logger:
@@ -101,23 +101,16 @@ def example_wait_for_payment(
     lolz = LolzPayment(cookies_path)
 
     print(f"Ожидание оплаты платежа {payment_id}...")
-    start_time = time.time()
 
-    while time.time() - start_time < timeout_seconds:
-        # Проверка платежа
-        payment_info = lolz.check_payment(payment_id)
+    # Наблюдатель опрашивает список платежей один раз за такт для всех
+    # отслеживаемых платежей, поэтому его можно использовать для сотен счетов
+    schedule = PollSchedule(base_interval=check_interval_seconds)
+    with PaymentWatcher(lolz, schedule=schedule) as watcher:
+        result = watcher.watch(payment_id, timeout=timeout_seconds).result()
 
-        if not payment_info:
-            print("Не удалось получить информацию о платеже")
-            time.sleep(check_interval_seconds)
-            continue
-
-        if payment_info.is_paid:
-            print(f"Платеж {payment_id} успешно оплачен!")
-            return True
-
-        print(f"Платеж {payment_id} еще не оплачен. Ожидание...")
-        time.sleep(check_interval_seconds)
+    if result.status == WATCH_COMPLETED:
+        print(f"Платеж {payment_id} успешно оплачен!")
+        return True
 
     print(f"Истекло время ожидания для платежа {payment_id}")
     return False
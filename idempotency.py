@@ -0,0 +1,253 @@
+"""
+Хранилище ключей идемпотентности для create_payment.
+
+Ключ резервируется до отправки формы платежа и после ответа сохраняется
+вместе с созданным платежом. Повторный вызов с тем же ключом возвращает уже
+созданный PaymentResponse вместо создания нового счета. Одновременные вызовы
+с одним ключом выполняются по очереди.
+
+Если ответ на отправленную форму потерян (таймаут, разрыв соединения, 5xx),
+счет мог быть создан: ключ помечается как "неизвестно", и повторный вызов
+ищет счет в списке платежей, а не отправляет форму еще раз.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional
+
+from models import PaymentInfo, PaymentResponse
+
+# Состояния ключа
+STATUS_PENDING = "pending"  # Форма отправляется
+STATUS_IN_DOUBT = "in_doubt"  # Ответ потерян, счет мог быть создан
+STATUS_COMPLETED = "completed"  # Платеж создан
+STATUS_RELEASED = "released"  # Счет точно не создан, ключ свободен (только в файле)
+
+# Названия методов оплаты в таблице платежей
+METHOD_TITLES = {
+    "card": "Карта",
+    "sbp": "СБП",
+    "binance": "Binance",
+    "steam": "Steam",
+}
+
+# Допуск при сравнении времени создания счета: дата в таблице указана
+# с точностью до минуты, а часы сервера могут расходиться с локальными
+RECONCILE_SKEW = 120.0
+
+# Файл переписывается, когда в нем накопилось столько устаревших строк
+COMPACT_MIN_LINES = 1000
+
+
+@dataclass
+class IdempotencyRecord:
+    key: str
+    fingerprint: str
+    payment_id: Optional[str]
+    final_url: Optional[str]
+    created_at: float
+    status: str = STATUS_COMPLETED
+    # Файл cookies клиента, отправившего форму (для сверки со списком платежей)
+    owner: Optional[str] = None
+
+    @property
+    def completed(self) -> bool:
+        return self.status == STATUS_COMPLETED
+
+    def to_response(self) -> PaymentResponse:
+        return PaymentResponse(final_url=self.final_url, payment_id=self.payment_id)
+
+
+class IdempotencyStore:
+    """
+    Ключи идемпотентности в памяти с необязательным сохранением в файл
+    (JSON Lines, по записи на строку). Файл дописывается, а при загрузке
+    и по мере накопления устаревших строк переписывается заново.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 86400.0) -> None:
+        """
+        Args:
+            path: Файл для сохранения ключей между перезапусками (None - только память)
+            ttl: Время хранения ключа в секундах
+        """
+        self.path = path
+        self.ttl = ttl
+        self._records: Dict[str, IdempotencyRecord] = {}
+        # Ключ -> [блокировка, число потоков, использующих ее]
+        self._key_locks: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        # Строк в файле (включая замененные и освобожденные записи)
+        self._lines = 0
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self) -> None:
+        now = time.time()
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                self._lines += 1
+                record = IdempotencyRecord(**json.loads(line))
+                if record.status == STATUS_RELEASED:
+                    self._records.pop(record.key, None)
+                elif record.created_at + self.ttl > now:
+                    self._records[record.key] = record
+                else:
+                    self._records.pop(record.key, None)
+        if self._lines > len(self._records):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Перезапись файла только действующими записями (под self._lock)"""
+        now = time.time()
+        self._records = {
+            key: record
+            for key, record in self._records.items()
+            if record.created_at + self.ttl > now
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            for record in self._records.values():
+                file.write(json.dumps(record.__dict__, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self._lines = len(self._records)
+
+    def _write(self, record: IdempotencyRecord) -> None:
+        """Сохранение записи (под self._lock)"""
+        if record.status == STATUS_RELEASED:
+            self._records.pop(record.key, None)
+        else:
+            self._records[record.key] = record
+        if not self.path:
+            return
+        if self._lines - len(self._records) >= max(
+            COMPACT_MIN_LINES, len(self._records)
+        ):
+            # Запись уже в self._records и попадет в новый файл
+            self._compact()
+            return
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record.__dict__, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self._lines += 1
+
+    @staticmethod
+    def fingerprint(amount: float, payment_method: str, phone: Optional[str]) -> str:
+        """Отпечаток параметров платежа для проверки повторного ключа"""
+        return f"{float(amount)}|{payment_method}|{phone or ''}"
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        with self._lock:
+            record = self._records.get(key)
+            if record and record.created_at + self.ttl <= time.time():
+                del self._records[key]
+                return None
+            return record
+
+    def reserve(self, key: str, fingerprint: str, owner: Optional[str] = None) -> None:
+        """Резервирование ключа перед отправкой формы платежа"""
+        record = IdempotencyRecord(
+            key=key,
+            fingerprint=fingerprint,
+            payment_id=None,
+            final_url=None,
+            created_at=time.time(),
+            status=STATUS_PENDING,
+            owner=owner,
+        )
+        with self._lock:
+            self._write(record)
+
+    def finish(self, key: str, response: PaymentResponse) -> None:
+        """
+        Итог отправки формы по зарезервированному ключу: платеж сохраняется,
+        при потерянном ответе ключ остается занятым, иначе освобождается.
+        """
+        with self._lock:
+            reserved = self._records.get(key)
+            if reserved is None:
+                return
+            if response.payment_id:
+                status = STATUS_COMPLETED
+            elif response.in_doubt:
+                status = STATUS_IN_DOUBT
+            else:
+                status = STATUS_RELEASED
+            self._write(
+                IdempotencyRecord(
+                    key=key,
+                    fingerprint=reserved.fingerprint,
+                    payment_id=response.payment_id,
+                    final_url=response.final_url,
+                    created_at=reserved.created_at,
+                    status=status,
+                    owner=reserved.owner,
+                )
+            )
+
+    def match(
+        self,
+        record: IdempotencyRecord,
+        payments: Iterable[PaymentInfo],
+        amount: float,
+        payment_method: str,
+    ) -> Optional[PaymentInfo]:
+        """
+        Счет, который мог создать запрос с потерянным ответом: та же сумма и
+        метод, создан не раньше резервирования ключа и не записан под другим
+        ключом. None, если такого счета нет или подходящих несколько.
+        """
+        kopecks = round(float(amount) * 100)
+        title = METHOD_TITLES.get(payment_method, payment_method).lower()
+        since = record.created_at - RECONCILE_SKEW
+        with self._lock:
+            known = {other.payment_id for other in self._records.values()}
+        candidates = [
+            payment
+            for payment in payments
+            if payment.amount_kopecks == kopecks
+            and (not payment.payment_type or title in payment.payment_type.lower())
+            and payment.created_ts is not None
+            and payment.created_ts >= since
+            and payment.payment_id not in known
+        ]
+        return candidates[0] if len(candidates) == 1 else None
+
+    @contextmanager
+    def locked(self, key: str) -> Iterator[None]:
+        """Блокировка ключа на время создания платежа"""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    def mismatch_error(self, key: str) -> PaymentResponse:
+        return PaymentResponse(
+            error=f"Ключ идемпотентности {key} уже использован с другими параметрами платежа"
+        )
+
+    def in_doubt_error(self, key: str) -> PaymentResponse:
+        return PaymentResponse(
+            error=(
+                f"Неизвестно, создан ли платеж по ключу идемпотентности {key}: "
+                "ответ на отправленную форму был потерян, а счет не найден в "
+                "списке платежей. Проверьте список платежей вручную"
+            )
+        )
@@ -0,0 +1,280 @@
+"""
+Локальный журнал платежей на SQLite.
+
+Хранит каждый созданный платеж (сумма, метод, аккаунт, время создания) и его
+последний известный статус. Оплаченный платеж больше не меняется, поэтому
+check_payment отвечает по нему из журнала без запроса к сайту.
+"""
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from models import PaymentInfo, PaymentResponse, PaymentStatus
+
+# Статусы платежа в журнале (совпадают с PaymentInfo.status)
+STATUS_PENDING = PaymentStatus.PENDING.value
+STATUS_COMPLETED = PaymentStatus.COMPLETED.value
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id TEXT PRIMARY KEY,
+    account TEXT,
+    payment_method TEXT,
+    amount REAL,
+    final_url TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    creation_date TEXT,
+    payment_date TEXT,
+    amount_text TEXT,
+    payment_type TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    completed_at REAL
+);
+CREATE INDEX IF NOT EXISTS payments_status ON payments (status, updated_at);
+"""
+
+_COLUMNS = (
+    "payment_id, account, payment_method, amount, final_url, status, "
+    "creation_date, payment_date, amount_text, payment_type, "
+    "created_at, updated_at, completed_at"
+)
+
+
+@dataclass
+class LedgerEntry:
+    payment_id: str
+    account: Optional[str]
+    payment_method: Optional[str]
+    amount: Optional[float]
+    final_url: Optional[str]
+    status: str
+    creation_date: Optional[str]
+    payment_date: Optional[str]
+    amount_text: Optional[str]
+    payment_type: Optional[str]
+    created_at: float
+    updated_at: float
+    completed_at: Optional[float]
+
+    def to_payment_info(self) -> PaymentInfo:
+        """Последний известный статус в виде PaymentInfo"""
+        return PaymentInfo(
+            payment_id=self.payment_id,
+            creation_date=self.creation_date or "",
+            payment_date=self.payment_date or "",
+            amount=self.amount_text or "",
+            payment_type=self.payment_type or "",
+            status=self.status,
+        )
+
+
+class PaymentLedger:
+    """
+    Журнал платежей в файле SQLite (режим WAL) или в памяти.
+    Один экземпляр можно использовать из нескольких потоков и клиентов.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """
+        Args:
+            path: Путь к файлу базы данных (":memory:" - без сохранения на диск)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> "PaymentLedger":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def record_created(
+        self,
+        response: PaymentResponse,
+        amount: float,
+        payment_method: str,
+        account: Optional[str] = None,
+    ) -> None:
+        """Запись только что созданного платежа"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO payments (payment_id, account, payment_method, amount,
+                                      final_url, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (payment_id) DO NOTHING
+                """,
+                (
+                    response.payment_id,
+                    account,
+                    payment_method,
+                    amount,
+                    response.final_url,
+                    now,
+                    now,
+                ),
+            )
+
+    def update_statuses(
+        self, payments: Iterable[PaymentInfo], account: Optional[str] = None
+    ) -> int:
+        """
+        Запись статусов, полученных со страницы списка. Строка обновляется,
+        только если статус или дата оплаты изменились; неизвестные журналу
+        платежи добавляются.
+
+        Returns:
+            int: Количество добавленных или измененных записей
+        """
+        now = time.time()
+        rows = [
+            (
+                info.payment_id,
+                account,
+                info.status.value,
+                info.creation_date,
+                info.payment_date,
+                info.amount,
+                info.payment_type,
+                now,
+                now,
+                now if info.status == STATUS_COMPLETED else None,
+            )
+            for info in payments
+            if info
+        ]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                """
+                INSERT INTO payments (payment_id, account, status, creation_date,
+                                      payment_date, amount_text, payment_type,
+                                      created_at, updated_at, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (payment_id) DO UPDATE SET
+                    status = excluded.status,
+                    creation_date = excluded.creation_date,
+                    payment_date = excluded.payment_date,
+                    amount_text = excluded.amount_text,
+                    payment_type = excluded.payment_type,
+                    updated_at = excluded.updated_at,
+                    completed_at = COALESCE(payments.completed_at, excluded.completed_at)
+                WHERE payments.status IS NOT excluded.status
+                   OR payments.payment_date IS NOT excluded.payment_date
+                   OR payments.amount_text IS NULL
+                """,
+                rows,
+            )
+            return self._conn.total_changes - before
+
+    def get(self, payment_id: str) -> Optional[LedgerEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM payments WHERE payment_id = ?", (payment_id,)
+            ).fetchone()
+        return LedgerEntry(*row) if row else None
+
+    def completed(self, payment_ids: Iterable[str]) -> Dict[str, PaymentInfo]:
+        """Оплаченные платежи из переданных ID (ответ без запроса к сайту)"""
+        ids = list(payment_ids)
+        found: Dict[str, PaymentInfo] = {}
+        # Ограничение SQLite на число параметров запроса
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {_COLUMNS} FROM payments "
+                    f"WHERE status = ? AND payment_id IN ({placeholders})",
+                    (STATUS_COMPLETED, *chunk),
+                ).fetchall()
+            for row in rows:
+                entry = LedgerEntry(*row)
+                found[entry.payment_id] = entry.to_payment_info()
+        return found
+
+    def by_status(
+        self, status: str, account: Optional[str] = None, limit: int = 1000
+    ) -> List[LedgerEntry]:
+        """Платежи с указанным статусом, начиная с давно не обновлявшихся"""
+        query = f"SELECT {_COLUMNS} FROM payments WHERE status = ?"
+        params: list = [status]
+        if account is not None:
+            query += " AND account = ?"
+            params.append(account)
+        query += " ORDER BY updated_at LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [LedgerEntry(*row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """Количество платежей по статусам"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM payments GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def watch(self, payment_id: str, account: Optional[str] = None) -> bool:
+        """
+        Добавление неоплаченного платежа, созданного не через клиент
+        (например, другим процессом), чтобы его статус отслеживался.
+
+        Returns:
+            bool: False, если платеж уже есть в журнале
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO payments (payment_id, account, created_at, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (payment_id) DO NOTHING
+                """,
+                (payment_id, account, now, now),
+            )
+            return cursor.rowcount > 0
+
+    def pending_ids(
+        self,
+        account: Optional[str],
+        limit: int = 1000,
+        max_age: Optional[float] = None,
+    ) -> List[str]:
+        """
+        ID неоплаченных платежей аккаунта, начиная с самых новых.
+
+        Args:
+            account: Имя аккаунта
+            limit: Максимум ID
+            max_age: Не старше стольких секунд с создания (None - любые);
+                брошенные счета иначе опрашивались бы бесконечно
+        """
+        min_created_at = time.time() - max_age if max_age is not None else 0.0
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT payment_id FROM payments
+                WHERE status = ? AND account IS ? AND created_at >= ?
+                ORDER BY created_at DESC LIMIT ?
+                """,
+                (STATUS_PENDING, account, min_created_at, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
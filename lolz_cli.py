@@ -1,16 +1,20 @@
 #!/usr/bin/env python
 """
 Скрипт для быстрого создания или проверки платежа в Lolz Market.
+
+Клиент импортируется только в командах, которым он нужен, чтобы запуск
+скрипта не тратил время на загрузку requests и парсеров HTML. С опцией
+--service команды create и check выполняются через запущенный сервис
+(lolz_cli.py serve) и клиент не загружают вовсе.
 """
 
 import argparse
+import json
 import logging
+import os
 import random
 import sys
-from typing import Literal
-
-from models import PaymentMethod
-from lolz_payment import LolzPayment
+from typing import Any, Dict, Literal, Optional, Tuple
 
 
 def setup_logging():
@@ -26,52 +30,256 @@ def setup_logging():
     return logger
 
 
-def create_payment(args) -> Literal[1] | Literal[0]:
-    """Создание нового платежа"""
-    logger = setup_logging()
+def create_client(args, logger: logging.Logger):
+    """Создание клиента (импорт LolzPayment только здесь)"""
+    from lolz_payment import LolzPayment
+
+    return LolzPayment(args.cookies, logger, base_url=args.base_url)
 
-    lolz = LolzPayment(args.cookies, logger)
 
+def service_request(
+    service: str, method: str, path: str, body: Optional[Dict[str, Any]] = None
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    Запрос к сервису lolz_cli.py serve.
+
+    Args:
+        service: Адрес сервиса: http://host:port или unix:/путь/к/сокету
+        method: HTTP-метод
+        path: Путь эндпоинта
+        body: Тело запроса (JSON)
+
+    Returns:
+        Пара (HTTP-статус, тело ответа)
+    """
+    import http.client
+    import socket
+    from urllib.parse import urlparse
+
+    if service.startswith("unix:"):
+        socket_path = service[len("unix:") :]
+
+        class UnixConnection(http.client.HTTPConnection):
+            def connect(self) -> None:
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.settimeout(self.timeout)
+                self.sock.connect(socket_path)
+
+        connection: http.client.HTTPConnection = UnixConnection(
+            "localhost", timeout=60
+        )
+    else:
+        url = urlparse(service)
+        connection = http.client.HTTPConnection(
+            url.hostname or "127.0.0.1", url.port or 8765, timeout=60
+        )
+
+    try:
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    finally:
+        connection.close()
+
+
+def create_payment(args) -> Literal[1] | Literal[0]:
+    """Создание нового платежа"""
     phone = args.phone
-    if args.method == PaymentMethod.SBP.value and not phone:
+    if args.method == "sbp" and not phone:
         phone = f"+7{random.randint(9000000000, 9999999999)}"
         print(f"Для СБП не указан телефон, используем случайный: {phone}")
 
-    response = lolz.create_payment(
-        amount=args.amount, payment_method=args.method, phone=phone
-    )
+    if args.service:
+        try:
+            _, result = service_request(
+                args.service,
+                "POST",
+                "/payments",
+                {"amount": args.amount, "payment_method": args.method, "phone": phone},
+            )
+        except (OSError, ValueError) as e:
+            result = {"error": f"Сервис {args.service} недоступен: {e}"}
+    else:
+        lolz = create_client(args, setup_logging())
+        result = lolz.create_payment(
+            amount=args.amount, payment_method=args.method, phone=phone
+        ).to_dict()
 
-    if response.error:
-        print(f"Ошибка при создании платежа: {response.error}")
+    if result.get("error") or not result.get("payment_id"):
+        print(f"Ошибка при создании платежа: {result.get('error')}")
         return 1
 
     print("Платеж успешно создан!")
-    print(f"ID платежа: {response.payment_id}")
-    print(f"URL для оплаты: {response.final_url}")
+    print(f"ID платежа: {result['payment_id']}")
+    print(f"URL для оплаты: {result.get('final_url')}")
     return 0
 
 
 def check_payment(args) -> Literal[1] | Literal[0]:
     """Проверка статуса платежа"""
-    logger = setup_logging()
-
-    lolz = LolzPayment(args.cookies, logger)
-
-    payment_info = lolz.check_payment(args.id)
+    if args.service:
+        try:
+            status, info = service_request(
+                args.service, "GET", f"/payments/{args.id}"
+            )
+        except (OSError, ValueError) as e:
+            print(f"Сервис {args.service} недоступен: {e}")
+            return 1
+        payment_info = info if status == 200 else None
+    else:
+        lolz = create_client(args, setup_logging())
+        found = lolz.check_payment(args.id)
+        payment_info = found.to_dict() if found else None
 
     if not payment_info:
         print(f"Не удалось получить информацию о платеже {args.id}")
         return 1
 
     print(f"Информация о платеже {args.id}:")
-    print(f"Дата создания: {payment_info.creation_date}")
-    print(f"Статус оплаты: {payment_info.payment_date}")
-    print(f"Сумма: {payment_info.amount}")
-    print(f"Тип платежа: {payment_info.payment_type}")
-    print(f"Оплачен: {'Да' if payment_info.is_paid else 'Нет'}")
+    print(f"Дата создания: {payment_info['creation_date']}")
+    print(f"Статус оплаты: {payment_info['payment_date']}")
+    print(f"Сумма: {payment_info['amount']}")
+    print(f"Тип платежа: {payment_info['payment_type']}")
+    print(f"Оплачен: {'Да' if payment_info['is_paid'] else 'Нет'}")
     return 0
 
 
+def serve(args) -> Literal[1] | Literal[0]:
+    """Запуск резидентного HTTP-сервиса платежей"""
+    from cookie_store import CookieStore
+    from ledger import PaymentLedger
+    from lolz_payment import LolzPayment
+    from metrics import Metrics, PrometheusRegistry
+    from payment_events import EventDispatcher, EventOutbox, WebhookSink
+    from payment_service import PaymentService
+    from payment_watcher import PaymentWatcher, PollSchedule
+    from response_cache import ResponseCache
+    from token_refresher import TokenRefresher
+
+    logger = setup_logging()
+
+    registry = PrometheusRegistry() if args.metrics else None
+    # Без перезапуска сервиса cookies подхватываются при изменении файла
+    cookie_store = CookieStore(args.cookies, logger=logger)
+    if args.watch_cookies:
+        cookie_store.start()
+    events = None
+    if args.webhook:
+        events = EventDispatcher(
+            EventOutbox(args.outbox),
+            sinks=[WebhookSink(url, args.webhook_secret) for url in args.webhook],
+            logger=logger,
+        )
+    lolz = LolzPayment(
+        args.cookies,
+        logger,
+        base_url=args.base_url,
+        ledger=PaymentLedger(args.ledger) if args.ledger else None,
+        metrics=Metrics(registry) if registry else None,
+        pool_maxsize=args.pool_size,
+        events=events,
+        response_cache=ResponseCache(args.page_cache) if args.page_cache else None,
+        cookie_store=cookie_store,
+    )
+    watcher = PaymentWatcher(
+        lolz,
+        schedule=PollSchedule(base_interval=args.poll_interval),
+        tick_interval=args.tick_interval,
+        on_result=events.on_watch_result if events else None,
+        logger=logger,
+    )
+    service = PaymentService(lolz, watcher=watcher, registry=registry, logger=logger)
+    refresher = TokenRefresher(lolz, logger=logger) if args.refresh_tokens else None
+
+    try:
+        if args.socket:
+            server = service.unix_server(args.socket)
+        else:
+            server = service.tcp_server(args.host, args.port)
+    except OSError as e:
+        logger.error(f"Не удалось открыть сокет сервиса: {e}")
+        lolz.close()
+        return 1
+
+    # Токены получаются до первого запроса и дальше обновляются заранее в фоне
+    lolz.warm_up()
+    if events:
+        events.start()
+    if refresher:
+        refresher.start()
+    service.serve(server)
+    if refresher:
+        refresher.stop()
+    cookie_store.stop()
+    if events:
+        events.stop()
+        events.outbox.close()
+    if lolz.ledger:
+        lolz.ledger.close()
+    return 0
+
+
+def poll(args) -> Literal[1] | Literal[0]:
+    """Опрос неоплаченных платежей из журнала несколькими процессами"""
+    import time
+
+    from sharded_poller import ShardedPoller
+
+    logger = setup_logging()
+    poller = ShardedPoller(
+        args.accounts,
+        args.ledger,
+        processes=args.processes,
+        poll_interval=args.poll_interval,
+        max_age=args.max_age,
+        logger=logger,
+        base_url=args.base_url,
+    )
+    if not poller.cookies_paths:
+        logger.error(f"Не найдены файлы cookies: {args.accounts}")
+        return 1
+
+    with poller:
+        logger.info("Опрос запущен, остановка - Ctrl+C")
+        try:
+            while True:
+                time.sleep(60)
+                checked = sum(item["checked"] for item in poller.stats())
+                logger.info(f"Проверено платежей: {checked}")
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def parse_site_date(value: str):
+    """Дата или дата и время ISO 8601 для --since/--until (без пояса - по Москве)"""
+    from datetime import datetime
+
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"неверная дата: {value}")
+
+
+def export_payments(args) -> Literal[1] | Literal[0]:
+    """Выгрузка истории платежей в файл"""
+    lolz = create_client(args, setup_logging())
+    summary = lolz.export_payments(
+        args.output,
+        args.format,
+        since=args.since,
+        until=args.until,
+        checkpoint=args.checkpoint,
+        prefetch=args.prefetch,
+        max_pages=args.max_pages,
+    )
+    lolz.close()
+    print(json.dumps(summary.to_dict(), ensure_ascii=False))
+    return 0 if summary.complete else 1
+
+
 def main() -> Literal[1] | Literal[0]:
     """Основная функция"""
     parser = argparse.ArgumentParser(description="Работа с платежами Lolz Market")
@@ -81,6 +289,19 @@ def main() -> Literal[1] | Literal[0]:
         default="cookies/lolz.json",
         help="Путь к файлу с cookies (по умолчанию: cookies/lolz.json)",
     )
+    parser.add_argument(
+        "--base-url",
+        type=str,
+        default="https://lzt.market",
+        help="Адрес сайта (по умолчанию: https://lzt.market)",
+    )
+    parser.add_argument(
+        "--service",
+        type=str,
+        default=os.environ.get("LOLZ_SERVICE"),
+        help="Выполнять create/check через сервис lolz_cli.py serve "
+        "(http://host:port или unix:/путь/к/сокету; по умолчанию: $LOLZ_SERVICE)",
+    )
 
     subparsers = parser.add_subparsers(dest="command", help="Команда для выполнения")
 
@@ -100,12 +321,148 @@ def main() -> Literal[1] | Literal[0]:
     check_parser = subparsers.add_parser("check", help="Проверить статус платежа")
     check_parser.add_argument("id", type=str, help="ID платежа для проверки")
 
+    serve_parser = subparsers.add_parser(
+        "serve", help="Запустить резидентный HTTP-сервис платежей"
+    )
+    serve_parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="Адрес (по умолчанию 127.0.0.1)"
+    )
+    serve_parser.add_argument(
+        "--port", type=int, default=8765, help="Порт (по умолчанию 8765)"
+    )
+    serve_parser.add_argument(
+        "--socket", type=str, help="Путь к Unix-сокету (вместо --host/--port)"
+    )
+    serve_parser.add_argument(
+        "--ledger", type=str, help="Файл журнала платежей SQLite"
+    )
+    serve_parser.add_argument(
+        "--pool-size", type=int, default=32, help="Размер пула соединений"
+    )
+    serve_parser.add_argument(
+        "--tick-interval",
+        type=float,
+        default=1.0,
+        help="Период опроса наблюдателя за платежами в секундах",
+    )
+    serve_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5.0,
+        help="Начальный интервал проверки ожидаемого платежа в секундах",
+    )
+    serve_parser.add_argument(
+        "--watch-cookies",
+        action="store_true",
+        help="Перечитывать файл cookies при изменении (ротация без перезапуска)",
+    )
+    serve_parser.add_argument(
+        "--no-token-refresh",
+        dest="refresh_tokens",
+        action="store_false",
+        help="Не обновлять токены в фоне (получать при платеже после истечения)",
+    )
+    serve_parser.add_argument(
+        "--page-cache",
+        type=float,
+        default=0.0,
+        help="Сколько секунд использовать загруженный список платежей для "
+        "следующих проверок (по умолчанию 0 - без кэша)",
+    )
+    serve_parser.add_argument(
+        "--metrics", action="store_true", help="Включить эндпоинт GET /metrics"
+    )
+    serve_parser.add_argument(
+        "--webhook",
+        type=str,
+        action="append",
+        default=[],
+        help="URL для событий payment.completed/payment.expired (можно несколько)",
+    )
+    serve_parser.add_argument(
+        "--webhook-secret", type=str, help="Ключ подписи X-Lolz-Signature"
+    )
+    serve_parser.add_argument(
+        "--outbox",
+        type=str,
+        default="events.db",
+        help="Файл SQLite с неотправленными событиями (по умолчанию events.db)",
+    )
+
+    poll_parser = subparsers.add_parser(
+        "poll",
+        help="Опрашивать неоплаченные платежи журнала несколькими процессами",
+    )
+    poll_parser.add_argument(
+        "--accounts",
+        type=str,
+        default="cookies",
+        help="Каталог с файлами cookies или glob-шаблон (по умолчанию cookies)",
+    )
+    poll_parser.add_argument(
+        "--ledger", type=str, required=True, help="Файл журнала платежей SQLite"
+    )
+    poll_parser.add_argument(
+        "--processes", type=int, help="Число процессов (по умолчанию - число ядер)"
+    )
+    poll_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5.0,
+        help="Период опроса каждого аккаунта в секундах",
+    )
+    poll_parser.add_argument(
+        "--max-age",
+        type=float,
+        default=86400.0,
+        help="Не опрашивать платежи старше стольких секунд (по умолчанию сутки)",
+    )
+
+    export_parser = subparsers.add_parser(
+        "export", help="Выгрузить историю платежей в CSV, JSONL или Parquet"
+    )
+    export_parser.add_argument("output", type=str, help="Файл выгрузки")
+    export_parser.add_argument(
+        "--format",
+        type=str,
+        choices=["csv", "jsonl", "parquet"],
+        help="Формат (по умолчанию - по расширению файла, иначе csv)",
+    )
+    export_parser.add_argument(
+        "--since",
+        type=parse_site_date,
+        help="Платежи, созданные начиная с даты (2026-10-16 или 2026-10-16T12:00)",
+    )
+    export_parser.add_argument(
+        "--until", type=parse_site_date, help="Платежи, созданные до даты (не включая)"
+    )
+    export_parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="Файл контрольной точки: прерванная выгрузка продолжится с него",
+    )
+    export_parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=4,
+        help="Сколько страниц загружать одновременно (по умолчанию 4)",
+    )
+    export_parser.add_argument(
+        "--max-pages", type=int, help="Максимум страниц за запуск"
+    )
+
     args = parser.parse_args()
 
     if args.command == "create":
         return create_payment(args)
     elif args.command == "check":
         return check_payment(args)
+    elif args.command == "serve":
+        return serve(args)
+    elif args.command == "poll":
+        return poll(args)
+    elif args.command == "export":
+        return export_payments(args)
     else:
         parser.print_help()
         return 1
@@ -1,37 +1,139 @@
-import json
+import codecs
 import logging
+import os
 import random
-import requests
-from bs4 import BeautifulSoup
-from typing import Dict, Optional
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from models import PaymentMethod, PaymentRequest, PaymentResponse, PaymentInfo
+from parsing import (
+    PaymentListPage,
+    find_payment,
+    get_backend,
+    is_token_error,
+    parse_deposit_page,
+    parse_payment_list,
+    parse_payment_created,
+    payment_row_scanner,
+)
+from batch import BatchItem, PaymentBatch
+from cookie_store import CookieStore
+from idempotency import IdempotencyRecord, IdempotencyStore
+from ledger import PaymentLedger
+from metrics import NULL_METRICS, Metrics, timed
+from payment_form import PaymentForms, payment_headers
+from payment_sync import IncrementalSync, PaymentDiff
+from rate_limiter import BUDGET_DEPOSIT, BUDGET_LIST, BUDGET_METHOD, RateLimiter
+from response_cache import CachedPage, ResponseCache
+from retry import RetryPolicy
+from token_cache import TokenCache
 
+if TYPE_CHECKING:
+    from payment_events import EventDispatcher
+    from payment_export import ExportSummary
 
-class LolzPayment:
+    # requests импортируется при первом запросе: его импорт занимает
+    # значительную часть времени запуска, а асинхронному клиенту он не нужен
+    import requests
+
+
+class BaseLolzPayment:
     """
-    Основной класс для работы с платежами Lolz Market.
-    Позволяет создавать платежи и проверять их статус.
+    Общая часть синхронного и асинхронного клиентов: настройки, cookies,
+    проверка параметров платежа, формирование запросов и разбор ответов.
+    Сетевые вызовы реализуются в наследниках.
     """
 
     def __init__(
-        self, cookies_path: str, logger: Optional[logging.Logger] = None
+        self,
+        cookies_path: str,
+        logger: Optional[logging.Logger] = None,
+        base_url: str = "https://lzt.market",
+        token_ttl: float = 300.0,
+        token_cache: Optional[TokenCache] = None,
+        parser_backend: Optional[str] = None,
+        stream_list: bool = False,
+        stream_chunk_size: int = 16384,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        idempotency_store: Optional[IdempotencyStore] = None,
+        ledger: Optional[PaymentLedger] = None,
+        metrics: Optional[Metrics] = None,
+        events: Optional["EventDispatcher"] = None,
+        cookie_store: Optional[CookieStore] = None,
     ) -> None:
         """
-        Инициализация клиента для работы с платежами.
-
         Args:
             cookies_path: Путь к файлу с cookies в формате JSON
             logger: Опциональный логгер для записи сообщений
+            base_url: Адрес сайта (можно заменить на локальный сервер для тестов)
+            token_ttl: Время жизни закэшированных токенов в секундах
+            token_cache: Общий кэш токенов (например, для нескольких клиентов)
+            parser_backend: Бэкенд разбора HTML ("lxml", "html.parser" или None)
+            stream_list: Читать /payment/list потоком при проверке одного платежа
+            stream_chunk_size: Размер куска при потоковом чтении в байтах
+            rate_limiter: Лимиты частоты и параллельности запросов
+                (по умолчанию RateLimiter() с настройками по умолчанию)
+            retry_policy: Политика повторов GET-запросов (NO_RETRY - без повторов)
+            idempotency_store: Хранилище ключей идемпотентности create_payment
+                (по умолчанию - в памяти процесса)
+            ledger: Журнал платежей: созданные платежи и их статусы сохраняются,
+                а оплаченные проверяются без запроса к сайту
+            metrics: Метрики и трассировка этапов (по умолчанию отключены)
+            events: Диспетчер событий: для платежей, оплата которых обнаружена
+                при проверке или синхронизации, создаются события payment.completed
+            cookie_store: Источник cookies; запущенный (CookieStore.start)
+                перечитывает файл при изменении, и клиент переключается на новые
+                cookies без перезапуска (по умолчанию файл читается один раз)
         """
         self.cookies_path = cookies_path
-        self.cookies = self._load_cookies()
-        self.base_url = "https://lzt.market"
+        # Имя аккаунта в журнале платежей - имя файла cookies без расширения
+        self.account_name = os.path.splitext(os.path.basename(cookies_path))[0]
+        self.cookie_store = cookie_store or CookieStore(cookies_path, logger=logger)
+        self.cookie_store.subscribe(self._warm_up_cookies, self._cookies_swapped)
+        self.base_url = base_url.rstrip("/")
+        self.token_cache = token_cache or TokenCache(ttl=token_ttl)
+        self.parser_backend = get_backend(parser_backend).name
+        self.stream_list = stream_list
+        self.stream_chunk_size = stream_chunk_size
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.idempotency_store = idempotency_store or IdempotencyStore()
+        self.ledger = ledger
+        self.metrics = metrics or NULL_METRICS
+        self.events = events
+        # Состояние инкрементальной синхронизации списка платежей (sync_payments)
+        self.payment_sync = IncrementalSync()
+
+        # Состояние сессии: None - еще не проверялась, False - сайт вернул форму входа
+        self.authorized: Optional[bool] = None
+        # Количество подряд идущих ошибок запросов (не 200 или сетевая ошибка)
+        self.consecutive_errors = 0
         self.headers = {
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
             "Referer": "https://lzt.market/",
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
         }
+        # Запрос создания платежа собирается из заготовок: URL и заголовки
+        # общие для всех платежей, тело - из шаблона метода оплаты и токенов
+        self._payment_url = f"{self.base_url}/payment/method"
+        self._payment_headers = payment_headers(self.headers, self._deposit_url())
+        self._payment_forms = PaymentForms(self.base_url)
         self.method_mapping = {
             PaymentMethod.CARD.value: "Paymentlnk_Card",  # от 10р
             PaymentMethod.SBP.value: "Paymentlnk_Sbp",  # от 10р
@@ -58,68 +160,673 @@ class LolzPayment:
             self.logger.addHandler(handler)
             self.logger.setLevel(logging.INFO)
 
-    def _load_cookies(self) -> Dict[str, str]:
-        """Загрузка cookies из файла"""
-        try:
-            with open(self.cookies_path, "r") as file:
-                cookies_list = json.load(file)
-            return {cookie["name"]: cookie["value"] for cookie in cookies_list}
-        except Exception as e:
-            error_msg = f"Ошибка загрузки cookies: {e}"
-            print(error_msg)
-            if hasattr(self, "logger"):
+    @property
+    def cookies(self) -> Dict[str, str]:
+        """Текущие cookies аккаунта (см. cookie_store)"""
+        return self.cookie_store.cookies
+
+    def _warm_up_cookies(self, cookies: Dict[str, str]) -> None:
+        """
+        Подготовка к ротации cookies до переключения на них (вызывается
+        из потока CookieStore). В базовом классе ничего не делает.
+        """
+
+    def _cookies_swapped(self, old: Dict[str, str], new: Dict[str, str]) -> None:
+        """Сброс состояния, привязанного к прежним cookies"""
+        self.token_cache.invalidate(self.token_cache.cookie_key(old))
+        self.authorized = None
+        self.consecutive_errors = 0
+
+    @property
+    def _token_key(self) -> str:
+        """Ключ кэша токенов для текущих cookies"""
+        return self.token_cache.cookie_key(self.cookies)
+
+    def _deposit_url(self) -> str:
+        return f"{self.base_url}/payment/balance/deposit"
+
+    def _list_url(self) -> str:
+        return f"{self.base_url}/payment/list"
+
+    def _tokens_from_html(self, html: str) -> Optional[Dict[str, str]]:
+        """Разбор страницы депозита с записью ошибок в лог"""
+        with self.metrics.stage("parse_deposit_page", backend=self.parser_backend):
+            page = parse_deposit_page(html, self.parser_backend)
+
+        if page.login_required:
+            self.authorized = False
+            self.metrics.count("auth_failures")
+            error_msg = "Ошибка авторизации: Не удалось получить токены. Пользователь не авторизован (cookie устарели или недействительны)"
+            self.logger.error(error_msg)
+            self.logger.debug(f"Текущие cookie: {self.cookies}")
+            return None
+
+        if not page.tokens:
+            error_msg = "Не удалось найти токены на странице. Проверьте валидность cookie или изменения в структуре сайта."
+            self.logger.error(error_msg)
+            return None
+
+        self.authorized = True
+        return page.tokens
+
+    def _record_status(
+        self, status_code: Optional[int], budget: Optional[str] = None
+    ) -> None:
+        """Учет результата запроса для оценки здоровья сессии (None - сетевая ошибка)"""
+        self.metrics.count(
+            "http_responses", budget=budget, status=status_code or "error"
+        )
+        if status_code == 200:
+            self.consecutive_errors = 0
+        else:
+            self.consecutive_errors += 1
+
+    def _prepare_request(
+        self, amount: float, payment_method: str, phone: Optional[str]
+    ) -> Union[PaymentRequest, PaymentResponse]:
+        """
+        Проверка параметров платежа.
+
+        Returns:
+            PaymentRequest при корректных параметрах, иначе PaymentResponse с ошибкой
+        """
+        # Проверка минимальной суммы
+        if amount < self.min_amounts.get(payment_method, 0):
+            min_amount = self.min_amounts.get(payment_method, 0)
+            error_msg = f"Минимальная сумма для метода '{payment_method}' составляет {min_amount} руб."
+            self.logger.error(error_msg)
+            return PaymentResponse(error=error_msg)
+
+        # Проверка наличия телефона для СБП
+        if payment_method == PaymentMethod.SBP.value and not phone:
+            # Если телефон не указан, генерируем случайный
+            phone = f"+7{random.randint(9000000000, 9999999999)}"
+            self.logger.warning(
+                f"Для СБП не указан телефон, используем случайный: {phone}"
+            )
+
+        method_enum = PaymentMethod(payment_method)
+
+        return PaymentRequest(amount, method_enum, phone)
+
+    def _prepare_batch(
+        self, requests: Iterable[PaymentRequest]
+    ) -> Tuple[List[Tuple[int, PaymentRequest, PaymentRequest]], List[BatchItem]]:
+        """
+        Проверка всех запросов пакета до отправки.
+
+        Returns:
+            Пары (позиция, исходный запрос, проверенный запрос) для отправки
+            и результаты с ошибкой для отклоненных запросов
+        """
+        accepted = []
+        rejected = []
+        for index, request in enumerate(requests):
+            method = request.payment_method
+            if isinstance(method, PaymentMethod):
+                method = method.value
+
+            if method not in self.method_mapping:
+                error_msg = f"Неизвестный метод оплаты: {method}"
                 self.logger.error(error_msg)
+                prepared = PaymentResponse(error=error_msg)
+            else:
+                prepared = self._prepare_request(request.amount, method, request.phone)
+
+            if isinstance(prepared, PaymentResponse):
+                rejected.append(BatchItem(index, request, prepared))
+            else:
+                accepted.append((index, request, prepared))
+        return accepted, rejected
+
+    def _build_payment_form(
+        self, request: PaymentRequest, tokens: Dict[str, str]
+    ) -> Tuple[str, Mapping[str, str], bytes]:
+        """Формирование URL, заголовков и тела запроса создания платежа"""
+        template = self._payment_forms.get(
+            self.method_mapping[request.payment_method.value], tokens
+        )
+        phone = request.phone if request.payment_method == PaymentMethod.SBP else None
+        return self._payment_url, self._payment_headers, template.render(
+            request.amount, phone
+        )
+
+    @staticmethod
+    def _tokens_error() -> PaymentResponse:
+        """Ответ на платеж, для которого не удалось получить токены"""
+        return PaymentResponse(
+            error="Не удалось получить токены для платежа", retryable=True
+        )
+
+    def _prepare_forms(self, tokens: Dict[str, str]) -> None:
+        """Шаблоны форм всех методов оплаты для токенов (до первого платежа)"""
+        for method in self.method_mapping.values():
+            self._payment_forms.get(method, tokens)
+
+    def _count_token_cache(self, cache_key: str) -> None:
+        """Учет попадания в кэш токенов (только при включенных метриках)"""
+        if self.metrics.enabled:
+            hit = self.token_cache.peek(cache_key) is not None
+            self.metrics.count("token_cache", result="hit" if hit else "miss")
+
+    def _idempotent_response(
+        self, record: IdempotencyRecord, fingerprint: str
+    ) -> Optional[PaymentResponse]:
+        """
+        Ранее созданный по ключу платеж (или ошибка, если параметры другие).
+        None - ответ на отправленную форму был потерян, и счет нужно искать
+        в списке платежей.
+        """
+        if record.fingerprint != fingerprint:
+            response = self.idempotency_store.mismatch_error(record.key)
+            self.logger.error(response.error)
+            return response
+        if not record.completed:
+            return None
+        self.logger.info(
+            f"Платеж по ключу идемпотентности {record.key} уже создан: "
+            f"{record.payment_id}"
+        )
+        return record.to_response()
+
+    def _reconciled_response(
+        self,
+        record: IdempotencyRecord,
+        html: Optional[str],
+        amount: float,
+        payment_method: str,
+    ) -> PaymentResponse:
+        """
+        Сверка ключа с потерянным ответом со страницей списка платежей:
+        найденный счет сохраняется под ключом, иначе повтор отклоняется.
+        """
+        payment_info = None
+        if html is not None:
+            page = parse_payment_list(html, self._list_url(), self.parser_backend)
+            payment_info = self.idempotency_store.match(
+                record, page.payments.values(), amount, payment_method
+            )
+        if payment_info is None:
+            response = self.idempotency_store.in_doubt_error(record.key)
+            self.logger.error(response.error)
+            return response
+
+        response = PaymentResponse(payment_id=payment_info.payment_id)
+        self.idempotency_store.finish(record.key, response)
+        self.logger.info(
+            f"Платеж по ключу идемпотентности {record.key} найден в списке: "
+            f"{payment_info.payment_id}"
+        )
+        return response
+
+    def _payment_response(
+        self, status_code: int, response_json: Any
+    ) -> PaymentResponse:
+        """Преобразование ответа /payment/method в PaymentResponse"""
+        if status_code != 200:
+            error_msg = f"Ошибка: Получен статус код {status_code}"
+            self.logger.error(error_msg)
+            # На ошибку сервера форма могла быть обработана
+            return PaymentResponse(error=error_msg, in_doubt=status_code >= 500)
+
+        created = parse_payment_created(response_json)
+        if created:
+            self.logger.info(f"Успешно создан платеж: {created['payment_id']}")
+            return PaymentResponse(**created)
+
+        error_msg = "Не удалось получить информацию о платеже"
+        self.logger.error(error_msg)
+        return PaymentResponse(error=error_msg)
+
+    def _ledger_record_created(
+        self, request: PaymentRequest, response: PaymentResponse
+    ) -> None:
+        """Запись созданного платежа в журнал"""
+        if not self.ledger or not response.payment_id:
+            return
+        try:
+            self.ledger.record_created(
+                response,
+                request.amount,
+                request.payment_method.value,
+                self.account_name,
+            )
+        except sqlite3.Error as e:
+            self.logger.error(f"Ошибка записи платежа в журнал: {e}")
+
+    def _ledger_completed(self, payment_ids: Iterable[str]) -> Dict[str, PaymentInfo]:
+        """Оплаченные платежи, известные журналу"""
+        if not self.ledger:
             return {}
+        try:
+            found = self.ledger.completed(payment_ids)
+        except sqlite3.Error as e:
+            self.logger.error(f"Ошибка чтения журнала платежей: {e}")
+            return {}
+        if found:
+            self.logger.debug(f"Оплаченных платежей из журнала: {len(found)}")
+        return found
 
-    def _get_tokens(self) -> Optional[Dict[str, str]]:
-        """Получение токенов xf_token и service_id со страницы депозита"""
+    def _ledger_update(
+        self, payments: Iterable[Optional[PaymentInfo]], emit_events: bool = True
+    ) -> None:
+        """Запись изменившихся статусов платежей в журнал и событий об оплате"""
+        payments = [info for info in payments if info]
+        if emit_events:
+            self._emit_completed(payments)
+        if not self.ledger:
+            return
         try:
-            page_url = f"{self.base_url}/payment/balance/deposit"
-            response = requests.get(
-                page_url, headers=self.headers, cookies=self.cookies
+            self.ledger.update_statuses(payments, self.account_name)
+        except sqlite3.Error as e:
+            self.logger.error(f"Ошибка записи статусов в журнал: {e}")
+
+    def _emit_completed(self, payments: Iterable[PaymentInfo]) -> None:
+        """События payment.completed (повторные отбрасывает диспетчер)"""
+        if not self.events:
+            return
+        emitted = self.events.emit_completed(payments, self.account_name)
+        if emitted:
+            self.logger.debug(f"Событий об оплате: {emitted}")
+
+    def _payment_info_from_html(
+        self, html: str, payment_id: str
+    ) -> Optional[PaymentInfo]:
+        """Поиск платежа на странице списка с записью результата в лог"""
+        with self.metrics.stage("find_payment", backend=self.parser_backend):
+            payment_info = find_payment(html, payment_id, self.parser_backend)
+        self._log_payment_lookup(payment_id, payment_info)
+        return payment_info
+
+    def _log_payment_lookup(
+        self, payment_id: str, payment_info: Optional[PaymentInfo]
+    ) -> None:
+        if payment_info:
+            self.logger.info(f"Получена информация о платеже: {payment_id}")
+        else:
+            self.logger.warning(f"Платеж с ID {payment_id} не найден")
+
+    @staticmethod
+    def _stream_decoder(charset: Optional[str]) -> codecs.IncrementalDecoder:
+        """
+        Декодер для потокового чтения страницы. Без явной кодировки в заголовках
+        используется UTF-8 (а не ISO-8859-1, как для text/* в requests).
+        """
+        try:
+            decoder_class = codecs.getincrementaldecoder(charset or "utf-8")
+        except LookupError:
+            decoder_class = codecs.getincrementaldecoder("utf-8")
+        return decoder_class(errors="replace")
+
+    def _collect_payments(
+        self,
+        html: str,
+        page_url: str,
+        pending: set,
+        results: Dict[str, Optional[PaymentInfo]],
+    ) -> Optional[str]:
+        """
+        Заполнение results платежами со страницы списка.
+
+        Returns:
+            Optional[str]: URL следующей страницы, если еще остались ненайденные ID
+        """
+        with self.metrics.stage("parse_payment_list", backend=self.parser_backend):
+            page = parse_payment_list(html, page_url, self.parser_backend)
+        for payment_id in list(pending):
+            payment_info = page.payments.get(payment_id)
+            if payment_info:
+                results[payment_id] = payment_info
+                pending.discard(payment_id)
+        return page.next_url if pending else None
+
+    def _log_sync_result(self, diff: PaymentDiff) -> None:
+        # Оплаченные платежи, впервые увиденные синхронизацией, - история,
+        # а не переход статуса: события создаются только для изменившихся
+        self._ledger_update(diff.payments, emit_events=False)
+        self._emit_completed(diff.changed)
+        self.logger.info(
+            f"Синхронизация списка платежей: новых {len(diff.new)}, "
+            f"изменилось {len(diff.changed)}, строк прочитано {diff.rows_scanned}, "
+            f"страниц {diff.pages}"
+        )
+
+    def _log_batch_result(self, results: Dict[str, Optional[PaymentInfo]]) -> None:
+        missing = [payment_id for payment_id, info in results.items() if not info]
+        self.logger.info(
+            f"Получена информация о платежах: {len(results) - len(missing)} из {len(results)}"
+        )
+        if missing:
+            self.logger.warning(f"Платежи не найдены: {', '.join(missing)}")
+
+
+class LolzPayment(BaseLolzPayment):
+    """
+    Основной класс для работы с платежами Lolz Market.
+    Позволяет создавать платежи и проверять их статус.
+    """
+
+    def __init__(
+        self,
+        cookies_path: str,
+        logger: Optional[logging.Logger] = None,
+        base_url: str = "https://lzt.market",
+        pool_connections: int = 4,
+        pool_maxsize: int = 16,
+        pool_block: bool = False,
+        keep_alive: bool = True,
+        timeout: Union[float, Tuple[float, float]] = (5.0, 30.0),
+        token_ttl: float = 300.0,
+        token_cache: Optional[TokenCache] = None,
+        parser_backend: Optional[str] = None,
+        stream_list: bool = False,
+        stream_chunk_size: int = 16384,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        idempotency_store: Optional[IdempotencyStore] = None,
+        ledger: Optional[PaymentLedger] = None,
+        metrics: Optional[Metrics] = None,
+        events: Optional["EventDispatcher"] = None,
+        response_cache: Optional[ResponseCache] = None,
+        cookie_store: Optional[CookieStore] = None,
+    ) -> None:
+        """
+        Инициализация клиента для работы с платежами.
+
+        Args:
+            cookies_path: Путь к файлу с cookies в формате JSON
+            logger: Опциональный логгер для записи сообщений
+            base_url: Адрес сайта (можно заменить на локальный сервер для тестов)
+            pool_connections: Количество пулов соединений (по одному на хост)
+            pool_maxsize: Максимум соединений в пуле на один хост
+            pool_block: Ждать свободное соединение вместо открытия нового сверх лимита
+            keep_alive: Переиспользовать соединения между запросами
+            timeout: Таймаут запроса в секундах или пара (connect, read)
+            token_ttl: Время жизни закэшированных токенов в секундах
+            token_cache: Общий кэш токенов (например, для нескольких клиентов)
+            parser_backend: Бэкенд разбора HTML ("lxml", "html.parser" или None)
+            stream_list: Читать /payment/list потоком при проверке одного платежа
+            stream_chunk_size: Размер куска при потоковом чтении в байтах
+            rate_limiter: Лимиты частоты и параллельности запросов
+                (по умолчанию RateLimiter() с настройками по умолчанию)
+            retry_policy: Политика повторов GET-запросов (NO_RETRY - без повторов)
+            idempotency_store: Хранилище ключей идемпотентности create_payment
+                (по умолчанию - в памяти процесса)
+            ledger: Журнал платежей: созданные платежи и их статусы сохраняются,
+                а оплаченные проверяются без запроса к сайту
+            metrics: Метрики и трассировка этапов (по умолчанию отключены)
+            events: Диспетчер событий: для платежей, оплата которых обнаружена
+                при проверке или синхронизации, создаются события payment.completed
+            response_cache: Кэш страниц списка платежей и депозита: одновременные
+                и частые проверки используют одну загрузку (по умолчанию выключен)
+            cookie_store: Источник cookies; запущенный (CookieStore.start)
+                перечитывает файл при изменении, и клиент переключается на новые
+                cookies без перезапуска (по умолчанию файл читается один раз)
+        """
+        super().__init__(
+            cookies_path,
+            logger=logger,
+            base_url=base_url,
+            token_ttl=token_ttl,
+            token_cache=token_cache,
+            parser_backend=parser_backend,
+            stream_list=stream_list,
+            stream_chunk_size=stream_chunk_size,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            idempotency_store=idempotency_store,
+            ledger=ledger,
+            metrics=metrics,
+            events=events,
+            cookie_store=cookie_store,
+        )
+        self.timeout = timeout
+        self.response_cache = response_cache
+
+        # Общий пул соединений для всех запросов клиента создается при первом
+        # запросе (см. session)
+        self._pool_options = (pool_connections, pool_maxsize, pool_block, keep_alive)
+        self._session: Optional["requests.Session"] = None
+        self._session_lock = threading.Lock()
+
+    def __enter__(self) -> "LolzPayment":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Закрытие всех соединений пула"""
+        if self._session is not None:
+            self._session.close()
+
+    def _warm_up_cookies(self, cookies: Dict[str, str]) -> None:
+        """Токены для новых cookies до переключения на них"""
+        key = self.token_cache.cookie_key(cookies)
+        if self.token_cache.peek(key):
+            return
+        tokens = self.token_cache.get(key, lambda: self._get_tokens(cookies))
+        if tokens:
+            self.logger.info("Токены для новых cookies получены")
+        else:
+            self.logger.warning(
+                "Не удалось получить токены для новых cookies, "
+                "они будут запрошены при первом платеже"
             )
 
-            if response.status_code != 200:
-                error_msg = f"Ошибка: Получен статус код {response.status_code}"
-                self.logger.error(error_msg)
-                return None
+    def _cookies_swapped(self, old: Dict[str, str], new: Dict[str, str]) -> None:
+        super()._cookies_swapped(old, new)
+        # Cookies, выставленные сайтом для прежней сессии, больше не нужны
+        if self._session is not None:
+            self._session.cookies.clear()
 
-            soup = BeautifulSoup(response.text, "html.parser")
+    def warm_up(self) -> bool:
+        """
+        Подготовка клиента к платежам при запуске сервиса: открывает
+        соединение, получает токены (и этим проверяет сессию) и готовит
+        шаблоны форм, чтобы первый платеж не ждал страницу депозита.
 
-            login_form = soup.find("form", {"action": "/login/login"})
-            if login_form:
-                error_msg = "Ошибка авторизации: Не удалось получить токены. Пользователь не авторизован (cookie устарели или недействительны)"
-                self.logger.error(error_msg)
-                self.logger.debug(f"Текущие cookie: {self.cookies}")
-                return None
+        Returns:
+            bool: True, если токены получены
+        """
+        cookies = self.cookies
+        tokens = self.token_cache.get(
+            self.token_cache.cookie_key(cookies), lambda: self._get_tokens(cookies)
+        )
+        if not tokens:
+            self.logger.error("Прогрев клиента: не удалось получить токены")
+            return False
+        self._prepare_forms(tokens)
+        self.logger.info("Клиент готов к созданию платежей")
+        return True
+
+    def _refresh_tokens(self) -> Optional[Dict[str, str]]:
+        """Загрузка новых токенов на замену действующим (см. TokenRefresher)"""
+        cookies = self.cookies
+        # Закэшированная страница депозита содержит прежние токены
+        self._invalidate_page(self._deposit_url())
+        tokens = self.token_cache.refresh(
+            self.token_cache.cookie_key(cookies), lambda: self._get_tokens(cookies)
+        )
+        if tokens:
+            self._prepare_forms(tokens)
+        return tokens
+
+    @property
+    def session(self) -> "requests.Session":
+        """Сессия с пулом соединений (создается при первом обращении)"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session(*self._pool_options)
+        return self._session
+
+    @staticmethod
+    def _create_session(
+        pool_connections: int, pool_maxsize: int, pool_block: bool, keep_alive: bool
+    ) -> "requests.Session":
+        """Создание сессии с пулом соединений, общей для всех потоков"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def _request(
+        self, method: str, url: str, budget: Optional[str] = None, **kwargs
+    ) -> "requests.Response":
+        """
+        Выполнение HTTP-запроса через общий пул соединений.
+
+        Args:
+            method: HTTP-метод
+            url: Адрес запроса
+            budget: Тип запроса для лимитов частоты (BUDGET_DEPOSIT, ...)
+            **kwargs: Параметры requests.Session.request
+        """
+        kwargs.setdefault("headers", self.headers)
+        kwargs.setdefault("cookies", self.cookies)
+        kwargs.setdefault("timeout", self.timeout)
+        session = self.session
+        from requests import RequestException
+
+        attempt = 0
+        while True:
+            attempt += 1
+            self.rate_limiter.acquire(budget)
+            started = time.monotonic()
+            status_code = None
+            response = None
+            try:
+                with self.metrics.stage("http_request", budget=budget):
+                    response = session.request(method, url, **kwargs)
+                status_code = response.status_code
+                if self.metrics.enabled and not kwargs.get("stream"):
+                    self.metrics.count(
+                        "http_bytes", len(response.content), budget=budget
+                    )
+            except RequestException:
+                # Повторяются только идемпотентные GET-запросы
+                if method != "GET" or not self.retry_policy.should_retry(attempt, None):
+                    raise
+            finally:
+                self.rate_limiter.release(status_code, time.monotonic() - started)
+                self._record_status(status_code, budget)
+
+            if method != "GET" or not self.retry_policy.should_retry(
+                attempt, status_code
+            ):
+                return response
+
+            delay = self.retry_policy.delay(
+                attempt, response.headers if response is not None else None
+            )
+            self.logger.warning(
+                f"Повтор запроса {url} через {delay:.2f} с (попытка {attempt + 1}, статус {status_code})"
+            )
+            self.metrics.count("retries", budget=budget)
+            if response is not None:
+                response.close()
+            time.sleep(delay)
 
-            # Ищем токены
-            xf_token_elem = soup.find("input", {"name": "_xfToken"})
-            service_id_elem = soup.find("input", {"name": "service_id"})
+    def _get_page(
+        self, url: str, budget: str, cookies: Optional[Dict[str, str]] = None
+    ) -> CachedPage:
+        """
+        GET-запрос страницы через кэш ответов (если он задан).
+        Без кэша страница загружается при каждом вызове.
+
+        Args:
+            url: Адрес страницы
+            budget: Тип запроса для лимитов частоты
+            cookies: Cookies запроса (по умолчанию - текущие)
+        """
+        if cookies is None:
+            cookies = self.cookies
+        if self.response_cache is None:
+            return self._fetch_page(url, budget, {}, cookies)
+
+        page, outcome = self.response_cache.get(
+            self._page_key(url, cookies),
+            lambda validators: self._fetch_page(url, budget, validators, cookies),
+            self.response_cache.ttl_for(budget),
+        )
+        self.metrics.count("response_cache", budget=budget, result=outcome)
+        return page
 
-            if not xf_token_elem or not service_id_elem:
-                error_msg = "Не удалось найти токены на странице. Проверьте валидность cookie или изменения в структуре сайта."
+    def _page_key(self, url: str, cookies: Optional[Dict[str, str]] = None) -> str:
+        """Ключ кэша ответов: страницы разных аккаунтов различаются"""
+        return f"{self.token_cache.cookie_key(cookies or self.cookies)}:{url}"
+
+    def _invalidate_page(self, url: str) -> None:
+        if self.response_cache is not None:
+            self.response_cache.invalidate(self._page_key(url))
+
+    def _fetch_page(
+        self,
+        url: str,
+        budget: str,
+        validators: Dict[str, str],
+        cookies: Dict[str, str],
+    ) -> CachedPage:
+        """Загрузка страницы (с validators - условный запрос)"""
+        headers = {**self.headers, **validators} if validators else self.headers
+        response = self._request("GET", url, budget, headers=headers, cookies=cookies)
+        return CachedPage(
+            response.status_code,
+            response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+
+    @timed("get_tokens")
+    def _get_tokens(
+        self, cookies: Optional[Dict[str, str]] = None
+    ) -> Optional[Dict[str, str]]:
+        """
+        Получение токенов xf_token и service_id со страницы депозита.
+
+        Args:
+            cookies: Cookies запроса (по умолчанию - текущие)
+        """
+        page = None
+        try:
+            page = self._get_page(self._deposit_url(), BUDGET_DEPOSIT, cookies)
+
+            if page.status_code != 200:
+                error_msg = f"Ошибка: Получен статус код {page.status_code}"
                 self.logger.error(error_msg)
                 return None
 
-            xf_token = xf_token_elem["value"]
-            service_id = service_id_elem["value"]
-
-            return {"xf_token": xf_token, "service_id": service_id}
+            return self._tokens_from_html(page.text)
         except Exception as e:
             error_msg = f"Ошибка получения токенов: {e}"
             self.logger.error(error_msg)
 
-            if hasattr(self, "logger") and self.logger.level <= logging.DEBUG:
+            if self.logger.level <= logging.DEBUG and page is not None:
                 import traceback
 
                 self.logger.debug(
-                    f"Трассировка ошибки: {traceback.format_exc()}\nСтраница: {response.text}"
+                    f"Трассировка ошибки: {traceback.format_exc()}\nСтраница: {page.text}"
                 )
             return None
 
     def create_payment(
-        self, amount: float, payment_method: str, phone: Optional[str] = None
+        self,
+        amount: float,
+        payment_method: str,
+        phone: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
     ) -> PaymentResponse:
         """
         Создание нового платежа в системе Lolz Market.
@@ -128,136 +835,473 @@ class LolzPayment:
             amount: Сумма платежа
             payment_method: Метод оплаты ('card', 'sbp', 'binance', 'steam')
             phone: Номер телефона (обязателен для СБП)
+            idempotency_key: Ключ идемпотентности: повторный вызов с тем же ключом
+                вернет уже созданный платеж вместо создания нового. Если ответ
+                на форму с этим ключом был потерян, форма не отправляется
+                повторно: счет ищется в списке платежей
 
         Returns:
             PaymentResponse: Ответ с информацией о платеже или ошибкой
         """
-        try:
-            # Проверка минимальной суммы
-            if amount < self.min_amounts.get(payment_method, 0):
-                min_amount = self.min_amounts.get(payment_method, 0)
-                error_msg = f"Минимальная сумма для метода '{payment_method}' составляет {min_amount} руб."
-                self.logger.error(error_msg)
-                return PaymentResponse(error=error_msg)
+        if not idempotency_key:
+            return self._create_payment(amount, payment_method, phone)
 
-            # Проверка наличия телефона для СБП
-            if payment_method == PaymentMethod.SBP.value and not phone:
-                # Если телефон не указан, генерируем случайный
-                phone = f"+7{random.randint(9000000000, 9999999999)}"
-                self.logger.warning(
-                    f"Для СБП не указан телефон, используем случайный: {phone}"
+        store = self.idempotency_store
+        fingerprint = store.fingerprint(amount, payment_method, phone)
+        with store.locked(idempotency_key):
+            record = store.get(idempotency_key)
+            if record:
+                existing = self._idempotent_response(record, fingerprint)
+                if existing:
+                    return existing
+                return self._reconcile_payment(record, amount, payment_method)
+
+            store.reserve(idempotency_key, fingerprint, self.cookies_path)
+            response = self._create_payment(amount, payment_method, phone)
+            store.finish(idempotency_key, response)
+            return response
+
+    def _reconcile_payment(
+        self, record: IdempotencyRecord, amount: float, payment_method: str
+    ) -> PaymentResponse:
+        """Поиск счета с потерянным ответом на первой странице списка платежей"""
+        html = None
+        try:
+            # Мимо кэша ответов: счет мог появиться после загрузки страницы
+            response = self._request("GET", self._list_url(), BUDGET_LIST)
+            if response.status_code == 200:
+                html = response.text
+            else:
+                self.logger.error(
+                    f"Ошибка: Получен статус код {response.status_code}"
                 )
+        except Exception as e:
+            self.logger.error(f"Ошибка загрузки списка платежей: {e}")
+        return self._reconciled_response(record, html, amount, payment_method)
 
-            method_enum = PaymentMethod(payment_method)
+    def _create_payment(
+        self, amount: float, payment_method: str, phone: Optional[str]
+    ) -> PaymentResponse:
+        """Создание платежа без учета ключа идемпотентности"""
+        try:
+            request = self._prepare_request(amount, payment_method, phone)
+        except Exception as e:
+            error_msg = f"Произошла ошибка: {str(e)}"
+            self.logger.error(error_msg)
+            return PaymentResponse(error=error_msg)
 
-            request = PaymentRequest(amount, method_enum, phone)
+        if isinstance(request, PaymentResponse):
+            return request
+        return self._submit_payment(request)
 
-            # Получение токенов для запроса
-            tokens = self._get_tokens()
+    @timed("create_payment")
+    def _submit_payment(self, request: PaymentRequest) -> PaymentResponse:
+        """Отправка проверенного запроса с получением (или обновлением) токенов"""
+        sent = False
+        try:
+            # Получение токенов для запроса (из кэша, если они еще действуют)
+            cache_key = self._token_key
+            self._count_token_cache(cache_key)
+            tokens = self.token_cache.get(cache_key, self._get_tokens)
             if not tokens:
-                return PaymentResponse(error="Не удалось получить токены для платежа")
+                return self._tokens_error()
+
+            sent = True
+            status_code, response_json = self._post_payment(request, tokens)
+
+            if is_token_error(status_code, response_json):
+                self.metrics.count("token_rejected")
+                # Токены устарели: сбрасываем кэш и повторяем запрос один раз
+                self.logger.warning(
+                    "Сервер отклонил токены, получаем новые и повторяем запрос"
+                )
+                self.token_cache.rejected(cache_key, tokens)
+                # Закэшированная страница депозита содержит те же токены
+                self._invalidate_page(self._deposit_url())
+                tokens = self.token_cache.get(cache_key, self._get_tokens)
+                if not tokens:
+                    return self._tokens_error()
+                status_code, response_json = self._post_payment(request, tokens)
+
+            response = self._payment_response(status_code, response_json)
+            if response.payment_id:
+                # Новый платеж появится только в заново загруженном списке
+                self._invalidate_page(self._list_url())
+            self._ledger_record_created(request, response)
+            return response
 
-            url = f"{self.base_url}/payment/method"
-            modified_headers = self.headers.copy()
-            modified_headers["Content-Type"] = "application/x-www-form-urlencoded"
-            modified_headers["Accept"] = (
-                "application/json, text/javascript, */*; q=0.01"
+        except Exception as e:
+            error_msg = f"Произошла ошибка: {str(e)}"
+            self.logger.error(error_msg)
+            # Таймаут или разрыв соединения после отправки формы
+            return PaymentResponse(error=error_msg, in_doubt=sent)
+
+    def _post_payment(
+        self, request: PaymentRequest, tokens: Dict[str, str]
+    ) -> Tuple[int, Any]:
+        """Отправка формы создания платежа, возвращает статус и JSON ответа"""
+        url, headers, data = self._build_payment_form(request, tokens)
+        with self.metrics.stage("post_payment"):
+            response = self._request(
+                "POST", url, BUDGET_METHOD, headers=headers, data=data
             )
-            modified_headers["Referer"] = f"{self.base_url}/payment/balance/deposit"
-
-            data = {
-                "currency": "rub",
-                "amount": str(request.amount),
-                "method": self.method_mapping[request.payment_method.value],
-                "extra[phone]": phone
-                if payment_method == PaymentMethod.SBP.value and phone
-                else "",
-                "service_type": "refill-balance",
-                "service_id": tokens["service_id"],
-                "redirect": f"{self.base_url}/",
-                "_xfConfirm": "1",
-                "_xfToken": tokens["xf_token"],
-                "_xfRequestUri": "/payment/balance/deposit",
-                "_xfNoRedirect": "1",
-                "_xfResponseType": "json",
-            }
+        if response.status_code != 200:
+            return response.status_code, None
+        with self.metrics.stage("decode_json"):
+            return response.status_code, response.json()
 
-            response = requests.post(
-                url, headers=modified_headers, cookies=self.cookies, data=data
+    def create_payments(
+        self, requests: Iterable[PaymentRequest], max_workers: int = 8
+    ) -> PaymentBatch:
+        """
+        Пакетное создание платежей.
+
+        Все запросы проверяются до отправки, токены получаются один раз и
+        используются всеми запросами, а POST-запросы выполняются параллельно
+        в пуле из max_workers потоков (с учетом rate_limiter).
+
+        Args:
+            requests: Запросы на создание платежей
+            max_workers: Максимум одновременно отправляемых запросов
+
+        Returns:
+            PaymentBatch: Итератор BatchItem в порядке завершения запросов
+                со сводкой в свойстве summary
+
+        Пример:
+            batch = lolz.create_payments(
+                PaymentRequest(100, PaymentMethod.SBP) for _ in range(200)
             )
+            for item in batch:
+                print(item.index, item.response.to_dict())
+            print(batch.summary.to_dict())
+        """
+        accepted, rejected = self._prepare_batch(requests)
+        total = len(accepted) + len(rejected)
+        return PaymentBatch(self._run_batch(accepted, rejected, max_workers), total)
 
-            if response.status_code != 200:
-                error_msg = f"Ошибка: Получен статус код {response.status_code}"
-                self.logger.error(error_msg)
-                return PaymentResponse(error=error_msg)
+    def _run_batch(
+        self,
+        accepted: List[Tuple[int, PaymentRequest, PaymentRequest]],
+        rejected: List[BatchItem],
+        max_workers: int,
+    ) -> Iterator[BatchItem]:
+        yield from rejected
+        if not accepted:
+            return
 
-            response_json = response.json()
-            redirect_target = response_json.get("_redirectTarget")
-            redirect_message = response_json.get("_redirectMessage")
+        # Токены получаются до отправки, чтобы потоки не ждали друг друга
+        if not self.token_cache.get(self._token_key, self._get_tokens):
+            for index, request, _ in accepted:
+                yield BatchItem(index, request, self._tokens_error())
+            return
 
-            if redirect_target and redirect_message:
-                payment_id = (
-                    redirect_message.split("=")[-1] if redirect_message else None
-                )
+        def submit(prepared: PaymentRequest) -> Tuple[PaymentResponse, float]:
+            started = time.monotonic()
+            response = self._submit_payment(prepared)
+            return response, time.monotonic() - started
 
-                self.logger.info(f"Успешно создан платеж: {payment_id}")
-                return PaymentResponse(final_url=redirect_target, payment_id=payment_id)
-            else:
-                error_msg = "Не удалось получить информацию о платеже"
-                self.logger.error(error_msg)
-                return PaymentResponse(error=error_msg)
+        import concurrent.futures
 
-        except Exception as e:
-            error_msg = f"Произошла ошибка: {str(e)}"
-            self.logger.error(error_msg)
-            return PaymentResponse(error=error_msg)
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="create_payments"
+        )
+        try:
+            futures = {
+                executor.submit(submit, prepared): (index, request)
+                for index, request, prepared in accepted
+            }
+            for future in concurrent.futures.as_completed(futures):
+                index, request = futures[future]
+                response, elapsed = future.result()
+                yield BatchItem(index, request, response, elapsed)
+        finally:
+            # При досрочном выходе из перебора неначатые запросы отменяются
+            executor.shutdown(wait=False, cancel_futures=True)
 
-    def check_payment(self, payment_id: str) -> Optional[PaymentInfo]:
+    @timed("check_payment")
+    def check_payment(
+        self, payment_id: str, stream: Optional[bool] = None
+    ) -> Optional[PaymentInfo]:
         """
         Проверка статуса платежа в системе Lolz Market.
 
         Args:
             payment_id: Идентификатор платежа для проверки
+            stream: Читать страницу потоком и прервать загрузку, как только
+                найдена строка платежа (по умолчанию - настройка stream_list)
 
         Returns:
             Optional[PaymentInfo]: Информация о платеже или None в случае ошибки
         """
+        completed = self._ledger_completed([payment_id])
+        if completed:
+            # Оплаченный платеж уже не изменится: ответ из журнала
+            return completed[payment_id]
+
         try:
-            url = f"{self.base_url}/payment/list"
-            response = requests.get(url, headers=self.headers, cookies=self.cookies)
+            if self.stream_list if stream is None else stream:
+                payment_info = self._check_payment_streamed(payment_id)
+            else:
+                page = self._get_page(self._list_url(), BUDGET_LIST)
+
+                if page.status_code != 200:
+                    error_msg = f"Ошибка: Получен статус код {page.status_code}"
+                    self.logger.error(error_msg)
+                    return None
+
+                payment_info = self._payment_info_from_html(page.text, payment_id)
+
+        except Exception as e:
+            error_msg = f"Ошибка получения информации о платеже: {e}"
+            self.logger.error(error_msg)
+            return None
+
+        self._ledger_update([payment_info])
+        return payment_info
 
+    def _check_payment_streamed(self, payment_id: str) -> Optional[PaymentInfo]:
+        """
+        Потоковый поиск платежа: страница читается кусками, и соединение
+        закрывается сразу после того, как строка платежа прочитана целиком.
+        """
+        response = self._request("GET", self._list_url(), BUDGET_LIST, stream=True)
+        try:
             if response.status_code != 200:
                 error_msg = f"Ошибка: Получен статус код {response.status_code}"
                 self.logger.error(error_msg)
                 return None
 
-            soup = BeautifulSoup(response.text, "html.parser")
-            payment_row = soup.find("td", string=payment_id)
+            content_type = response.headers.get("content-type", "").lower()
+            decoder = self._stream_decoder(
+                response.encoding if "charset=" in content_type else None
+            )
+            scanner = payment_row_scanner(payment_id, self.parser_backend)
+            payment_info = None
+            bytes_read = 0
+            for chunk in response.iter_content(chunk_size=self.stream_chunk_size):
+                bytes_read += len(chunk)
+                payment_info = scanner.feed(decoder.decode(chunk))
+                if payment_info:
+                    break
+            else:
+                scanner.feed(decoder.decode(b"", final=True))
+                payment_info = scanner.close()
 
-            if payment_row:
-                row = payment_row.find_parent("tr")
-                cells = row.find_all("td")
+            self.logger.debug(f"Прочитано {bytes_read} байт списка платежей")
+            self.metrics.count("http_bytes", bytes_read, budget=BUDGET_LIST)
+            self._log_payment_lookup(payment_id, payment_info)
+            return payment_info
+        finally:
+            # Недочитанный ответ закрывает соединение, а не возвращает его в пул
+            response.close()
 
-                status = (
-                    "completed" if cells[2].text.strip() == "Оплачен" else "pending"
-                )
+    @timed("check_payments")
+    def check_payments(
+        self, payment_ids: Iterable[str], max_pages: int = 50
+    ) -> Dict[str, Optional[PaymentInfo]]:
+        """
+        Проверка статуса нескольких платежей за одну загрузку списка.
+        Если список разбит на страницы, загружаются только те страницы,
+        которые нужны, чтобы найти все запрошенные ID.
 
-                payment_info = PaymentInfo(
-                    payment_id=cells[0].text.strip(),
-                    creation_date=cells[1].text.strip(),
-                    payment_date=cells[2].text.strip(),
-                    amount=cells[4].text.strip(),
-                    payment_type=cells[5].text.strip(),
-                    status=status,
-                )
+        Args:
+            payment_ids: Идентификаторы платежей
+            max_pages: Максимум загружаемых страниц списка
 
-                self.logger.info(f"Получена информация о платеже: {payment_id}")
-                return payment_info
-            else:
-                self.logger.warning(f"Платеж с ID {payment_id} не найден")
-                return None
+        Returns:
+            Dict[str, Optional[PaymentInfo]]: Информация по каждому ID
+                (None, если платеж не найден или произошла ошибка)
+        """
+        results: Dict[str, Optional[PaymentInfo]] = dict.fromkeys(payment_ids)
+        completed = self._ledger_completed(results)
+        results.update(completed)
+        pending = set(results) - set(completed)
+        url: Optional[str] = self._list_url()
+
+        try:
+            for _ in range(max_pages):
+                if not url or not pending:
+                    break
+
+                page = self._get_page(url, BUDGET_LIST)
+                if page.status_code != 200:
+                    error_msg = f"Ошибка: Получен статус код {page.status_code}"
+                    self.logger.error(error_msg)
+                    break
 
+                url = self._collect_payments(page.text, url, pending, results)
         except Exception as e:
-            error_msg = f"Ошибка получения информации о платеже: {e}"
+            error_msg = f"Ошибка получения информации о платежах: {e}"
+            self.logger.error(error_msg)
+
+        self._ledger_update(
+            info for payment_id, info in results.items() if payment_id not in completed
+        )
+        self._log_batch_result(results)
+        return results
+
+    @timed("sync_payments")
+    def sync_payments(self, max_pages: int = 10) -> PaymentDiff:
+        """
+        Инкрементальная синхронизация списка платежей.
+
+        Страницы читаются потоком, и загрузка прерывается, как только таблица
+        доходит до уже известной и не меняющейся истории. Первая синхронизация
+        возвращает все прочитанные платежи как новые.
+
+        Args:
+            max_pages: Максимум загружаемых страниц списка
+
+        Returns:
+            PaymentDiff: Новые и изменившиеся с прошлой синхронизации платежи
+        """
+        diff = PaymentDiff()
+        url: Optional[str] = self._list_url()
+
+        with self.payment_sync.lock:
+            try:
+                for _ in range(max_pages):
+                    if not url:
+                        break
+                    url = self._sync_page(url, diff)
+            except Exception as e:
+                error_msg = f"Ошибка синхронизации списка платежей: {e}"
+                self.logger.error(error_msg)
+
+            self.payment_sync.finish(diff)
+
+        self._log_sync_result(diff)
+        return diff
+
+    def _sync_page(self, url: str, diff: PaymentDiff) -> Optional[str]:
+        """Потоковое чтение одной страницы, возвращает URL следующей"""
+        response = self._request("GET", url, BUDGET_LIST, stream=True)
+        try:
+            if response.status_code != 200:
+                error_msg = f"Ошибка: Получен статус код {response.status_code}"
+                self.logger.error(error_msg)
+                return None
+
+            content_type = response.headers.get("content-type", "").lower()
+            decoder = self._stream_decoder(
+                response.encoding if "charset=" in content_type else None
+            )
+            page = self.payment_sync.page(url, self.parser_backend, diff)
+            bytes_read = 0
+            for chunk in response.iter_content(chunk_size=self.stream_chunk_size):
+                bytes_read += len(chunk)
+                if page.feed(decoder.decode(chunk)):
+                    break
+            else:
+                page.feed(decoder.decode(b"", final=True))
+                page.close()
+            self.metrics.count("http_bytes", bytes_read, budget=BUDGET_LIST)
+            return page.next_url
+        finally:
+            response.close()
+
+    def _fetch_list_page(self, url: str) -> Optional[PaymentListPage]:
+        """Загрузка и разбор страницы списка мимо кэша ответов (для выгрузки)"""
+        response = self._request("GET", url, BUDGET_LIST)
+        if response.status_code != 200:
+            error_msg = f"Ошибка: Получен статус код {response.status_code}"
             self.logger.error(error_msg)
             return None
+        with self.metrics.stage("parse_payment_list", backend=self.parser_backend):
+            return parse_payment_list(response.text, url, self.parser_backend)
+
+    def iter_payments(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        prefetch: int = 4,
+        max_pages: Optional[int] = None,
+    ) -> Iterator[PaymentInfo]:
+        """
+        Все платежи списка от новых к старым, страница за страницей.
+        Следующие страницы загружаются заранее, пока обрабатываются текущие.
+
+        Args:
+            since: Начало периода по дате создания (включительно; без часового
+                пояса - по Москве)
+            until: Конец периода (не включительно)
+            prefetch: Сколько страниц загружается одновременно
+            max_pages: Максимум загружаемых страниц (None - весь список)
+        """
+        from payment_export import ExportFilter, iter_list_pages
+
+        payment_filter = ExportFilter(since, until)
+        pages = iter_list_pages(
+            self._fetch_list_page,
+            self._list_url(),
+            prefetch,
+            max_pages,
+            stop=payment_filter.reached_since,
+        )
+        with closing(pages):
+            for _, page in pages:
+                if page is None:
+                    return
+                yield from payment_filter.select(page)
+
+    @timed("export_payments")
+    def export_payments(
+        self,
+        output: str,
+        export_format: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        checkpoint: Optional[str] = None,
+        prefetch: int = 4,
+        max_pages: Optional[int] = None,
+    ) -> "ExportSummary":
+        """
+        Выгрузка истории платежей в файл для сверки.
+
+        Строки дописываются в файл по мере загрузки страниц, поэтому расход
+        памяти не зависит от длины истории. С контрольной точкой прерванная
+        выгрузка (ошибка сети, остановка процесса) при повторном вызове
+        с теми же параметрами продолжается с первой невыгруженной страницы.
+
+        Args:
+            output: Файл выгрузки
+            export_format: "csv", "jsonl" или "parquet" (нужен pyarrow);
+                по умолчанию - по расширению файла, иначе CSV
+            since: Начало периода по дате создания (включительно; без часового
+                пояса - по Москве)
+            until: Конец периода (не включительно)
+            checkpoint: Файл контрольной точки (удаляется после завершения)
+            prefetch: Сколько страниц загружается одновременно
+            max_pages: Максимум загружаемых страниц за вызов
+
+        Returns:
+            ExportSummary: Число строк и страниц, признак завершения и ошибка
+
+        Пример:
+            summary = lolz.export_payments(
+                "payments.csv", since=datetime(2026, 10, 16), checkpoint="export.json"
+            )
+            print(summary.to_dict())
+        """
+        from payment_export import PaymentExport
+
+        try:
+            export = PaymentExport(
+                self._fetch_list_page,
+                self._list_url(),
+                output,
+                export_format,
+                since=since,
+                until=until,
+                checkpoint_path=checkpoint,
+                prefetch=prefetch,
+                max_pages=max_pages,
+                logger=self.logger,
+            )
+        except ValueError as e:
+            from payment_export import ExportSummary
+
+            self.logger.error(str(e))
+            return ExportSummary(output, export_format or "", error=str(e))
+        return export.run()
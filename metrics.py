@@ -0,0 +1,284 @@
+"""
+Метрики и трассировка клиентов Lolz Market.
+
+Клиент сообщает о каждом этапе работы (get_tokens, parse_deposit_page,
+post_payment, decode_json, parse_payment_list, ...) и о событиях (ответы
+по статусам, прочитанные байты, ошибки авторизации, попадания в кэш токенов,
+повторы запросов) объекту Metrics, который передает их экспортерам:
+
+    PrometheusRegistry - счетчики и гистограммы в памяти процесса с выводом
+        в текстовом формате Prometheus
+    OpenTelemetryExporter - span на каждый этап (нужен пакет opentelemetry-api)
+
+По умолчанию клиенты используют NULL_METRICS: этапы и счетчики ничего
+не делают, и накладные расходы сводятся к вызову пустого метода.
+"""
+
+import functools
+import inspect
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Границы гистограммы длительности этапов в секундах
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class MetricsExporter:
+    """Интерфейс экспортера: достаточно переопределить нужные методы"""
+
+    def observe(self, stage: str, seconds: float, labels: Dict[str, Any]) -> None:
+        """Длительность завершившегося этапа"""
+
+    def count(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        """Приращение счетчика"""
+
+    def span(self, stage: str, labels: Dict[str, Any]):
+        """Контекстный менеджер span для этапа (None - трассировка не нужна)"""
+        return None
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullMetrics:
+    """Отключенные метрики"""
+
+    enabled = False
+
+    def stage(self, name: str, **labels) -> _NullStage:
+        return _NULL_STAGE
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "labels", "started", "spans")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: Dict[str, Any]) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.spans: List[Any] = []
+
+    def __enter__(self) -> "_Stage":
+        for exporter in self.metrics.exporters:
+            span = exporter.span(self.name, self.labels)
+            if span is not None:
+                span.__enter__()
+                self.spans.append(span)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        seconds = time.perf_counter() - self.started
+        if exc_info[0] is not None:
+            self.labels = {**self.labels, "error": exc_info[0].__name__}
+        for exporter in self.metrics.exporters:
+            exporter.observe(self.name, seconds, self.labels)
+        for span in reversed(self.spans):
+            span.__exit__(*exc_info)
+
+
+class Metrics:
+    """
+    Включенные метрики: этапы и счетчики передаются всем экспортерам.
+
+    Пример:
+        registry = PrometheusRegistry()
+        lolz = LolzPayment("cookies.json", metrics=Metrics(registry))
+        ...
+        print(registry.render())
+    """
+
+    enabled = True
+
+    def __init__(self, *exporters: MetricsExporter) -> None:
+        self.exporters = list(exporters)
+
+    def stage(self, name: str, **labels) -> _Stage:
+        """Замер этапа: with metrics.stage("get_tokens"): ..."""
+        return _Stage(self, name, labels)
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        for exporter in self.exporters:
+            exporter.count(name, value, labels)
+
+
+def timed(stage: str):
+    """Декоратор метода клиента: вызов замеряется как этап stage (через self.metrics)"""
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                if not self.metrics.enabled:
+                    return await func(self, *args, **kwargs)
+                with self.metrics.stage(stage):
+                    return await func(self, *args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not self.metrics.enabled:
+                return func(self, *args, **kwargs)
+            with self.metrics.stage(stage):
+                return func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    """
+    Значение счетчика без потери точности: целые - как целые (байты растут
+    далеко за 6 значащих цифр формата :g), остальные - repr(float).
+    Бесконечность и NaN - в записи формата Prometheus (+Inf, -Inf, NaN)
+    """
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value.is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class PrometheusRegistry(MetricsExporter):
+    """
+    Метрики в памяти процесса:
+        lolz_stage_duration_seconds{stage="..."} - гистограмма длительности этапов
+        lolz_<name>_total{...} - счетчики событий
+    """
+
+    def __init__(
+        self, prefix: str = "lolz", buckets: Iterable[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        # Ключ -> [счетчики по корзинам, сумма, количество]
+        self._histograms: Dict[LabelKey, list] = {}
+
+    def observe(self, stage: str, seconds: float, labels: Dict[str, Any]) -> None:
+        key = _label_key({"stage": stage, **labels})
+        with self._lock:
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry[0][position] += 1
+                    break
+            entry[1] += seconds
+            entry[2] += 1
+
+    def count(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def value(self, name: str, **labels) -> float:
+        """Текущее значение счетчика"""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def stage_stats(self) -> Dict[str, Dict[str, float]]:
+        """Количество и суммарное время по этапам"""
+        stats: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for key, (_, total, count) in self._histograms.items():
+                stage = dict(key)["stage"]
+                item = stats.setdefault(stage, {"count": 0, "seconds": 0.0})
+                item["count"] += count
+                item["seconds"] += total
+        return stats
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus (exposition format 0.0.4)"""
+        lines = []
+        with self._lock:
+            histogram = f"{self.prefix}_stage_duration_seconds"
+            if self._histograms:
+                lines.append(f"# HELP {histogram} Длительность этапов клиента")
+                lines.append(f"# TYPE {histogram} histogram")
+            for key, (bucket_counts, total, count) in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(key, [("le", repr(bound))])
+                    lines.append(f"{histogram}_bucket{labels} {cumulative}")
+                labels = _format_labels(key, [("le", "+Inf")])
+                lines.append(f"{histogram}_bucket{labels} {count}")
+                lines.append(f"{histogram}_sum{_format_labels(key)} {total}")
+                lines.append(f"{histogram}_count{_format_labels(key)} {count}")
+
+            for name, series in sorted(self._counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in sorted(series.items()):
+                    value_text = _format_value(value)
+                    lines.append(f"{metric}{_format_labels(key)} {value_text}")
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetryExporter(MetricsExporter):
+    """Span OpenTelemetry на каждый этап (lolz.get_tokens, lolz.post_payment, ...)"""
+
+    def __init__(self, tracer: Optional[Any] = None) -> None:
+        """
+        Args:
+            tracer: Tracer OpenTelemetry (по умолчанию trace.get_tracer("lolz_payment"))
+        """
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                raise ImportError(
+                    "Для OpenTelemetryExporter установите пакет opentelemetry-api"
+                )
+            tracer = trace.get_tracer("lolz_payment")
+        self.tracer = tracer
+
+    def span(self, stage: str, labels: Dict[str, Any]):
+        attributes = {f"lolz.{key}": str(value) for key, value in labels.items()}
+        return self.tracer.start_as_current_span(f"lolz.{stage}", attributes=attributes)
@@ -1,7 +1,20 @@
-from dataclasses import dataclass
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 from enum import Enum
 from typing import Optional, Dict, Any
 
+# slots=True для dataclass доступен начиная с Python 3.10
+_SLOTS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# Время на сайте указано по Москве
+MSK = timezone(timedelta(hours=3))
+
+_DATE_FORMATS = ("%d.%m.%Y в %H:%M", "%d.%m.%Y %H:%M", "%d.%m.%Y")
+_AMOUNT_RE = re.compile(r"-?\d[\d\s ]*(?:[.,]\d{1,2})?")
+
 
 class PaymentMethod(Enum):
     CARD = "card"  # Paymentlnk_Card (от 10р)
@@ -10,7 +23,48 @@ class PaymentMethod(Enum):
     STEAM = "steam"  # Ruks_SkinPay (от 500р)
 
 
-@dataclass
+class PaymentStatus(str, Enum):
+    """Статус платежа; сравнивается со строками ("completed" == COMPLETED)"""
+
+    COMPLETED = "completed"
+    PENDING = "pending"
+    UNKNOWN = "unknown"
+
+    def __str__(self) -> str:
+        return self.value
+
+    def __format__(self, format_spec: str) -> str:
+        return self.value.__format__(format_spec)
+
+    @classmethod
+    def parse(cls, value: Any) -> "PaymentStatus":
+        try:
+            return cls(value)
+        except ValueError:
+            return cls.UNKNOWN
+
+
+def parse_amount_kopecks(text: str) -> Optional[int]:
+    """Сумма из текста ячейки ("1 250,50 ₽") в копейках"""
+    match = _AMOUNT_RE.search(text or "")
+    if not match:
+        return None
+    number = re.sub(r"[\s ]", "", match.group()).replace(",", ".")
+    return int(Decimal(number) * 100)
+
+
+def parse_site_datetime(text: str) -> Optional[datetime]:
+    """Дата из текста ячейки ("01.09.2026 в 00:15") с московским часовым поясом"""
+    text = (text or "").strip()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).replace(tzinfo=MSK)
+        except ValueError:
+            continue
+    return None
+
+
+@dataclass(**_SLOTS)
 class PaymentRequest:
     amount: float
     payment_method: PaymentMethod
@@ -26,11 +80,17 @@ class PaymentRequest:
         return result
 
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class PaymentResponse:
     final_url: Optional[str] = None
     payment_id: Optional[str] = None
     error: Optional[str] = None
+    # Ошибка до отправки формы платежа (токены, авторизация): счет точно
+    # не создан, и запрос можно повторить через другой аккаунт
+    retryable: bool = field(default=False, compare=False)
+    # Ответ на отправленную форму потерян (таймаут, разрыв соединения, 5xx):
+    # счет мог быть создан, и повторять запрос нельзя
+    in_doubt: bool = field(default=False, compare=False)
 
     def to_dict(self) -> Dict[str, Any]:
         result = {}
@@ -43,16 +103,56 @@ class PaymentResponse:
         return result
 
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class PaymentInfo:
+    """
+    Строка таблицы платежей. Текстовые поля хранятся как на сайте, а сумма,
+    дата создания и статус разбираются один раз при создании объекта.
+    """
+
     payment_id: str
     creation_date: str
     payment_date: str
     amount: str
     payment_type: str
-    status: str = "unknown"
+    status: PaymentStatus = PaymentStatus.UNKNOWN
+    # Разобранные значения (не участвуют в сравнении и repr)
+    amount_kopecks: Optional[int] = field(
+        default=None, init=False, compare=False, repr=False
+    )
+    created_at: Optional[datetime] = field(
+        default=None, init=False, compare=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "status", PaymentStatus.parse(self.status))
+        object.__setattr__(self, "amount_kopecks", parse_amount_kopecks(self.amount))
+        object.__setattr__(self, "created_at", parse_site_datetime(self.creation_date))
 
     @property
     def is_paid(self) -> bool:
         """Проверяет, оплачен ли платеж"""
         return bool(self.payment_date) and self.payment_date != "Не оплачен"
+
+    @property
+    def amount_value(self) -> Optional[Decimal]:
+        """Сумма в рублях"""
+        if self.amount_kopecks is None:
+            return None
+        return Decimal(self.amount_kopecks) / 100
+
+    @property
+    def created_ts(self) -> Optional[float]:
+        """Время создания в секундах Unix"""
+        return self.created_at.timestamp() if self.created_at else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "payment_id": self.payment_id,
+            "creation_date": self.creation_date,
+            "payment_date": self.payment_date,
+            "amount": self.amount,
+            "payment_type": self.payment_type,
+            "status": self.status.value,
+            "is_paid": self.is_paid,
+        }
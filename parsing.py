@@ -0,0 +1,453 @@
+"""
+Разбор страниц и ответов Lolz Market.
+Общий для синхронного и асинхронного клиентов.
+
+HTML разбирается через подключаемые бэкенды:
+    "lxml" - быстрый разбор на C с XPath-выборкой только нужных элементов
+        (используется по умолчанию, если установлен lxml)
+    "html.parser" - BeautifulSoup со встроенным парсером Python (запасной вариант)
+
+bs4 и lxml импортируются при первом создании бэкенда, а не при импорте модуля:
+они заметно увеличивают время запуска, а нужен обычно только один из них.
+"""
+
+import json
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from importlib.util import find_spec
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+from models import PaymentInfo, PaymentStatus
+
+# Статус в третьей колонке таблицы платежей, означающий успешную оплату
+PAID_STATUS_TEXT = "Оплачен"
+
+
+@dataclass
+class DepositPage:
+    """Результат разбора страницы депозита"""
+
+    tokens: Optional[Dict[str, str]] = None
+    login_required: bool = False
+
+
+def payment_info_from_cells(cells: List[str]) -> PaymentInfo:
+    """Создание PaymentInfo из текста ячеек строки таблицы платежей"""
+    status = (
+        PaymentStatus.COMPLETED
+        if cells[2] == PAID_STATUS_TEXT
+        else PaymentStatus.PENDING
+    )
+    return PaymentInfo(
+        payment_id=cells[0],
+        creation_date=cells[1],
+        payment_date=cells[2],
+        amount=cells[4],
+        payment_type=cells[5],
+        status=status,
+    )
+
+
+@dataclass
+class PaymentListPage:
+    """Результат разбора одной страницы /payment/list"""
+
+    payments: Dict[str, PaymentInfo]
+    next_url: Optional[str] = None
+
+
+# Классы ссылки на следующую страницу в разных версиях XenForo
+NEXT_PAGE_CLASSES = ("PageNavNext", "pageNav-jump--next")
+
+
+class _StdlibRowScanner(HTMLParser):
+    """
+    Инкрементальный поиск строки платежа встроенным токенайзером html.parser.
+    Данные подаются кусками по мере чтения ответа, разбор останавливается
+    на первой полностью прочитанной строке <tr> с нужным ID.
+    Без payment_id сканер собирает все строки платежей (см. drain()).
+    """
+
+    def __init__(self, payment_id: Optional[str]) -> None:
+        super().__init__(convert_charrefs=True)
+        self.payment_id = payment_id
+        self.result: Optional[PaymentInfo] = None
+        self.rows: List[PaymentInfo] = []
+        self.next_href: Optional[str] = None
+        self._cells: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+
+    def feed(self, data: str) -> Optional[PaymentInfo]:
+        if self.result is None:
+            super().feed(data)
+        return self.result
+
+    def close(self) -> Optional[PaymentInfo]:
+        if self.result is None:
+            super().close()
+        return self.result
+
+    def drain(self) -> List[PaymentInfo]:
+        """Строки, прочитанные с прошлого вызова"""
+        rows, self.rows = self.rows, []
+        return rows
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag == "tr":
+            self._finish_row()
+            self._cells = []
+        elif tag == "td" and self._cells is not None:
+            self._finish_cell()
+            self._cell = []
+        elif tag in ("link", "a") and self.next_href is None:
+            attrs = dict(attrs)
+            classes = (attrs.get("class") or "").split()
+            if (tag == "link" and attrs.get("rel") == "next") or (
+                tag == "a" and set(classes) & set(NEXT_PAGE_CLASSES)
+            ):
+                self.next_href = attrs.get("href")
+
+    def handle_endtag(self, tag) -> None:
+        if tag == "td":
+            self._finish_cell()
+        elif tag in ("tr", "table", "tbody"):
+            self._finish_row()
+
+    def handle_data(self, data) -> None:
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def _finish_cell(self) -> None:
+        if self._cell is not None and self._cells is not None:
+            self._cells.append("".join(self._cell).strip())
+        self._cell = None
+
+    def _finish_row(self) -> None:
+        self._finish_cell()
+        cells, self._cells = self._cells, None
+        if self.payment_id is None:
+            if cells and len(cells) >= 6 and cells[0]:
+                self.rows.append(payment_info_from_cells(cells))
+        elif self.result is None and cells and self.payment_id in cells:
+            self.result = payment_info_from_cells(cells)
+
+
+class _LxmlRowScanner:
+    """Инкрементальный поиск строки платежа через HTMLPullParser из lxml"""
+
+    def __init__(self, payment_id: Optional[str], etree: Any) -> None:
+        self.payment_id = payment_id
+        self.result: Optional[PaymentInfo] = None
+        self.rows: List[PaymentInfo] = []
+        self.next_href: Optional[str] = None
+        tags = "tr" if payment_id is not None else ("tr", "link", "a")
+        self._parser = etree.HTMLPullParser(events=("end",), tag=tags)
+
+    def feed(self, data: str) -> Optional[PaymentInfo]:
+        if self.result is None:
+            self._parser.feed(data)
+            self._scan()
+        return self.result
+
+    def close(self) -> Optional[PaymentInfo]:
+        if self.result is None:
+            self._parser.close()
+            self._scan()
+        return self.result
+
+    def drain(self) -> List[PaymentInfo]:
+        """Строки, прочитанные с прошлого вызова"""
+        rows, self.rows = self.rows, []
+        return rows
+
+    def _scan(self) -> None:
+        for _, element in self._parser.read_events():
+            if element.tag != "tr":
+                self._check_next_link(element)
+                continue
+
+            cells = ["".join(cell.itertext()).strip() for cell in element.iter("td")]
+            if self.payment_id is None:
+                if len(cells) >= 6 and cells[0]:
+                    self.rows.append(payment_info_from_cells(cells))
+            elif self.payment_id in cells:
+                self.result = payment_info_from_cells(cells)
+                return
+            # Просмотренные строки больше не нужны: освобождаем память
+            element.clear()
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+
+    def _check_next_link(self, element) -> None:
+        if self.next_href is not None:
+            return
+        classes = (element.get("class") or "").split()
+        if (element.tag == "link" and element.get("rel") == "next") or (
+            element.tag == "a" and set(classes) & set(NEXT_PAGE_CLASSES)
+        ):
+            self.next_href = element.get("href")
+
+
+class SoupBackend:
+    """Разбор через BeautifulSoup и встроенный html.parser"""
+
+    name = "html.parser"
+
+    def __init__(self) -> None:
+        from bs4 import BeautifulSoup
+
+        self._soup_class = BeautifulSoup
+
+    def _soup(self, html: str):
+        return self._soup_class(html, "html.parser")
+
+    def parse_deposit_page(self, html: str) -> DepositPage:
+        soup = self._soup(html)
+
+        if soup.find("form", {"action": "/login/login"}):
+            return DepositPage(login_required=True)
+
+        xf_token_elem = soup.find("input", {"name": "_xfToken"})
+        service_id_elem = soup.find("input", {"name": "service_id"})
+        if not xf_token_elem or not service_id_elem:
+            return DepositPage()
+
+        return DepositPage(
+            tokens={
+                "xf_token": xf_token_elem["value"],
+                "service_id": service_id_elem["value"],
+            }
+        )
+
+    def find_payment(self, html: str, payment_id: str) -> Optional[PaymentInfo]:
+        soup = self._soup(html)
+        payment_cell = soup.find("td", string=payment_id)
+        if not payment_cell:
+            return None
+
+        row = payment_cell.find_parent("tr")
+        cells = [cell.text.strip() for cell in row.find_all("td")]
+        return payment_info_from_cells(cells)
+
+    def parse_payment_list(self, html: str, page_url: str = "") -> PaymentListPage:
+        soup = self._soup(html)
+
+        payments: Dict[str, PaymentInfo] = {}
+        for row in soup.find_all("tr"):
+            cells = [
+                cell.text.strip() for cell in row.find_all("td", recursive=False)
+            ]
+            if len(cells) >= 6 and cells[0]:
+                payments.setdefault(cells[0], payment_info_from_cells(cells))
+
+        link = soup.find("link", rel="next") or soup.find(
+            "a", class_=list(NEXT_PAGE_CLASSES)
+        )
+        next_url = urljoin(page_url, link["href"]) if link and link.get("href") else None
+        return PaymentListPage(payments, next_url)
+
+    def row_scanner(self, payment_id: Optional[str]) -> _StdlibRowScanner:
+        return _StdlibRowScanner(payment_id)
+
+
+class LxmlBackend:
+    """
+    Разбор через lxml: дерево строится на C, а из него XPath-запросами
+    выбираются только поля токенов или строки таблицы платежей.
+    """
+
+    name = "lxml"
+
+    _NEXT_PAGE_XPATH = "|".join(
+        ["//link[@rel='next']/@href"]
+        + [
+            f"//a[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]/@href"
+            for name in NEXT_PAGE_CLASSES
+        ]
+    )
+
+    def __init__(self) -> None:
+        try:
+            import lxml.etree
+            import lxml.html
+        except ImportError:
+            raise ImportError("Для бэкенда lxml установите пакет lxml")
+        self._etree = lxml.etree
+        self._html = lxml.html
+
+    def _document(self, html: str):
+        # Пустая строка или документ без элементов вызывают ошибку в lxml
+        return self._html.document_fromstring(html or "<html></html>")
+
+    def parse_deposit_page(self, html: str) -> DepositPage:
+        document = self._document(html)
+
+        if document.xpath("//form[@action='/login/login']"):
+            return DepositPage(login_required=True)
+
+        xf_token = document.xpath("//input[@name='_xfToken']/@value")
+        service_id = document.xpath("//input[@name='service_id']/@value")
+        if not xf_token or not service_id:
+            return DepositPage()
+
+        return DepositPage(
+            tokens={"xf_token": str(xf_token[0]), "service_id": str(service_id[0])}
+        )
+
+    def find_payment(self, html: str, payment_id: str) -> Optional[PaymentInfo]:
+        document = self._document(html)
+        rows = document.xpath("//td[. = $id]/ancestor::tr[1]", id=payment_id)
+        if not rows:
+            return None
+
+        cells = [cell.text_content().strip() for cell in rows[0].iter("td")]
+        return payment_info_from_cells(cells)
+
+    def parse_payment_list(self, html: str, page_url: str = "") -> PaymentListPage:
+        document = self._document(html)
+
+        payments: Dict[str, PaymentInfo] = {}
+        for row in document.xpath("//tr[td]"):
+            cells = [cell.text_content().strip() for cell in row.xpath("./td")]
+            if len(cells) >= 6 and cells[0]:
+                payments.setdefault(cells[0], payment_info_from_cells(cells))
+
+        links = document.xpath(self._NEXT_PAGE_XPATH)
+        next_url = urljoin(page_url, str(links[0])) if links else None
+        return PaymentListPage(payments, next_url)
+
+    def row_scanner(self, payment_id: Optional[str]) -> _LxmlRowScanner:
+        return _LxmlRowScanner(payment_id, self._etree)
+
+
+BACKENDS = {
+    SoupBackend.name: SoupBackend,
+    LxmlBackend.name: LxmlBackend,
+}
+
+# lxml используется по умолчанию, если установлен (проверка без импорта)
+DEFAULT_BACKEND = LxmlBackend.name if find_spec("lxml") else SoupBackend.name
+
+_instances: Dict[str, Any] = {}
+
+
+def get_backend(name: Optional[str] = None):
+    """
+    Получение бэкенда разбора HTML по имени.
+
+    Args:
+        name: "lxml" или "html.parser"; None - бэкенд по умолчанию
+    """
+    name = name or DEFAULT_BACKEND
+    backend = _instances.get(name)
+    if backend is None:
+        if name not in BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд разбора HTML: {name}")
+        backend = _instances[name] = BACKENDS[name]()
+    return backend
+
+
+def parse_deposit_page(html: str, backend: Optional[str] = None) -> DepositPage:
+    """Извлечение токенов xf_token и service_id со страницы депозита"""
+    return get_backend(backend).parse_deposit_page(html)
+
+
+def find_payment(
+    html: str, payment_id: str, backend: Optional[str] = None
+) -> Optional[PaymentInfo]:
+    """Поиск платежа по ID на странице /payment/list"""
+    return get_backend(backend).find_payment(html, payment_id)
+
+
+def parse_payment_list(
+    html: str, page_url: str = "", backend: Optional[str] = None
+) -> PaymentListPage:
+    """
+    Разбор страницы списка платежей за один проход по строкам таблицы.
+
+    Args:
+        html: HTML страницы
+        page_url: URL страницы, относительно которого строится ссылка на следующую
+        backend: Бэкенд разбора HTML (None - по умолчанию)
+
+    Returns:
+        PaymentListPage: Индекс ID платежа -> PaymentInfo и ссылка на следующую страницу
+    """
+    return get_backend(backend).parse_payment_list(html, page_url)
+
+
+def payment_row_scanner(payment_id: str, backend: Optional[str] = None):
+    """
+    Инкрементальный поиск платежа в потоке HTML страницы /payment/list.
+
+    Возвращаемый объект принимает куски текста через feed(data) и возвращает
+    PaymentInfo, как только строка с нужным ID прочитана целиком; close()
+    дочитывает остаток разобранных данных в конце потока.
+    """
+    return get_backend(backend).row_scanner(payment_id)
+
+
+def payment_rows_scanner(backend: Optional[str] = None):
+    """
+    Инкрементальное чтение всех строк таблицы /payment/list по мере загрузки.
+
+    Возвращаемый объект принимает куски текста через feed(data); drain()
+    отдает строки (PaymentInfo в порядке таблицы), прочитанные с прошлого
+    вызова, а next_href - ссылку на следующую страницу, если она встретилась.
+    """
+    return get_backend(backend).row_scanner(None)
+
+
+def parse_payment_created(response_json: Any) -> Optional[Dict[str, str]]:
+    """
+    Извлечение ссылки на оплату и ID платежа из JSON-ответа /payment/method.
+
+    Returns:
+        Optional[Dict[str, str]]: {"final_url", "payment_id"} или None
+    """
+    if not isinstance(response_json, dict):
+        return None
+    redirect_target = response_json.get("_redirectTarget")
+    redirect_message = response_json.get("_redirectMessage")
+    if not redirect_target or not redirect_message:
+        return None
+    return {
+        "final_url": redirect_target,
+        "payment_id": redirect_message.split("=")[-1],
+    }
+
+
+# Фрагменты текста ошибок, по которым видно, что токен _xfToken или сессия устарели
+TOKEN_ERROR_MARKERS = (
+    "security error",
+    "ошибка безопасности",
+    "_xftoken",
+    "token",
+    "токен",
+    "log in",
+    "войдите",
+    "авторизац",
+)
+
+
+def is_token_error(status_code: int, response_json: Any = None) -> bool:
+    """
+    Проверка, что /payment/method отклонил запрос из-за CSRF-токена или авторизации.
+
+    Args:
+        status_code: HTTP-статус ответа
+        response_json: Разобранное тело ответа (если это JSON)
+    """
+    if status_code in (401, 403):
+        return True
+    if status_code != 200 or not isinstance(response_json, dict):
+        return False
+    if "_redirectTarget" in response_json:
+        return False
+    error = response_json.get("error") or response_json.get("errors")
+    if not error:
+        return False
+    text = json.dumps(error, ensure_ascii=False).lower()
+    return any(marker in text for marker in TOKEN_ERROR_MARKERS)
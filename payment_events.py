@@ -0,0 +1,585 @@
+"""
+События изменения статуса платежей и их доставка получателям.
+
+Клиент (или PaymentWatcher) сообщает о переходах платежа в конечное
+состояние, EventDispatcher превращает их в события:
+
+    payment.completed - платеж оплачен
+    payment.expired - платеж не оплачен за время наблюдения (PaymentWatcher)
+
+ID события строится из ID платежа и типа события, поэтому повторное
+сообщение о том же переходе (очередная проверка, перезапуск процесса)
+не создает второго события. События сохраняются в EventOutbox (SQLite)
+до отправки и доставляются получателям (WebhookSink, CallbackSink)
+пачками в фоновом потоке; неудачная доставка повторяется с экспоненциальной
+задержкой. Доставка "хотя бы один раз": если процесс остановился между
+отправкой и отметкой о ней, пачка будет отправлена повторно, и получатель
+должен отбрасывать уже обработанные event_id.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+)
+
+from models import PaymentInfo, PaymentStatus
+from payment_watcher import WATCH_COMPLETED, WATCH_TIMEOUT, WatchResult
+from retry import RetryPolicy
+
+if TYPE_CHECKING:
+    import requests
+
+EVENT_COMPLETED = "payment.completed"
+EVENT_EXPIRED = "payment.expired"
+
+# Политика повторов доставки по умолчанию: до ~1.5 часов попыток
+DEFAULT_DELIVERY_POLICY = RetryPolicy(max_attempts=12, base_delay=1.0, max_delay=900.0)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    event_id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    payment_id TEXT NOT NULL,
+    account TEXT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    event_id TEXT NOT NULL,
+    sink TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    delivered_at REAL,
+    dead INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    PRIMARY KEY (event_id, sink)
+);
+CREATE INDEX IF NOT EXISTS deliveries_due ON deliveries (sink, next_attempt_at)
+    WHERE delivered_at IS NULL AND dead = 0;
+"""
+
+
+@dataclass
+class PaymentEvent:
+    type: str  # EVENT_COMPLETED или EVENT_EXPIRED
+    payment_id: str
+    account: Optional[str] = None
+    payment: Optional[Dict[str, Any]] = None
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def event_id(self) -> str:
+        """Один переход платежа - один ID события"""
+        return f"{self.payment_id}:{self.type}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "event_id": self.event_id,
+            "type": self.type,
+            "payment_id": self.payment_id,
+            "account": self.account,
+            "created_at": self.created_at,
+            "payment": self.payment,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PaymentEvent":
+        return cls(
+            type=data["type"],
+            payment_id=data["payment_id"],
+            account=data.get("account"),
+            payment=data.get("payment"),
+            created_at=data["created_at"],
+        )
+
+
+class EventOutbox:
+    """
+    Очередь неотправленных событий в файле SQLite (режим WAL) или в памяти.
+    Для каждого события хранится состояние доставки каждому получателю.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """
+        Args:
+            path: Путь к файлу базы данных (":memory:" - без сохранения на диск)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def add(self, event: PaymentEvent, sinks: Iterable[str]) -> bool:
+        """
+        Сохранение события и заданий на его доставку.
+
+        Returns:
+            bool: False, если событие с таким ID уже было сохранено
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO events (event_id, type, payment_id, account, payload,
+                                    created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (event_id) DO NOTHING
+                """,
+                (
+                    event.event_id,
+                    event.type,
+                    event.payment_id,
+                    event.account,
+                    json.dumps(event.to_dict(), ensure_ascii=False),
+                    event.created_at,
+                ),
+            )
+            if not cursor.rowcount:
+                return False
+            self._conn.executemany(
+                """
+                INSERT INTO deliveries (event_id, sink, next_attempt_at)
+                VALUES (?, ?, ?)
+                """,
+                [(event.event_id, sink, event.created_at) for sink in sinks],
+            )
+            return True
+
+    def due(
+        self, sink: str, limit: int = 100, now: Optional[float] = None
+    ) -> List[PaymentEvent]:
+        """События, которые пора отправить получателю sink (сначала старые)"""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT events.payload FROM deliveries
+                JOIN events USING (event_id)
+                WHERE deliveries.sink = ? AND deliveries.delivered_at IS NULL
+                  AND deliveries.dead = 0 AND deliveries.next_attempt_at <= ?
+                ORDER BY deliveries.next_attempt_at, events.created_at
+                LIMIT ?
+                """,
+                (sink, time.time() if now is None else now, limit),
+            ).fetchall()
+        return [PaymentEvent.from_dict(json.loads(row[0])) for row in rows]
+
+    def next_attempt_at(self, sinks: Sequence[str]) -> Optional[float]:
+        """Время ближайшей доставки получателям sinks (None - отправлять нечего)"""
+        placeholders = ", ".join("?" * len(sinks))
+        with self._lock:
+            row = self._conn.execute(
+                f"""
+                SELECT MIN(next_attempt_at) FROM deliveries
+                WHERE delivered_at IS NULL AND dead = 0 AND sink IN ({placeholders})
+                """,
+                tuple(sinks),
+            ).fetchone()
+        return row[0]
+
+    def mark_delivered(self, sink: str, event_ids: Sequence[str]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                UPDATE deliveries SET delivered_at = ?, attempts = attempts + 1,
+                                      last_error = NULL
+                WHERE event_id = ? AND sink = ?
+                """,
+                [(now, event_id, sink) for event_id in event_ids],
+            )
+
+    def mark_failed(
+        self,
+        sink: str,
+        event_ids: Sequence[str],
+        error: str,
+        policy: RetryPolicy,
+    ) -> int:
+        """
+        Запись неудачной попытки: следующая попытка планируется по policy,
+        после policy.max_attempts попыток доставка прекращается.
+
+        Returns:
+            int: Количество событий, доставка которых прекращена
+        """
+        now = time.time()
+        dead = 0
+        with self._lock, self._conn:
+            for event_id in event_ids:
+                row = self._conn.execute(
+                    "SELECT attempts FROM deliveries WHERE event_id = ? AND sink = ?",
+                    (event_id, sink),
+                ).fetchone()
+                if row is None:
+                    continue
+                attempts = row[0] + 1
+                give_up = attempts >= policy.max_attempts
+                dead += give_up
+                self._conn.execute(
+                    """
+                    UPDATE deliveries SET attempts = ?, next_attempt_at = ?,
+                                          dead = ?, last_error = ?
+                    WHERE event_id = ? AND sink = ?
+                    """,
+                    (
+                        attempts,
+                        now + policy.delay(attempts),
+                        int(give_up),
+                        error[:500],
+                        event_id,
+                        sink,
+                    ),
+                )
+        return dead
+
+    def counts(self) -> Dict[str, int]:
+        """Количество доставок по состояниям: pending, delivered, dead"""
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT
+                    COALESCE(SUM(delivered_at IS NULL AND dead = 0), 0),
+                    COALESCE(SUM(delivered_at IS NOT NULL), 0),
+                    COALESCE(SUM(dead), 0)
+                FROM deliveries
+                """
+            ).fetchone()
+        return {"pending": row[0], "delivered": row[1], "dead": row[2]}
+
+
+class CallbackSink:
+    """Получатель событий - функция в том же процессе"""
+
+    def __init__(
+        self,
+        callback: Callable[[List[PaymentEvent]], Any],
+        name: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            callback: Функция, принимающая список событий; исключение
+                означает неудачную доставку всей пачки
+            name: Постоянное имя получателя в очереди событий
+                (по умолчанию - имя функции)
+        """
+        self.callback = callback
+        self.name = name or f"callback:{getattr(callback, '__qualname__', callback)}"
+
+    def deliver(self, events: List[PaymentEvent]) -> None:
+        self.callback(events)
+
+
+class WebhookSink:
+    """
+    Получатель событий - HTTP webhook. Пачка отправляется одним POST
+    с телом {"events": [...]}; при заданном secret добавляется заголовок
+    X-Lolz-Signature: sha256=<HMAC-SHA256 тела>.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        secret: Optional[str] = None,
+        timeout: float = 10.0,
+        headers: Optional[Dict[str, str]] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            url: Адрес webhook
+            secret: Ключ подписи тела запроса
+            timeout: Таймаут запроса в секундах
+            headers: Дополнительные заголовки
+            name: Постоянное имя получателя в очереди событий (по умолчанию - url)
+        """
+        self.url = url
+        self.secret = secret
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.name = name or f"webhook:{url}"
+        self._session: Optional["requests.Session"] = None
+
+    def deliver(self, events: List[PaymentEvent]) -> None:
+        import requests
+
+        if self._session is None:
+            self._session = requests.Session()
+        body = json.dumps(
+            {"events": [event.to_dict() for event in events]}, ensure_ascii=False
+        ).encode("utf-8")
+        headers = {"Content-Type": "application/json", **self.headers}
+        if self.secret:
+            digest = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+            headers["X-Lolz-Signature"] = f"sha256={digest}"
+        response = self._session.post(
+            self.url, data=body, headers=headers, timeout=self.timeout
+        )
+        if response.status_code >= 300:
+            raise RuntimeError(f"webhook ответил статусом {response.status_code}")
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+
+
+class EventDispatcher:
+    """
+    Создание событий и их фоновая доставка получателям.
+
+    emit сохраняет событие в outbox и будит поток доставки через
+    ограниченную очередь: если получатели не успевают и очередь заполнена,
+    emit ждет освобождения места (или, с block=False, оставляет событие
+    в outbox до следующего прохода потока).
+
+    Пример:
+        events = EventDispatcher(
+            EventOutbox("events.db"),
+            sinks=[WebhookSink("https://example.com/hook", secret="...")],
+        )
+        events.start()
+        lolz = LolzPayment("cookies.json", events=events)
+        watcher = PaymentWatcher(lolz, on_result=events.on_watch_result)
+    """
+
+    def __init__(
+        self,
+        outbox: Optional[EventOutbox] = None,
+        sinks: Iterable[Any] = (),
+        batch_size: int = 50,
+        linger: float = 0.2,
+        max_queue: int = 10000,
+        retry_policy: Optional[RetryPolicy] = None,
+        poll_interval: float = 5.0,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        """
+        Args:
+            outbox: Хранилище неотправленных событий (по умолчанию - в памяти)
+            sinks: Получатели (WebhookSink, CallbackSink или объекты с атрибутом
+                name и методом deliver(events))
+            batch_size: Максимум событий в одной доставке
+            linger: Сколько секунд ждать накопления пачки после первого события
+            max_queue: Размер очереди новых событий (ограничивает память и
+                замедляет emit, если доставка не успевает)
+            retry_policy: Задержки между попытками доставки и их число
+            poll_interval: Как часто проверять outbox без новых событий
+                (повторы, события, не попавшие в очередь)
+            logger: Опциональный логгер
+        """
+        self.outbox = outbox or EventOutbox()
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.linger = linger
+        self.retry_policy = retry_policy or DEFAULT_DELIVERY_POLICY
+        self.poll_interval = poll_interval
+        self.logger = logger or logging.getLogger("LolzPayment")
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Вызовы _deliver_due не должны пересекаться (поток доставки и flush)
+        self._deliver_lock = threading.Lock()
+
+    def __enter__(self) -> "EventDispatcher":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def add_sink(self, sink: Any) -> None:
+        """Добавление получателя (до первого emit: старые события ему не попадут)"""
+        self.sinks.append(sink)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="payment-events", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """Остановка потока доставки с попыткой отправить накопленные события"""
+        self._stop.set()
+        self._wake()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        for sink in self.sinks:
+            close = getattr(sink, "close", None)
+            if close:
+                close()
+
+    def emit(
+        self, event: PaymentEvent, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Новое событие. Повторное событие о том же переходе платежа отбрасывается.
+
+        Args:
+            event: Событие
+            block: Ждать места в очереди, если доставка не успевает
+            timeout: Максимальное время ожидания места в секундах
+
+        Returns:
+            bool: True, если событие новое и сохранено
+        """
+        try:
+            added = self.outbox.add(event, [sink.name for sink in self.sinks])
+        except sqlite3.Error as e:
+            self.logger.error(f"Ошибка записи события {event.event_id}: {e}")
+            return False
+        if not added:
+            return False
+        try:
+            self._queue.put(event.event_id, block=block, timeout=timeout)
+        except queue.Full:
+            # Событие уже в outbox: его заберет следующий проход потока доставки
+            self.logger.warning(
+                f"Очередь событий заполнена, событие {event.event_id} отложено"
+            )
+        return True
+
+    def emit_completed(
+        self, payments: Iterable[Optional[PaymentInfo]], account: Optional[str] = None
+    ) -> int:
+        """
+        События payment.completed для оплаченных платежей из payments.
+        Не ждет места в очереди, поэтому безопасен для вызова из asyncio.
+
+        Returns:
+            int: Количество новых событий
+        """
+        emitted = 0
+        for info in payments:
+            if info and info.status == PaymentStatus.COMPLETED:
+                event = PaymentEvent(
+                    EVENT_COMPLETED, info.payment_id, account, info.to_dict()
+                )
+                emitted += self.emit(event, block=False)
+        return emitted
+
+    def on_watch_result(self, result: WatchResult) -> None:
+        """Обработчик on_result для PaymentWatcher и AsyncPaymentWatcher"""
+        if result.status == WATCH_COMPLETED:
+            event_type = EVENT_COMPLETED
+        elif result.status == WATCH_TIMEOUT:
+            event_type = EVENT_EXPIRED
+        else:
+            return
+        payment = result.payment_info.to_dict() if result.payment_info else None
+        self.emit(PaymentEvent(event_type, result.payment_id, payment=payment))
+
+    def flush(self) -> int:
+        """
+        Синхронная отправка всех событий, срок доставки которых наступил.
+
+        Returns:
+            int: Количество доставленных событий
+        """
+        self._drain_queue()
+        delivered = 0
+        while True:
+            batch = self._deliver_due()
+            if not batch:
+                return delivered
+            delivered += batch
+
+    def _wake(self) -> None:
+        try:
+            self._queue.put_nowait("")
+        except queue.Full:
+            pass
+
+    def _drain_queue(self, limit: Optional[int] = None) -> int:
+        drained = 0
+        while limit is None or drained < limit:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            drained += 1
+        return drained
+
+    def _wait_timeout(self) -> float:
+        try:
+            next_at = self.outbox.next_attempt_at([sink.name for sink in self.sinks])
+        except sqlite3.Error:
+            next_at = None
+        if next_at is None:
+            return self.poll_interval
+        return min(self.poll_interval, max(0.0, next_at - time.time()))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._queue.get(timeout=self._wait_timeout())
+            except queue.Empty:
+                pass
+            else:
+                # Небольшая задержка, чтобы события, пришедшие следом, ушли
+                # той же пачкой
+                if self.linger and self._queue.qsize() < self.batch_size:
+                    self._stop.wait(self.linger)
+                # Из очереди забирается не больше пачки: пока доставка
+                # отстает, очередь остается заполненной и emit ждет
+                self._drain_queue(self.batch_size - 1)
+            if self._stop.is_set():
+                break
+            try:
+                self._deliver_due()
+            except Exception as e:
+                self.logger.error(f"Ошибка доставки событий: {e}")
+
+    def _deliver_due(self) -> int:
+        """Одна пачка каждому получателю"""
+        delivered = 0
+        with self._deliver_lock:
+            for sink in self.sinks:
+                events = self.outbox.due(sink.name, self.batch_size)
+                if not events:
+                    continue
+                event_ids = [event.event_id for event in events]
+                try:
+                    sink.deliver(events)
+                except Exception as e:
+                    dead = self.outbox.mark_failed(
+                        sink.name, event_ids, str(e), self.retry_policy
+                    )
+                    self.logger.warning(
+                        f"Не удалось доставить {len(events)} событий "
+                        f"получателю {sink.name}: {e}"
+                    )
+                    if dead:
+                        self.logger.error(
+                            f"Доставка {dead} событий получателю {sink.name} "
+                            f"прекращена после {self.retry_policy.max_attempts} "
+                            f"попыток"
+                        )
+                    continue
+                self.outbox.mark_delivered(sink.name, event_ids)
+                delivered += len(events)
+        return delivered
@@ -0,0 +1,562 @@
+"""
+Выгрузка всей истории платежей для сверки (CSV, JSONL, Parquet).
+
+Список /payment/list читается постранично как конвейер генераторов:
+страницы загружаются заранее в пуле потоков (iter_list_pages), строки
+фильтруются по датам и повторам (ExportFilter) и сразу дописываются в файл
+(ExportWriter). В памяти одновременно находится не больше prefetch страниц,
+поэтому расход памяти не зависит от длины истории.
+
+Таблица отсортирована от новых платежей к старым, а ID растут со временем.
+Поэтому:
+    - чтение останавливается на первой странице со строками старше since;
+    - строка с ID не меньше уже выгруженного - повтор (пока идет выгрузка,
+      новые платежи сдвигают старые на следующие страницы) и пропускается;
+    - после каждой страницы в контрольную точку записываются URL следующей
+      страницы, последний выгруженный ID и размер файла, и прерванная
+      выгрузка продолжается с того же места.
+"""
+
+import csv
+import json
+import logging
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from models import MSK, PaymentInfo
+from parsing import PaymentListPage
+
+# Колонки выгрузки: поля страницы, признак оплаты и разобранные сумма и дата создания
+EXPORT_FIELDS = (
+    "payment_id",
+    "creation_date",
+    "payment_date",
+    "amount",
+    "payment_type",
+    "status",
+    "is_paid",
+    "amount_kopecks",
+    "created_at",
+)
+
+# Номер страницы в ссылке на следующую (?page=N или /page-N в XenForo)
+_PAGE_NUMBER_RE = re.compile(r"([?&]page=|/page-)(\d+)")
+
+
+def _numeric_id(payment_id: str) -> Optional[int]:
+    return int(payment_id) if payment_id.isdigit() else None
+
+
+def _site_datetime(value: Optional[datetime]) -> Optional[datetime]:
+    """Дата без часового пояса считается московской (как на сайте)"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=MSK)
+    return value
+
+
+def export_record(payment_info: PaymentInfo) -> Dict[str, Any]:
+    """Строка выгрузки (дата создания - ISO 8601 с часовым поясом)"""
+    record = payment_info.to_dict()
+    record["amount_kopecks"] = payment_info.amount_kopecks
+    created_at = payment_info.created_at
+    record["created_at"] = created_at.isoformat() if created_at else None
+    return record
+
+
+def predict_page_url(url: str) -> Optional[str]:
+    """URL страницы после url, если номер страницы виден в адресе"""
+    matches = list(_PAGE_NUMBER_RE.finditer(url))
+    if not matches:
+        return None
+    match = matches[-1]
+    number = int(match.group(2)) + 1
+    return f"{url[: match.start(2)]}{number}{url[match.end(2) :]}"
+
+
+def iter_list_pages(
+    fetch: Callable[[str], Optional[PaymentListPage]],
+    start_url: str,
+    prefetch: int = 4,
+    max_pages: Optional[int] = None,
+    stop: Optional[Callable[[PaymentListPage], bool]] = None,
+) -> Iterator[Tuple[str, Optional[PaymentListPage]]]:
+    """
+    Страницы списка по порядку, начиная с start_url.
+
+    Ссылка на следующую страницу известна только после разбора текущей,
+    но если в ней виден номер страницы (?page=N), следующие prefetch страниц
+    загружаются параллельно заранее. Загруженная наугад страница
+    используется, только если ссылка с предыдущей страницы ведет на нее.
+
+    Args:
+        fetch: Загрузка и разбор страницы (None - ошибка, чтение прекращается)
+        start_url: Первая страница
+        prefetch: Сколько страниц загружается одновременно
+        max_pages: Максимум страниц (None - до конца списка)
+        stop: Признак того, что страницы после этой не нужны
+
+    Yields:
+        Пары (URL страницы, PaymentListPage или None при ошибке)
+    """
+    prefetch = max(1, prefetch)
+    executor = ThreadPoolExecutor(prefetch, thread_name_prefix="lolz-export")
+    pending: Deque[Tuple[str, Future]] = deque()
+    fetched = 0
+
+    def submit(url: str) -> None:
+        pending.append((url, executor.submit(fetch, url)))
+
+    try:
+        submit(start_url)
+        while pending:
+            url, future = pending.popleft()
+            page = future.result()
+            fetched += 1
+            if (
+                page is None
+                or not page.next_url
+                or (max_pages is not None and fetched >= max_pages)
+                or (stop is not None and stop(page))
+            ):
+                yield url, page
+                return
+
+            if not pending or pending[0][0] != page.next_url:
+                # Номер страницы угадан неверно: заранее загруженные не нужны
+                for _, stale in pending:
+                    stale.cancel()
+                pending.clear()
+                submit(page.next_url)
+            while len(pending) < prefetch and (
+                max_pages is None or fetched + len(pending) < max_pages
+            ):
+                predicted = predict_page_url(pending[-1][0])
+                if predicted is None:
+                    break
+                submit(predicted)
+            yield url, page
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+class ExportFilter:
+    """
+    Отбор строк выгрузки: диапазон дат создания [since, until) и пропуск
+    повторов. Строки без распознанной даты не отбрасываются.
+    """
+
+    def __init__(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        last_id: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            since: Начало периода (включительно)
+            until: Конец периода (не включительно)
+            last_id: ID последнего выгруженного платежа (при продолжении)
+        """
+        self.since = _site_datetime(since)
+        self.until = _site_datetime(until)
+        self.last_id = last_id
+        self.duplicates = 0
+
+    def reached_since(self, page: PaymentListPage) -> bool:
+        """Страница дошла до платежей старше since (дальше только они)"""
+        if self.since is None:
+            return False
+        return any(
+            info.created_at is not None and info.created_at < self.since
+            for info in page.payments.values()
+        )
+
+    def select(self, page: PaymentListPage) -> List[PaymentInfo]:
+        selected = []
+        for info in page.payments.values():
+            numeric_id = _numeric_id(info.payment_id)
+            if numeric_id is not None:
+                if self.last_id is not None and numeric_id >= self.last_id:
+                    self.duplicates += 1
+                    continue
+                self.last_id = numeric_id
+
+            created_at = info.created_at
+            if created_at is not None and (
+                (self.since is not None and created_at < self.since)
+                or (self.until is not None and created_at >= self.until)
+            ):
+                continue
+            selected.append(info)
+        return selected
+
+
+class ExportWriter:
+    """Построчная запись выгрузки в файл"""
+
+    format = ""
+    # Можно ли дописывать файл после обрыва (с позиции из контрольной точки)
+    resumable = True
+
+    def __init__(self, path: str, offset: Optional[int] = None) -> None:
+        """
+        Args:
+            path: Файл выгрузки
+            offset: Размер файла в контрольной точке: файл обрезается до него
+                и дописывается (None - новый файл)
+        """
+        self.path = path
+        if offset is None:
+            self._file = open(path, "w", encoding="utf-8", newline="")
+            self._start()
+        else:
+            os.truncate(path, offset)
+            self._file = open(path, "a", encoding="utf-8", newline="")
+
+    def _start(self) -> None:
+        """Начало нового файла (заголовок)"""
+
+    def write(self, rows: List[PaymentInfo]) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> Optional[int]:
+        """
+        Сброс записанного на диск.
+
+        Returns:
+            Optional[int]: Размер файла для контрольной точки
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class CsvExportWriter(ExportWriter):
+    format = "csv"
+
+    def _start(self) -> None:
+        csv.writer(self._file).writerow(EXPORT_FIELDS)
+
+    def write(self, rows: List[PaymentInfo]) -> None:
+        writer = csv.DictWriter(self._file, EXPORT_FIELDS)
+        writer.writerows(export_record(info) for info in rows)
+
+
+class JsonlExportWriter(ExportWriter):
+    format = "jsonl"
+
+    def write(self, rows: List[PaymentInfo]) -> None:
+        self._file.writelines(
+            json.dumps(export_record(info), ensure_ascii=False) + "\n" for info in rows
+        )
+
+
+class ParquetExportWriter(ExportWriter):
+    """
+    Запись в Parquet группами по row_group_size строк (нужен пакет pyarrow).
+    Файл без завершающего блока метаданных не читается, поэтому прерванная
+    выгрузка в Parquet начинается заново.
+    """
+
+    format = "parquet"
+    resumable = False
+
+    def __init__(
+        self, path: str, offset: Optional[int] = None, row_group_size: int = 10000
+    ) -> None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Для выгрузки в Parquet установите пакет pyarrow")
+
+        self.path = path
+        self.row_group_size = row_group_size
+        self._pa = pyarrow
+        self._schema = pyarrow.schema(
+            [(name, pyarrow.string()) for name in EXPORT_FIELDS[:6]]
+            + [
+                ("is_paid", pyarrow.bool_()),
+                ("amount_kopecks", pyarrow.int64()),
+                ("created_at", pyarrow.timestamp("s", tz="UTC")),
+            ]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        self._columns: Dict[str, List[Any]] = {name: [] for name in EXPORT_FIELDS}
+
+    def write(self, rows: List[PaymentInfo]) -> None:
+        columns = self._columns
+        for info in rows:
+            for name, value in info.to_dict().items():
+                columns[name].append(value)
+            columns["amount_kopecks"].append(info.amount_kopecks)
+            columns["created_at"].append(info.created_at)
+        if len(columns["payment_id"]) >= self.row_group_size:
+            self._write_group()
+
+    def _write_group(self) -> None:
+        if not self._columns["payment_id"]:
+            return
+        table = self._pa.Table.from_pydict(self._columns, schema=self._schema)
+        self._writer.write_table(table)
+        for values in self._columns.values():
+            values.clear()
+
+    def flush(self) -> Optional[int]:
+        return None
+
+    def close(self) -> None:
+        self._write_group()
+        self._writer.close()
+
+
+EXPORT_WRITERS = {
+    writer.format: writer
+    for writer in (CsvExportWriter, JsonlExportWriter, ParquetExportWriter)
+}
+
+
+def resolve_format(path: str, export_format: Optional[str] = None) -> str:
+    """Формат выгрузки: заданный явно или по расширению файла (по умолчанию CSV)"""
+    if export_format:
+        if export_format not in EXPORT_WRITERS:
+            raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+        return export_format
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return extension if extension in EXPORT_WRITERS else CsvExportWriter.format
+
+
+@dataclass
+class ExportCheckpoint:
+    """Состояние прерванной выгрузки (файл JSON рядом с выгрузкой)"""
+
+    output: str
+    format: str
+    since: Optional[str]
+    until: Optional[str]
+    next_url: str
+    last_id: Optional[int] = None
+    offset: int = 0
+    rows: int = 0
+    pages: int = 0
+
+    @classmethod
+    def load(cls, path: str) -> Optional["ExportCheckpoint"]:
+        """Контрольная точка из файла (None - файла нет)"""
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                return cls(**json.load(file))
+        except FileNotFoundError:
+            return None
+
+    def save(self, path: str) -> None:
+        # Запись через временный файл: контрольная точка не бывает недописанной
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(asdict(self), file, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+
+    def matches(self, other: "ExportCheckpoint") -> bool:
+        """Та же выгрузка (файл, формат и период)"""
+        return (self.output, self.format, self.since, self.until) == (
+            other.output,
+            other.format,
+            other.since,
+            other.until,
+        )
+
+
+@dataclass
+class ExportSummary:
+    output: str
+    format: str
+    rows: int = 0
+    pages: int = 0
+    duplicates: int = 0
+    elapsed: float = 0.0
+    complete: bool = False
+    resumed: bool = False
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = asdict(self)
+        result["elapsed"] = round(self.elapsed, 3)
+        if not self.error:
+            del result["error"]
+        return result
+
+
+class PaymentExport:
+    """
+    Одна выгрузка списка платежей в файл. Клиенты создают ее сами
+    (см. LolzPayment.export_payments) и передают функцию загрузки страницы.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Optional[PaymentListPage]],
+        start_url: str,
+        output: str,
+        export_format: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        checkpoint_path: Optional[str] = None,
+        prefetch: int = 4,
+        max_pages: Optional[int] = None,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.fetch = fetch
+        self.start_url = start_url
+        self.output = output
+        self.format = resolve_format(output, export_format)
+        self.filter = ExportFilter(since, until)
+        self.checkpoint_path = checkpoint_path
+        self.prefetch = prefetch
+        self.max_pages = max_pages
+        self.logger = logger or logging.getLogger("LolzPayment")
+        self.summary = ExportSummary(output, self.format)
+
+        writer_class = EXPORT_WRITERS[self.format]
+        if checkpoint_path and not writer_class.resumable:
+            self.logger.warning(
+                f"Для формата {self.format} контрольная точка не поддерживается"
+            )
+            self.checkpoint_path = None
+
+    def _new_checkpoint(self) -> ExportCheckpoint:
+        since, until = self.filter.since, self.filter.until
+        return ExportCheckpoint(
+            output=os.path.abspath(self.output),
+            format=self.format,
+            since=since.isoformat() if since else None,
+            until=until.isoformat() if until else None,
+            next_url=self.start_url,
+        )
+
+    def _check_saved(self, saved: ExportCheckpoint) -> Optional[str]:
+        """Проверка сохраненной контрольной точки (текст ошибки или None)"""
+        if not saved.matches(self._new_checkpoint()):
+            return (
+                f"Контрольная точка {self.checkpoint_path} относится к другой "
+                f"выгрузке ({saved.output}, {saved.format})"
+            )
+        try:
+            size = os.path.getsize(self.output)
+        except OSError:
+            size = -1
+        if size < saved.offset:
+            return f"Файл {self.output} короче, чем в контрольной точке"
+
+        self.filter.last_id = saved.last_id
+        self.summary.rows = saved.rows
+        self.summary.pages = saved.pages
+        self.summary.resumed = True
+        self.logger.info(
+            f"Продолжение выгрузки {self.output}: строк {saved.rows}, "
+            f"страниц {saved.pages}"
+        )
+        return None
+
+    def run(self) -> ExportSummary:
+        started = time.monotonic()
+        summary = self.summary
+        checkpoint = self._new_checkpoint()
+        saved = None
+        if self.checkpoint_path:
+            saved = ExportCheckpoint.load(self.checkpoint_path)
+        if saved is not None:
+            summary.error = self._check_saved(saved)
+            if summary.error:
+                self.logger.error(summary.error)
+                return summary
+            checkpoint = saved
+
+        try:
+            writer = EXPORT_WRITERS[self.format](
+                self.output, checkpoint.offset if summary.resumed else None
+            )
+        except (OSError, ImportError) as e:
+            summary.error = f"Ошибка открытия файла выгрузки: {e}"
+            self.logger.error(summary.error)
+            return summary
+
+        try:
+            self._copy(writer, checkpoint)
+        except Exception as e:
+            summary.error = f"Ошибка выгрузки платежей: {e}"
+            self.logger.error(summary.error)
+        finally:
+            writer.close()
+            summary.duplicates = self.filter.duplicates
+            summary.elapsed = time.monotonic() - started
+
+        if summary.complete and self.checkpoint_path:
+            try:
+                os.remove(self.checkpoint_path)
+            except FileNotFoundError:
+                pass
+        self.logger.info(
+            f"Выгрузка платежей в {self.output}: строк {summary.rows}, "
+            f"страниц {summary.pages}, за {summary.elapsed:.1f} с"
+            + ("" if summary.complete else " (не завершена)")
+        )
+        return summary
+
+    def _copy(self, writer: ExportWriter, checkpoint: ExportCheckpoint) -> None:
+        summary = self.summary
+        next_url: Optional[str] = checkpoint.next_url
+        if not next_url:
+            # Прервана после последней страницы: выгружать больше нечего
+            summary.complete = True
+            return
+
+        pages = iter_list_pages(
+            self.fetch,
+            next_url,
+            self.prefetch,
+            self.max_pages,
+            stop=self.filter.reached_since,
+        )
+        try:
+            for url, page in pages:
+                if page is None:
+                    summary.error = f"Не удалось загрузить страницу {url}"
+                    return
+                rows = self.filter.select(page)
+                writer.write(rows)
+                summary.rows += len(rows)
+                summary.pages += 1
+                next_url = None if self.filter.reached_since(page) else page.next_url
+                if self.checkpoint_path:
+                    checkpoint.offset = writer.flush()
+                    checkpoint.next_url = next_url or ""
+                    checkpoint.last_id = self.filter.last_id
+                    checkpoint.rows = summary.rows
+                    checkpoint.pages = summary.pages
+                    checkpoint.save(self.checkpoint_path)
+        finally:
+            pages.close()
+        # Выгрузка завершена, если список прочитан до конца или до since
+        summary.complete = not next_url
@@ -0,0 +1,93 @@
+"""
+Заранее подготовленные запросы создания платежа (POST /payment/method).
+
+Форма создания платежа отличается от вызова к вызову только суммой и
+телефоном: метод оплаты, токены и служебные поля одинаковы для всех платежей
+с одним методом и набором токенов. PaymentFormTemplate кодирует постоянную
+часть тела один раз, и для каждого платежа остается склеить ее с суммой и
+телефоном. Заголовки запроса общие и неизменяемые.
+"""
+
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+from urllib.parse import quote_plus, urlencode
+
+# Заголовки, которыми запрос создания платежа отличается от обычных
+FORM_HEADERS = {
+    "Content-Type": "application/x-www-form-urlencoded",
+    "Accept": "application/json, text/javascript, */*; q=0.01",
+}
+
+# Ограничение числа шаблонов клиента (токены меняются редко)
+MAX_TEMPLATES = 32
+
+
+def payment_headers(headers: Mapping[str, str], referer: str) -> Mapping[str, str]:
+    """Неизменяемые заголовки запроса создания платежа"""
+    return MappingProxyType({**headers, **FORM_HEADERS, "Referer": referer})
+
+
+class PaymentFormTemplate:
+    """
+    Тело формы создания платежа для одного метода оплаты и набора токенов.
+    Поля идут в том же порядке, что и при urlencode словаря формы.
+    """
+
+    __slots__ = ("head", "middle", "tail")
+
+    def __init__(
+        self, base_url: str, method: str, service_id: str, xf_token: str
+    ) -> None:
+        """
+        Args:
+            base_url: Адрес сайта (для поля redirect)
+            method: Код метода оплаты на сайте (Paymentlnk_Card, ...)
+            service_id: Токен service_id со страницы депозита
+            xf_token: Токен _xfToken со страницы депозита
+        """
+        self.head = b"currency=rub&amount="
+        self.middle = (
+            "&" + urlencode({"method": method}) + "&" + quote_plus("extra[phone]") + "="
+        ).encode("ascii")
+        self.tail = (
+            "&"
+            + urlencode(
+                {
+                    "service_type": "refill-balance",
+                    "service_id": service_id,
+                    "redirect": f"{base_url}/",
+                    "_xfConfirm": "1",
+                    "_xfToken": xf_token,
+                    "_xfRequestUri": "/payment/balance/deposit",
+                    "_xfNoRedirect": "1",
+                    "_xfResponseType": "json",
+                }
+            )
+        ).encode("ascii")
+
+    def render(self, amount: float, phone: Optional[str] = None) -> bytes:
+        """Тело запроса для суммы amount и телефона phone (для СБП)"""
+        parts = [self.head, quote_plus(str(amount)).encode("ascii"), self.middle]
+        if phone:
+            parts.append(quote_plus(phone).encode("ascii"))
+        parts.append(self.tail)
+        return b"".join(parts)
+
+
+class PaymentForms:
+    """Шаблоны форм клиента по методу оплаты и набору токенов"""
+
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url
+        self._templates: Dict[Tuple[str, str, str], PaymentFormTemplate] = {}
+
+    def get(self, method: str, tokens: Dict[str, str]) -> PaymentFormTemplate:
+        key = (method, tokens["service_id"], tokens["xf_token"])
+        template = self._templates.get(key)
+        if template is None:
+            if len(self._templates) >= MAX_TEMPLATES:
+                # Шаблоны с устаревшими токенами больше не понадобятся
+                self._templates.clear()
+            template = PaymentFormTemplate(self.base_url, *key)
+            self._templates[key] = template
+        return template
@@ -0,0 +1,397 @@
+"""
+Резидентный HTTP-сервис поверх LolzPayment (команда lolz_cli.py serve).
+
+Процесс держит один прогретый клиент (сессия с пулом соединений, кэш токенов,
+журнал платежей) и наблюдатель за платежами, а внешние сервисы обращаются к
+нему по локальному TCP-порту или Unix-сокету вместо запуска CLI на каждый
+запрос. Каждое соединение обслуживается в своем потоке, соединения keep-alive
+(HTTP/1.1) переиспользуются.
+
+Эндпоинты (тела запросов и ответов - JSON):
+    GET  /health - состояние сервиса
+    GET  /metrics - метрики в формате Prometheus (если включены)
+    POST /payments - создание платежа {"amount", "payment_method", "phone",
+         "idempotency_key", "watch": секунд наблюдения}
+    POST /payments/batch - пакетное создание {"requests": [...], "max_workers"}
+         (max_workers не больше MAX_BATCH_WORKERS)
+    POST /payments/check - проверка нескольких платежей {"payment_ids": [...]}
+    GET  /payments/<id>[?wait=N] - проверка платежа; с wait ответ задерживается
+         до оплаты, но не дольше N секунд
+
+Ошибки клиента (неверная сумма, ошибка сайта) возвращаются со статусом 422
+и полем "error", некорректный запрос - со статусом 400.
+"""
+
+import json
+import logging
+import math
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from lolz_payment import LolzPayment
+from metrics import PrometheusRegistry
+from models import PaymentMethod, PaymentRequest
+from payment_watcher import WATCH_COMPLETED, PaymentWatcher
+
+# Максимальный размер тела запроса в байтах
+MAX_BODY_SIZE = 1024 * 1024
+# Максимальное время ожидания оплаты в GET /payments/<id>?wait=N
+MAX_WAIT = 300.0
+# Максимальный размер пакета в POST /payments/batch
+MAX_BATCH_SIZE = 1000
+# Максимум потоков одного пакета (каждый держит соединение с сайтом)
+MAX_BATCH_WORKERS = 32
+
+JsonResponse = Tuple[int, Dict[str, Any]]
+
+
+class ServiceError(Exception):
+    """Некорректный запрос к сервису (ответ с указанным статусом)"""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _payment_request(item: Any) -> PaymentRequest:
+    """Проверка и преобразование описания платежа из JSON"""
+    if not isinstance(item, dict):
+        raise ServiceError("Ожидается объект с полями amount и payment_method")
+    try:
+        amount = float(item["amount"])
+    except (KeyError, TypeError, ValueError):
+        raise ServiceError("Поле amount обязательно и должно быть числом")
+    try:
+        method = PaymentMethod(item.get("payment_method", PaymentMethod.CARD.value))
+    except ValueError:
+        raise ServiceError(f"Неизвестный метод оплаты: {item.get('payment_method')}")
+    phone = item.get("phone")
+    if phone is not None and not isinstance(phone, str):
+        raise ServiceError("Поле phone должно быть строкой")
+    return PaymentRequest(amount, method, phone)
+
+
+class PaymentService:
+    """
+    Обработчики эндпоинтов сервиса над одним клиентом LolzPayment.
+
+    Пример:
+        lolz = LolzPayment("cookies.json", ledger=PaymentLedger("payments.db"))
+        service = PaymentService(lolz)
+        service.serve(service.tcp_server("127.0.0.1", 8765))
+    """
+
+    def __init__(
+        self,
+        client: LolzPayment,
+        watcher: Optional[PaymentWatcher] = None,
+        registry: Optional[PrometheusRegistry] = None,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        """
+        Args:
+            client: Клиент, общий для всех запросов
+            watcher: Наблюдатель за платежами (по умолчанию PaymentWatcher(client))
+            registry: Реестр метрик для GET /metrics (None - эндпоинт отключен)
+            logger: Опциональный логгер
+        """
+        self.client = client
+        self.logger = logger or client.logger
+        self.watcher = watcher or PaymentWatcher(client, logger=self.logger)
+        self.registry = registry
+        self.started_at = time.time()
+        self._servers: list = []
+        self._stopping = threading.Event()
+
+    # Обработчики эндпоинтов
+
+    def health(self) -> JsonResponse:
+        result: Dict[str, Any] = {
+            "status": "stopping" if self._stopping.is_set() else "ok",
+            "account": self.client.account_name,
+            "uptime": round(time.time() - self.started_at, 3),
+            "watched": len(self.watcher),
+        }
+        if self.client.ledger:
+            result["ledger"] = self.client.ledger.counts()
+        return 200, result
+
+    def create_payment(self, body: Any) -> JsonResponse:
+        request = _payment_request(body)
+        idempotency_key = body.get("idempotency_key")
+        watch = body.get("watch")
+        if watch is not None and not (
+            isinstance(watch, (int, float)) and math.isfinite(watch)
+        ):
+            raise ServiceError("Поле watch должно быть числом секунд")
+        if idempotency_key is not None and not isinstance(idempotency_key, str):
+            raise ServiceError("Поле idempotency_key должно быть строкой")
+        response = self.client.create_payment(
+            request.amount,
+            request.payment_method.value,
+            request.phone,
+            idempotency_key=idempotency_key,
+        )
+        if not response.payment_id:
+            return 422, response.to_dict()
+        if watch:
+            self.watcher.watch(
+                response.payment_id,
+                request.payment_method.value,
+                timeout=float(watch),
+            )
+        return 201, response.to_dict()
+
+    def create_payments(self, body: Any) -> JsonResponse:
+        items = body.get("requests") if isinstance(body, dict) else None
+        if not isinstance(items, list):
+            raise ServiceError("Поле requests должно быть списком")
+        if len(items) > MAX_BATCH_SIZE:
+            raise ServiceError(f"Не больше {MAX_BATCH_SIZE} платежей в пакете")
+        requests = [_payment_request(item) for item in items]
+        max_workers = body.get("max_workers") or 8
+        if not isinstance(max_workers, int) or max_workers < 1:
+            raise ServiceError("Поле max_workers должно быть положительным числом")
+        max_workers = min(max_workers, MAX_BATCH_WORKERS)
+
+        batch = self.client.create_payments(requests, max_workers=max_workers)
+        results: list = [None] * len(requests)
+        for item in batch:
+            results[item.index] = item.response.to_dict()
+        return 200, {"results": results, "summary": batch.summary.to_dict()}
+
+    def check_payments(self, body: Any) -> JsonResponse:
+        payment_ids = body.get("payment_ids") if isinstance(body, dict) else None
+        if not isinstance(payment_ids, list) or not all(
+            isinstance(payment_id, str) for payment_id in payment_ids
+        ):
+            raise ServiceError("Поле payment_ids должно быть списком строк")
+        results = self.client.check_payments(payment_ids)
+        return 200, {
+            "payments": {
+                payment_id: info.to_dict() if info else None
+                for payment_id, info in results.items()
+            }
+        }
+
+    def check_payment(self, payment_id: str, wait: float = 0.0) -> JsonResponse:
+        if not math.isfinite(wait):
+            raise ServiceError("Параметр wait должен быть конечным числом")
+        wait = min(wait, MAX_WAIT)
+        payment_info = self.client.check_payment(payment_id)
+        waiting = wait > 0 and not self._stopping.is_set()
+        if waiting and not (payment_info and payment_info.is_paid):
+            # Ожидание оплаты через общий наблюдатель: сколько бы клиентов ни
+            # ждали платежей, сайт опрашивается одним запросом списка за такт
+            future = self.watcher.watch(payment_id, timeout=wait)
+            try:
+                result = future.result(timeout=wait)
+            except (FutureTimeoutError, CancelledError):
+                # По таймауту или при остановке сервиса - текущий статус
+                result = None
+            if result and result.status == WATCH_COMPLETED and result.payment_info:
+                payment_info = result.payment_info
+        if not payment_info:
+            return 404, {"error": f"Платеж с ID {payment_id} не найден"}
+        return 200, payment_info.to_dict()
+
+    def metrics(self) -> Optional[str]:
+        return self.registry.render() if self.registry else None
+
+    # Серверы и жизненный цикл
+
+    def _handler_class(self) -> type:
+        return type("PaymentServiceHandler", (_Handler,), {"service": self})
+
+    def tcp_server(
+        self, host: str = "127.0.0.1", port: int = 8765
+    ) -> socketserver.BaseServer:
+        """HTTP-сервер на TCP-порту"""
+        server = _TCPServer((host, port), self._handler_class())
+        self._servers.append(server)
+        return server
+
+    def unix_server(self, path: str) -> socketserver.BaseServer:
+        """HTTP-сервер на Unix-сокете (оставшийся от прошлого запуска файл удаляется)"""
+        if os.path.exists(path):
+            os.unlink(path)
+        server = _UnixServer(path, self._handler_class())
+        os.chmod(path, 0o660)
+        self._servers.append(server)
+        return server
+
+    def serve(self, server: socketserver.BaseServer) -> None:
+        """
+        Обслуживание запросов до SIGINT/SIGTERM (или вызова stop).
+        При остановке новые соединения не принимаются, наблюдатель
+        останавливается, а запросы, ожидающие оплаты (?wait=N), сразу получают
+        текущий статус платежа. Затем начатые запросы дообрабатываются
+        и закрывается клиент.
+        """
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: self.stop())
+        self.watcher.start()
+        self.logger.info(f"Сервис платежей запущен: {_address(server)}")
+        try:
+            server.serve_forever()
+        finally:
+            self._stopping.set()
+            # Наблюдатель останавливается до ожидания потоков запросов: иначе
+            # запрос с ?wait=N задержал бы остановку на N секунд
+            self.watcher.stop()
+            for payment_id in self.watcher.watched_ids():
+                self.watcher.unwatch(payment_id)
+            # Ожидание потоков, которые еще обрабатывают запросы
+            server.server_close()
+            if isinstance(server, _UnixServer):
+                try:
+                    os.unlink(server.server_address)
+                except OSError:
+                    pass
+            self.client.close()
+            self.logger.info("Сервис платежей остановлен")
+
+    def stop(self) -> None:
+        """Плавная остановка (можно вызывать из обработчика сигнала)"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self.logger.info("Остановка сервиса платежей...")
+        # shutdown() ждет выхода из serve_forever, поэтому вызывается не
+        # из потока, который его выполняет
+        for server in self._servers:
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+
+def _address(server: socketserver.BaseServer) -> str:
+    if isinstance(server.server_address, tuple):
+        host, port = server.server_address[:2]
+        return f"http://{host}:{port}"
+    return f"unix:{server.server_address}"
+
+
+class _ServerOptions:
+    request_queue_size = 128
+    # Потоки запросов не демонические: server_close() дожидается их завершения
+    daemon_threads = False
+    block_on_close = True
+
+    def handle_error(self, request, client_address) -> None:
+        # Разрыв соединения клиентом - не ошибка сервиса
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class _TCPServer(_ServerOptions, ThreadingHTTPServer):
+    pass
+
+
+class _UnixServer(
+    _ServerOptions, socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "LolzPaymentService"
+    # Простаивающее keep-alive соединение закрывается через timeout секунд:
+    # остановка сервиса ждет завершения всех потоков соединений
+    timeout = 5
+    service: PaymentService
+
+    def log_message(self, format: str, *args) -> None:
+        self.service.logger.debug(format % args)
+
+    def address_string(self) -> str:
+        # У Unix-сокета нет адреса клиента
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if self.service._stopping.is_set():
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        try:
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент закрыл соединение, не дождавшись ответа
+            self.close_connection = True
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._send(status, body, "application/json; charset=utf-8")
+
+    def _read_json(self) -> Any:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ServiceError("Некорректный Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise ServiceError("Слишком большое тело запроса", 413)
+        raw = self.rfile.read(length) if length else b"{}"
+        try:
+            body = json.loads(raw)
+        except ValueError as e:
+            raise ServiceError(f"Некорректный JSON: {e}")
+        if not isinstance(body, dict):
+            raise ServiceError("Тело запроса должно быть JSON-объектом")
+        return body
+
+    def _dispatch(self, method: str) -> None:
+        service = self.service
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        try:
+            if method == "GET" and path == "/health":
+                result = service.health()
+            elif method == "GET" and path == "/metrics":
+                text = service.metrics()
+                if text is None:
+                    raise ServiceError("Метрики не включены", 404)
+                result = None
+            elif method == "POST" and path == "/payments":
+                result = service.create_payment(self._read_json())
+            elif method == "POST" and path == "/payments/batch":
+                result = service.create_payments(self._read_json())
+            elif method == "POST" and path == "/payments/check":
+                result = service.check_payments(self._read_json())
+            elif method == "GET" and path.startswith("/payments/"):
+                payment_id = path[len("/payments/") :]
+                try:
+                    wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+                except ValueError:
+                    raise ServiceError("Параметр wait должен быть числом")
+                result = service.check_payment(payment_id, wait)
+            else:
+                raise ServiceError(f"Неизвестный эндпоинт: {method} {url.path}", 404)
+        except ServiceError as e:
+            result = (e.status, {"error": str(e)})
+        except Exception as e:
+            service.logger.error(f"Ошибка обработки запроса {method} {url.path}: {e}")
+            result = (500, {"error": f"Внутренняя ошибка: {e}"})
+        if result is None:
+            self._send(200, text.encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._send_json(*result)
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
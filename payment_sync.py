@@ -0,0 +1,157 @@
+"""
+Инкрементальная синхронизация списка платежей.
+
+Таблица /payment/list отсортирована от новых платежей к старым, а ID платежей
+растут со временем. Синхронизация запоминает самый новый увиденный ID
+(high-water mark) и ограниченное окно еще не оплаченных платежей. Следующая
+синхронизация читает таблицу сверху только до тех пор, пока не дойдет до
+строк не новее отметки и старше самого старого отслеживаемого неоплаченного
+платежа: дальше идет история, которая уже не меняется, и чтение прерывается.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+from models import PaymentInfo, PaymentStatus
+from parsing import payment_rows_scanner
+
+
+@dataclass
+class PaymentDiff:
+    """Изменения списка платежей с прошлой синхронизации"""
+
+    new: List[PaymentInfo] = field(default_factory=list)
+    changed: List[PaymentInfo] = field(default_factory=list)
+    pages: int = 0
+    rows_scanned: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.new or self.changed)
+
+    @property
+    def payments(self) -> List[PaymentInfo]:
+        """Новые и изменившиеся платежи"""
+        return self.new + self.changed
+
+
+def _numeric_id(payment_id: str) -> Optional[int]:
+    return int(payment_id) if payment_id.isdigit() else None
+
+
+class IncrementalSync:
+    """
+    Состояние инкрементальной синхронизации одного аккаунта.
+    Клиенты создают его сами (см. sync_payments); страницы разбираются
+    через PageScan по мере загрузки.
+    """
+
+    def __init__(self, pending_window: int = 200) -> None:
+        """
+        Args:
+            pending_window: Сколько самых новых неоплаченных платежей
+                перепроверяется при каждой синхронизации
+        """
+        self.pending_window = pending_window
+        self.high_water_id: Optional[int] = None
+        self.high_water_date: Optional[str] = None
+        # Неоплаченные платежи в окне: ID -> последний известный статус
+        self.pending: Dict[str, PaymentInfo] = {}
+        self.lock = threading.Lock()
+
+    def page(self, page_url: str, backend: Optional[str], diff: PaymentDiff) -> "PageScan":
+        """Разбор очередной страницы списка в рамках одной синхронизации"""
+        diff.pages += 1
+        return PageScan(self, page_url, backend, diff)
+
+    def finish(self, diff: PaymentDiff) -> None:
+        """Сдвиг отметки и обрезка окна неоплаченных платежей после синхронизации"""
+        for payment_info in diff.new:
+            numeric_id = _numeric_id(payment_info.payment_id)
+            if numeric_id is not None and (
+                self.high_water_id is None or numeric_id > self.high_water_id
+            ):
+                self.high_water_id = numeric_id
+                self.high_water_date = payment_info.creation_date
+
+        if len(self.pending) > self.pending_window:
+            # Самые старые неоплаченные платежи выходят из окна
+            by_age = sorted(self.pending, key=lambda payment_id: int(payment_id))
+            for payment_id in by_age[: len(self.pending) - self.pending_window]:
+                del self.pending[payment_id]
+
+    def _lowest_pending(self) -> Optional[int]:
+        return min((int(payment_id) for payment_id in self.pending), default=None)
+
+
+class PageScan:
+    """Разбор одной страницы: новые строки, изменения окна и признак остановки"""
+
+    def __init__(
+        self,
+        sync: IncrementalSync,
+        page_url: str,
+        backend: Optional[str],
+        diff: PaymentDiff,
+    ) -> None:
+        self.sync = sync
+        self.page_url = page_url
+        self.diff = diff
+        self.stopped = False
+        self._scanner = payment_rows_scanner(backend)
+        # Отметка на начало синхронизации: строки, добавленные на первой
+        # странице, не должны останавливать чтение следующих страниц
+        self._high_water_id = sync.high_water_id
+        self._lowest_pending = sync._lowest_pending()
+
+    def feed(self, data: str) -> bool:
+        """
+        Передача очередного куска HTML.
+
+        Returns:
+            bool: True, если дальше идет неизменная история и чтение можно прервать
+        """
+        if not self.stopped:
+            self._scanner.feed(data)
+            self._apply(self._scanner.drain())
+        return self.stopped
+
+    def close(self) -> None:
+        if not self.stopped:
+            self._scanner.close()
+            self._apply(self._scanner.drain())
+
+    @property
+    def next_url(self) -> Optional[str]:
+        """Следующая страница, если таблица прочитана до конца без остановки"""
+        if self.stopped or not self._scanner.next_href:
+            return None
+        return urljoin(self.page_url, self._scanner.next_href)
+
+    def _apply(self, rows: List[PaymentInfo]) -> None:
+        sync = self.sync
+        for payment_info in rows:
+            self.diff.rows_scanned += 1
+            numeric_id = _numeric_id(payment_info.payment_id)
+            if numeric_id is None:
+                continue
+
+            if self._high_water_id is None or numeric_id > self._high_water_id:
+                self.diff.new.append(payment_info)
+                if payment_info.status != PaymentStatus.COMPLETED:
+                    sync.pending[payment_info.payment_id] = payment_info
+                continue
+
+            known = sync.pending.get(payment_info.payment_id)
+            if known is not None:
+                if known != payment_info:
+                    self.diff.changed.append(payment_info)
+                if payment_info.status == PaymentStatus.COMPLETED:
+                    del sync.pending[payment_info.payment_id]
+                else:
+                    sync.pending[payment_info.payment_id] = payment_info
+
+            if self._lowest_pending is None or numeric_id <= self._lowest_pending:
+                self.stopped = True
+                return
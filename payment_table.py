@@ -0,0 +1,115 @@
+"""
+Колоночное хранение больших наборов платежей (сверка, выгрузки).
+
+Числовые поля лежат в массивах array (8 байт на значение вместо объекта
+Python), повторяющиеся строки (статус на сайте, тип оплаты) интернируются,
+а PaymentInfo собирается только при обращении к строке.
+"""
+
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from models import PaymentInfo, PaymentStatus
+
+# Значение в числовых колонках, означающее «нет данных»
+MISSING = -(2**63)
+
+_STATUS_CODES = {status: code for code, status in enumerate(PaymentStatus)}
+_STATUSES = list(PaymentStatus)
+
+
+class PaymentTable:
+    """Набор платежей по колонкам с доступом к строкам как к PaymentInfo"""
+
+    def __init__(self, payments: Iterable[PaymentInfo] = ()) -> None:
+        self.payment_ids: List[str] = []
+        self.amount_kopecks = array("q")
+        self.created_ts = array("q")
+        self.statuses = array("b")
+        self._creation_dates: List[str] = []
+        self._payment_dates: List[str] = []
+        self._amounts: List[str] = []
+        self._payment_types: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.extend(payments)
+
+    def __len__(self) -> int:
+        return len(self.payment_ids)
+
+    def __iter__(self) -> Iterator[PaymentInfo]:
+        for position in range(len(self)):
+            yield self[position]
+
+    def __getitem__(self, position: int) -> PaymentInfo:
+        return PaymentInfo(
+            payment_id=self.payment_ids[position],
+            creation_date=self._creation_dates[position],
+            payment_date=self._payment_dates[position],
+            amount=self._amounts[position],
+            payment_type=self._payment_types[position],
+            status=_STATUSES[self.statuses[position]],
+        )
+
+    def __contains__(self, payment_id: str) -> bool:
+        return payment_id in self._index
+
+    def append(self, payment_info: PaymentInfo) -> None:
+        """Добавление платежа (повторный ID заменяет прежнюю строку)"""
+        position = self._index.get(payment_info.payment_id)
+        if position is not None:
+            self._set(position, payment_info)
+            return
+
+        self._index[payment_info.payment_id] = len(self.payment_ids)
+        self.payment_ids.append(payment_info.payment_id)
+        self.amount_kopecks.append(0)
+        self.created_ts.append(0)
+        self.statuses.append(0)
+        self._creation_dates.append("")
+        self._payment_dates.append("")
+        self._amounts.append("")
+        self._payment_types.append("")
+        self._set(len(self.payment_ids) - 1, payment_info)
+
+    def extend(self, payments: Iterable[PaymentInfo]) -> None:
+        for payment_info in payments:
+            self.append(payment_info)
+
+    def _set(self, position: int, payment_info: PaymentInfo) -> None:
+        kopecks = payment_info.amount_kopecks
+        created_ts = payment_info.created_ts
+        self.amount_kopecks[position] = MISSING if kopecks is None else kopecks
+        self.created_ts[position] = MISSING if created_ts is None else int(created_ts)
+        self.statuses[position] = _STATUS_CODES[payment_info.status]
+        self._creation_dates[position] = payment_info.creation_date
+        self._payment_dates[position] = sys.intern(payment_info.payment_date)
+        self._amounts[position] = sys.intern(payment_info.amount)
+        self._payment_types[position] = sys.intern(payment_info.payment_type)
+
+    def get(self, payment_id: str) -> Optional[PaymentInfo]:
+        position = self._index.get(payment_id)
+        return None if position is None else self[position]
+
+    def ids_with_status(self, status: PaymentStatus) -> List[str]:
+        """ID платежей с указанным статусом"""
+        code = _STATUS_CODES[PaymentStatus.parse(status)]
+        return [
+            payment_id
+            for payment_id, status_code in zip(self.payment_ids, self.statuses)
+            if status_code == code
+        ]
+
+    def total_kopecks(self, status: Optional[PaymentStatus] = None) -> int:
+        """Сумма платежей в копейках (по всем или только с указанным статусом)"""
+        if status is None:
+            return sum(value for value in self.amount_kopecks if value != MISSING)
+        code = _STATUS_CODES[PaymentStatus.parse(status)]
+        return sum(
+            value
+            for value, status_code in zip(self.amount_kopecks, self.statuses)
+            if status_code == code and value != MISSING
+        )
+
+    def to_dicts(self) -> List[Dict[str, str]]:
+        return [payment_info.to_dict() for payment_info in self]
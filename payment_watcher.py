@@ -0,0 +1,409 @@
+"""
+Отслеживание статуса множества платежей одним опросом списка платежей.
+Вместо отдельного цикла check_payment на каждый платеж наблюдатель
+раз в такт загружает /payment/list и проверяет все платежи, которым пора.
+"""
+
+import asyncio
+import concurrent.futures
+import inspect
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models import PaymentInfo, PaymentMethod
+
+# Итоги наблюдения за платежом
+WATCH_COMPLETED = "completed"
+WATCH_TIMEOUT = "timeout"
+
+
+@dataclass
+class WatchResult:
+    payment_id: str
+    status: str  # WATCH_COMPLETED или WATCH_TIMEOUT
+    payment_info: Optional[PaymentInfo] = None
+
+
+@dataclass
+class PollSchedule:
+    """
+    Адаптивный интервал опроса: свежие платежи проверяются часто,
+    чем старше платеж, тем реже. Медленные методы оплаты опрашиваются реже.
+    """
+
+    base_interval: float = 5.0
+    max_interval: float = 120.0
+    # За сколько секунд возраста платежа интервал удваивается
+    doubling_age: float = 300.0
+    method_factors: Dict[str, float] = field(
+        default_factory=lambda: {
+            PaymentMethod.CARD.value: 1.0,
+            PaymentMethod.SBP.value: 1.0,
+            PaymentMethod.BINANCE.value: 2.0,
+            PaymentMethod.STEAM.value: 3.0,
+        }
+    )
+
+    def interval(self, age: float, payment_method: Optional[str] = None) -> float:
+        """Интервал до следующей проверки платежа возрастом age секунд"""
+        factor = self.method_factors.get(payment_method, 1.0) if payment_method else 1.0
+        interval = self.base_interval * factor * 2 ** (age / self.doubling_age)
+        return min(interval, self.max_interval)
+
+
+@dataclass
+class WatchedPayment:
+    payment_id: str
+    payment_method: Optional[str]
+    added_at: float
+    deadline: float
+    next_check_at: float
+    future: Any
+    callbacks: List[Callable[[WatchResult], Any]] = field(default_factory=list)
+    last_info: Optional[PaymentInfo] = None
+
+
+class _WatcherBase:
+    """Общее состояние и расписание синхронного и асинхронного наблюдателей"""
+
+    def __init__(
+        self,
+        schedule: Optional[PollSchedule] = None,
+        tick_interval: float = 1.0,
+        default_timeout: float = 1800.0,
+        on_result: Optional[Callable[[WatchResult], Any]] = None,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        """
+        Args:
+            schedule: Расписание опроса (по умолчанию PollSchedule())
+            tick_interval: Период такта наблюдателя в секундах
+            default_timeout: Время ожидания оплаты по умолчанию в секундах
+            on_result: Обработчик, вызываемый для каждого завершенного платежа
+            logger: Опциональный логгер
+        """
+        self.schedule = schedule or PollSchedule()
+        self.tick_interval = tick_interval
+        self.default_timeout = default_timeout
+        self.on_result = on_result
+        self.logger = logger or logging.getLogger("LolzPayment")
+        self._watched: Dict[str, WatchedPayment] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._watched)
+
+    def watched_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._watched)
+
+    def _add(
+        self,
+        payment_id: str,
+        payment_method: Optional[str],
+        timeout: Optional[float],
+        future: Any,
+        callback: Optional[Callable[[WatchResult], Any]],
+    ) -> Any:
+        """
+        Добавление платежа в наблюдение. Повторный вызов для того же платежа
+        возвращает прежний Future: обработчик добавляется к прежним, а срок
+        ожидания продлевается до более позднего.
+        """
+        now = time.monotonic()
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            entry = self._watched.get(payment_id)
+            if entry is None:
+                entry = self._watched[payment_id] = WatchedPayment(
+                    payment_id=payment_id,
+                    payment_method=payment_method,
+                    added_at=now,
+                    deadline=now + timeout,
+                    next_check_at=now,
+                    future=future,
+                )
+            else:
+                entry.deadline = max(entry.deadline, now + timeout)
+                entry.payment_method = entry.payment_method or payment_method
+            if callback:
+                entry.callbacks.append(callback)
+            return entry.future
+
+    def _remove(self, payment_id: str) -> Optional[WatchedPayment]:
+        with self._lock:
+            return self._watched.pop(payment_id, None)
+
+    def _due_ids(self, now: float) -> List[str]:
+        with self._lock:
+            return [
+                payment_id
+                for payment_id, entry in self._watched.items()
+                if entry.next_check_at <= now
+            ]
+
+    def _process(
+        self, results: Dict[str, Optional[PaymentInfo]], now: float
+    ) -> List[Tuple[WatchedPayment, WatchResult]]:
+        """
+        Применение результатов опроса: завершенные и просроченные платежи
+        снимаются с наблюдения, остальным назначается следующая проверка.
+        """
+        finished = []
+        with self._lock:
+            for payment_id, entry in list(self._watched.items()):
+                if payment_id in results:
+                    payment_info = results[payment_id]
+                    if payment_info:
+                        entry.last_info = payment_info
+                    if payment_info and payment_info.status == WATCH_COMPLETED:
+                        del self._watched[payment_id]
+                        finished.append(
+                            (entry, WatchResult(payment_id, WATCH_COMPLETED, payment_info))
+                        )
+                        continue
+                    age = now - entry.added_at
+                    entry.next_check_at = now + self.schedule.interval(
+                        age, entry.payment_method
+                    )
+
+                if entry.deadline <= now:
+                    del self._watched[payment_id]
+                    finished.append(
+                        (entry, WatchResult(payment_id, WATCH_TIMEOUT, entry.last_info))
+                    )
+
+        for entry, result in finished:
+            if result.status == WATCH_COMPLETED:
+                self.logger.info(f"Платеж {result.payment_id} успешно оплачен")
+            else:
+                self.logger.warning(
+                    f"Истекло время ожидания для платежа {result.payment_id}"
+                )
+        return finished
+
+    def _next_wakeup(self, now: float) -> float:
+        """Время сна до ближайшей проверки, но не дольше такта"""
+        with self._lock:
+            if not self._watched:
+                return self.tick_interval
+            nearest = min(
+                min(entry.next_check_at, entry.deadline)
+                for entry in self._watched.values()
+            )
+        return max(0.0, min(self.tick_interval, nearest - now))
+
+
+class PaymentWatcher(_WatcherBase):
+    """
+    Наблюдатель за платежами в фоновом потоке для синхронного LolzPayment.
+
+    Пример:
+        with PaymentWatcher(lolz) as watcher:
+            result = watcher.watch(payment_id, timeout=300).result()
+    """
+
+    def __init__(self, client, **kwargs) -> None:
+        """
+        Args:
+            client: Экземпляр LolzPayment
+            **kwargs: Параметры _WatcherBase (schedule, tick_interval, ...)
+        """
+        super().__init__(**kwargs)
+        self.client = client
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "PaymentWatcher":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def watch(
+        self,
+        payment_id: str,
+        payment_method: Optional[str] = None,
+        timeout: Optional[float] = None,
+        callback: Optional[Callable[[WatchResult], Any]] = None,
+    ) -> "concurrent.futures.Future[WatchResult]":
+        """
+        Добавление платежа в наблюдение.
+
+        Args:
+            payment_id: Идентификатор платежа
+            payment_method: Метод оплаты (влияет на частоту опроса)
+            timeout: Время ожидания оплаты в секундах
+            callback: Функция, вызываемая с WatchResult по завершении
+
+        Returns:
+            Future, которое завершается WatchResult при оплате или по таймауту
+        """
+        future = self._add(
+            payment_id, payment_method, timeout, concurrent.futures.Future(), callback
+        )
+        self._wakeup.set()
+        return future
+
+    def unwatch(self, payment_id: str) -> None:
+        """Снятие платежа с наблюдения (его Future отменяется)"""
+        entry = self._remove(payment_id)
+        if entry:
+            entry.future.cancel()
+
+    def start(self) -> None:
+        """Запуск фонового потока опроса"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="PaymentWatcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Остановка фонового потока"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def tick(self) -> List[WatchResult]:
+        """Один такт опроса: проверка всех платежей, которым пора"""
+        now = time.monotonic()
+        due = self._due_ids(now)
+        results = self.client.check_payments(due) if due else {}
+        finished = self._process(results, time.monotonic())
+        for entry, result in finished:
+            self._deliver(entry, result)
+        return [result for _, result in finished]
+
+    def _deliver(self, entry: WatchedPayment, result: WatchResult) -> None:
+        for handler in (*entry.callbacks, self.on_result):
+            if handler:
+                try:
+                    handler(result)
+                except Exception as e:
+                    self.logger.error(f"Ошибка в обработчике платежа: {e}")
+        if not entry.future.done():
+            entry.future.set_result(result)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            delay = self.tick_interval
+            try:
+                self.tick()
+                delay = self._next_wakeup(time.monotonic())
+            except Exception as e:
+                self.logger.error(f"Ошибка опроса платежей: {e}")
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+
+class AsyncPaymentWatcher(_WatcherBase):
+    """
+    Наблюдатель за платежами на asyncio для AsyncLolzPayment.
+    Обработчики могут быть как обычными функциями, так и корутинами.
+    """
+
+    def __init__(self, client, **kwargs) -> None:
+        """
+        Args:
+            client: Экземпляр AsyncLolzPayment
+            **kwargs: Параметры _WatcherBase (schedule, tick_interval, ...)
+        """
+        super().__init__(**kwargs)
+        self.client = client
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    async def __aenter__(self) -> "AsyncPaymentWatcher":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    def watch(
+        self,
+        payment_id: str,
+        payment_method: Optional[str] = None,
+        timeout: Optional[float] = None,
+        callback: Optional[Callable[[WatchResult], Any]] = None,
+    ) -> "asyncio.Future[WatchResult]":
+        """
+        Добавление платежа в наблюдение.
+
+        Returns:
+            asyncio.Future, которое завершается WatchResult при оплате или по таймауту
+        """
+        future = asyncio.get_running_loop().create_future()
+        future = self._add(payment_id, payment_method, timeout, future, callback)
+        if self._wakeup:
+            self._wakeup.set()
+        return future
+
+    def unwatch(self, payment_id: str) -> None:
+        """Снятие платежа с наблюдения (его Future отменяется)"""
+        entry = self._remove(payment_id)
+        if entry:
+            entry.future.cancel()
+
+    def start(self) -> None:
+        """Запуск задачи опроса в текущем цикле событий"""
+        if self._task and not self._task.done():
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановка задачи опроса после завершения текущего такта"""
+        if self._task:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    async def tick(self) -> List[WatchResult]:
+        """Один такт опроса: проверка всех платежей, которым пора"""
+        now = time.monotonic()
+        due = self._due_ids(now)
+        results = await self.client.check_payments(due) if due else {}
+        finished = self._process(results, time.monotonic())
+        for entry, result in finished:
+            await self._deliver(entry, result)
+        return [result for _, result in finished]
+
+    async def _deliver(self, entry: WatchedPayment, result: WatchResult) -> None:
+        for handler in (*entry.callbacks, self.on_result):
+            if handler:
+                try:
+                    outcome = handler(result)
+                    if inspect.isawaitable(outcome):
+                        await outcome
+                except Exception as e:
+                    self.logger.error(f"Ошибка в обработчике платежа: {e}")
+        if not entry.future.done():
+            entry.future.set_result(result)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            delay = self.tick_interval
+            try:
+                await self.tick()
+                delay = self._next_wakeup(time.monotonic())
+            except Exception as e:
+                self.logger.error(f"Ошибка опроса платежей: {e}")
+            timer = loop.call_later(delay, self._wakeup.set)
+            await self._wakeup.wait()
+            timer.cancel()
+            self._wakeup.clear()
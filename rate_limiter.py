@@ -0,0 +1,263 @@
+"""
+Ограничение частоты запросов к Lolz Market на стороне клиента.
+
+TokenBucket задает средний темп и допустимый всплеск для каждого типа запросов,
+а AdaptiveConcurrency подстраивает число одновременных запросов по принципу
+AIMD: медленно увеличивает лимит, пока сайт отвечает быстро и без ошибок, и
+резко уменьшает его при ответах 429/5xx или росте задержки.
+"""
+
+import collections
+import threading
+import time
+from typing import TYPE_CHECKING, Deque, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    # asyncio нужен только асинхронному клиенту и импортируется в его методах
+    import asyncio
+
+# Типы запросов, для которых ведутся отдельные лимиты
+BUDGET_DEPOSIT = "deposit"  # GET /payment/balance/deposit
+BUDGET_METHOD = "method"  # POST /payment/method
+BUDGET_LIST = "list"  # GET /payment/list
+
+
+class TokenBucket:
+    """Потокобезопасное ведро токенов: rate токенов в секунду, не больше burst"""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        """
+        Args:
+            rate: Средний темп запросов в секунду
+            burst: Максимальный всплеск (емкость ведра)
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Резервирование токенов. Баланс может уйти в минус - тогда вызывающий
+        должен подождать возвращенное время, прежде чем отправить запрос.
+
+        Returns:
+            float: Время ожидания в секундах (0, если токены есть)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            delay = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            if delay:
+                self.waits += 1
+                self.wait_time += delay
+            return delay
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Блокирующее получение токенов, возвращает время ожидания"""
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """Асинхронное получение токенов, возвращает время ожидания"""
+        delay = self.reserve(tokens)
+        if delay:
+            import asyncio
+
+            await asyncio.sleep(delay)
+        return delay
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD-лимит одновременных запросов, общий для потоков и корутин.
+    Успешный быстрый ответ увеличивает лимит на 1/limit (примерно +1 за
+    «окно» запросов), ответ 429/5xx умножает лимит на backoff, медленный
+    ответ - на slow_backoff. Уменьшение происходит не чаще раза в cooldown
+    секунд, чтобы одна волна ошибок не обнулила лимит.
+    """
+
+    def __init__(
+        self,
+        initial: float = 8,
+        minimum: float = 1,
+        maximum: float = 64,
+        latency_target: float = 2.0,
+        backoff: float = 0.5,
+        slow_backoff: float = 0.9,
+        cooldown: float = 1.0,
+    ) -> None:
+        """
+        Args:
+            initial: Начальный лимит одновременных запросов
+            minimum: Нижняя граница лимита
+            maximum: Верхняя граница лимита
+            latency_target: Задержка ответа (с), выше которой лимит снижается
+            backoff: Множитель лимита при 429/5xx или сетевой ошибке
+            slow_backoff: Множитель лимита при медленном ответе
+            cooldown: Минимальный интервал между снижениями лимита в секундах
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.slow_backoff = slow_backoff
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.throttled = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._async_waiters: Deque[
+            Tuple["asyncio.AbstractEventLoop", "asyncio.Future"]
+        ] = collections.deque()
+
+    def _try_enter(self) -> bool:
+        if self.in_flight < max(1, int(self.limit)):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self) -> None:
+        """Блокирующее ожидание свободного слота"""
+        with self._condition:
+            while not self._try_enter():
+                self._condition.wait()
+
+    async def acquire_async(self) -> None:
+        """Асинхронное ожидание свободного слота"""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._try_enter():
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Передаем пробуждение следующему ожидающему
+                with self._lock:
+                    self._wake_one()
+                raise
+
+    def release(self, status_code: Optional[int], latency: float) -> None:
+        """
+        Освобождение слота с учетом результата запроса.
+
+        Args:
+            status_code: HTTP-статус ответа (None - сетевая ошибка)
+            latency: Время ответа в секундах
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            overloaded = status_code is None or status_code == 429 or status_code >= 500
+            if overloaded:
+                self.throttled += 1
+            if overloaded or latency > self.latency_target:
+                if now - self._last_decrease >= self.cooldown:
+                    factor = self.backoff if overloaded else self.slow_backoff
+                    self.limit = max(self.minimum, self.limit * factor)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._condition.notify()
+            self._wake_one()
+
+    def _wake_one(self) -> None:
+        while self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            if not waiter.done():
+                loop.call_soon_threadsafe(self._set_waiter, waiter)
+                return
+
+    @staticmethod
+    def _set_waiter(waiter: "asyncio.Future") -> None:
+        if not waiter.done():
+            waiter.set_result(None)
+
+
+class RateLimiter:
+    """
+    Лимиты запросов клиента: отдельное ведро токенов на каждый тип запросов
+    и общий адаптивный лимит одновременных запросов.
+    """
+
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, Tuple[float, float]]] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+    ) -> None:
+        """
+        Args:
+            budgets: Тип запроса -> (запросов в секунду, всплеск)
+            concurrency: Адаптивный лимит одновременных запросов
+        """
+        if budgets is None:
+            budgets = {
+                BUDGET_DEPOSIT: (1.0, 3),
+                BUDGET_METHOD: (5.0, 10),
+                BUDGET_LIST: (2.0, 5),
+            }
+        self.buckets = {
+            name: TokenBucket(rate, burst) for name, (rate, burst) in budgets.items()
+        }
+        self.concurrency = concurrency or AdaptiveConcurrency()
+
+    def acquire(self, budget: Optional[str]) -> None:
+        """Ожидание разрешения на запрос указанного типа"""
+        bucket = self.buckets.get(budget)
+        if bucket:
+            bucket.acquire()
+        self.concurrency.acquire()
+
+    async def acquire_async(self, budget: Optional[str]) -> None:
+        """Асинхронное ожидание разрешения на запрос указанного типа"""
+        bucket = self.buckets.get(budget)
+        if bucket:
+            await bucket.acquire_async()
+        await self.concurrency.acquire_async()
+
+    def release(self, status_code: Optional[int], latency: float) -> None:
+        """Учет результата запроса"""
+        self.concurrency.release(status_code, latency)
+
+    def stats(self) -> Dict[str, object]:
+        """Текущее состояние лимитов для метрик"""
+        return {
+            "budgets": {
+                name: {
+                    "tokens": round(bucket.tokens, 3),
+                    "rate": bucket.rate,
+                    "burst": bucket.burst,
+                    "waits": bucket.waits,
+                    "wait_time": round(bucket.wait_time, 3),
+                }
+                for name, bucket in self.buckets.items()
+            },
+            "concurrency": {
+                "limit": round(self.concurrency.limit, 3),
+                "in_flight": self.concurrency.in_flight,
+                "throttled": self.concurrency.throttled,
+            },
+        }
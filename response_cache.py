@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+
+# Результаты обращения к кэшу (см. ResponseCache.get)
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+CACHE_REVALIDATED = "revalidated"
+CACHE_COALESCED = "coalesced"
+
+
+@dataclass
+class CachedPage:
+    status_code: int
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    expires_at: float = 0.0
+
+    def validators(self) -> Dict[str, str]:
+        """Заголовки условного запроса для повторной загрузки страницы"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass
+class _Flight:
+    """Загрузка страницы, которая уже выполняется одним из потоков"""
+
+    event: threading.Event = field(default_factory=threading.Event)
+    page: Optional[CachedPage] = None
+    error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """
+    Кратковременный кэш GET-страниц (список платежей, страница депозита).
+
+    Свежая запись отдается без запроса. Одновременные запросы одной страницы
+    ждут единственную загрузку. Устаревшая запись с ETag или Last-Modified
+    перезапрашивается условно: ответ 304 продлевает ее без передачи тела.
+    Число записей ограничено, давно не использованные вытесняются (LRU).
+    """
+
+    def __init__(
+        self,
+        ttl: float = 1.5,
+        ttls: Optional[Dict[str, float]] = None,
+        max_entries: int = 128,
+    ) -> None:
+        """
+        Args:
+            ttl: Время, в течение которого страница отдается без запроса, в секундах
+            ttls: Время свежести по типу запроса (BUDGET_LIST, BUDGET_DEPOSIT, ...),
+                переопределяет ttl; 0 - только условный перезапрос и общая загрузка
+            max_entries: Максимум страниц в кэше
+        """
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            (CACHE_HIT, CACHE_MISS, CACHE_REVALIDATED, CACHE_COALESCED), 0
+        )
+
+    def ttl_for(self, budget: Optional[str]) -> float:
+        return self.ttls.get(budget, self.ttl) if budget else self.ttl
+
+    def get(
+        self,
+        key: str,
+        fetch: Callable[[Dict[str, str]], CachedPage],
+        ttl: Optional[float] = None,
+    ) -> Tuple[CachedPage, str]:
+        """
+        Страница из кэша или загрузка через fetch.
+
+        Args:
+            key: Ключ страницы (cookies и URL)
+            fetch: Функция загрузки; принимает заголовки условного запроса и
+                возвращает страницу (status_code 304 - не изменилась)
+            ttl: Время свежести загруженной страницы (по умолчанию self.ttl)
+
+        Returns:
+            Tuple[CachedPage, str]: Страница и результат (CACHE_HIT, CACHE_MISS,
+                CACHE_REVALIDATED или CACHE_COALESCED)
+        """
+        now = time.monotonic()
+        with self._lock:
+            stale = self._entries.get(key)
+            if stale and stale.expires_at > now:
+                self._entries.move_to_end(key)
+                self._stats[CACHE_HIT] += 1
+                return stale, CACHE_HIT
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._stats[CACHE_COALESCED] += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.page, CACHE_COALESCED
+
+        outcome = CACHE_MISS
+        try:
+            page = fetch(stale.validators() if stale else {})
+            if page.status_code == 304 and stale:
+                page, outcome = stale, CACHE_REVALIDATED
+            page.expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+            flight.page = page
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._finish(key, flight, outcome)
+        return page, outcome
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Количество обращений по результатам и текущее число записей"""
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+    def _finish(self, key: str, flight: _Flight, outcome: str) -> None:
+        page = flight.page
+        with self._lock:
+            self._inflight.pop(key, None)
+            if flight.error is None:
+                self._stats[outcome] += 1
+            # Сохраняются только успешные ответы
+            if page is not None and page.status_code == 200:
+                self._entries[key] = page
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            elif flight.error is None:
+                self._entries.pop(key, None)
+        flight.event.set()
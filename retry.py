@@ -0,0 +1,50 @@
+import random
+from dataclasses import dataclass
+from typing import Mapping, Optional, Tuple
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Политика повторов идемпотентных запросов (GET) с экспоненциальной
+    задержкой и случайным разбросом.
+    POST на /payment/method автоматически не повторяется - для него
+    используется ключ идемпотентности (см. IdempotencyStore).
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+    multiplier: float = 2.0
+    # Доля задержки, которая выбирается случайно (0 - без разброса, 1 - полный)
+    jitter: float = 0.5
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    def should_retry(self, attempt: int, status_code: Optional[int]) -> bool:
+        """
+        Нужен ли повтор после попытки номер attempt (с 1).
+
+        Args:
+            attempt: Номер завершившейся попытки
+            status_code: HTTP-статус ответа (None - сетевая ошибка)
+        """
+        if attempt >= self.max_attempts:
+            return False
+        return status_code is None or status_code in self.retry_statuses
+
+    def delay(self, attempt: int, headers: Optional[Mapping[str, str]] = None) -> float:
+        """
+        Задержка перед следующей попыткой. Учитывает заголовок Retry-After,
+        если сервер его прислал.
+        """
+        exp_delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        delay = exp_delay * (1 - self.jitter) + random.uniform(0, exp_delay * self.jitter)
+
+        retry_after = (headers or {}).get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_delay))
+        return delay
+
+
+# Политика без повторов
+NO_RETRY = RetryPolicy(max_attempts=1)
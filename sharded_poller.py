@@ -0,0 +1,285 @@
+"""
+Опрос статусов большого числа платежей несколькими процессами.
+
+Разбор страниц списка платежей занимает процессор, и один процесс упирается
+в GIL, когда отслеживаются тысячи неоплаченных платежей на многих аккаунтах.
+ShardedPoller распределяет аккаунты по процессам-обработчикам консистентным
+хэшированием: каждый процесс загружает и разбирает список платежей только
+своих аккаунтов, а все платежи аккаунта проверяются одной загрузкой списка
+(check_payments). Результаты записываются в общий журнал платежей SQLite
+(PaymentLedger, режим WAL), откуда их читает любой процесс без запросов
+к сайту.
+
+Единица распределения - аккаунт, а не платеж. Все неоплаченные платежи
+аккаунта находятся на одних и тех же страницах списка, поэтому разнесенные
+по процессам ID одного аккаунта заставили бы каждый процесс загружать и
+разбирать те же страницы, и запросов к сайту стало бы во столько же раз
+больше. Лимиты частоты (RateLimiter) тоже действуют на аккаунт внутри одного
+процесса: несколько процессов с одним аккаунтом не видели бы запросов друг
+друга и вместе превышали бы лимит сайта. Цена такого решения: один
+загруженный аккаунт использует одно ядро, а процессы, которым не досталось
+аккаунтов (их меньше, чем процессов), не запускаются.
+
+Пример:
+    with ShardedPoller("cookies/", "payments.db", processes=4) as poller:
+        poller.watch("48000123", "account1")
+        ...
+        info = poller.status("48000123")
+"""
+
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from account_pool import AccountPool
+from ledger import PaymentLedger
+from models import PaymentInfo
+
+
+class HashRing:
+    """
+    Консистентное хэширование: ключ относится к ближайшему по часовой стрелке
+    виртуальному узлу кольца. При изменении числа узлов переезжает только
+    часть ключей, а не почти все, как при hash(key) % n.
+    """
+
+    def __init__(self, nodes: Iterable[Any], replicas: int = 64) -> None:
+        """
+        Args:
+            nodes: Узлы (номера процессов)
+            replicas: Виртуальных узлов на один узел (чем больше, тем ровнее)
+        """
+        self._ring: List[Tuple[int, Any]] = sorted(
+            (self._hash(f"{node}#{replica}"), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in self._ring]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        # hash() строк меняется от запуска к запуску, поэтому md5
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    def node_for(self, key: str) -> Any:
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+def _account_name(cookies_path: str) -> str:
+    # Совпадает с BaseLolzPayment.account_name
+    return os.path.splitext(os.path.basename(cookies_path))[0]
+
+
+def _worker_main(
+    shard: int,
+    cookies_paths: List[str],
+    ledger_path: str,
+    options: Dict[str, Any],
+    counters: Any,
+    stop_event: Any,
+) -> None:
+    """Цикл процесса-обработчика: проверка неоплаченных платежей своих аккаунтов"""
+    from lolz_payment import LolzPayment
+    from rate_limiter import RateLimiter
+
+    logger = logging.getLogger("LolzPayment")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            logging.Formatter(
+                f"%(asctime)s - %(name)s[{shard}] - %(levelname)s - %(message)s"
+            )
+        )
+        logger.addHandler(handler)
+    logger.setLevel(options["log_level"])
+
+    ledger = PaymentLedger(ledger_path)
+    budgets = options["rate_budgets"]
+    clients = [
+        LolzPayment(
+            path,
+            logger,
+            ledger=ledger,
+            rate_limiter=RateLimiter(budgets) if budgets is not None else None,
+            **options["client_kwargs"],
+        )
+        for path in cookies_paths
+    ]
+    try:
+        while not stop_event.is_set():
+            started = time.monotonic()
+            for client in clients:
+                payment_ids = ledger.pending_ids(
+                    client.account_name, options["batch_limit"], options["max_age"]
+                )
+                if not payment_ids:
+                    continue
+                client.check_payments(payment_ids, options["max_pages"])
+                with counters.get_lock():
+                    counters[shard * 2] += len(payment_ids)
+            with counters.get_lock():
+                counters[shard * 2 + 1] += 1
+            elapsed = time.monotonic() - started
+            stop_event.wait(max(0.0, options["poll_interval"] - elapsed))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for client in clients:
+            client.close()
+        ledger.close()
+
+
+class ShardedPoller:
+    """
+    Пул процессов, опрашивающих статусы неоплаченных платежей.
+
+    Каждый процесс отвечает за свою часть аккаунтов и раз в poll_interval
+    проверяет все неоплаченные платежи этих аккаунтов из журнала. Лимиты
+    частоты запросов действуют на аккаунт, как и в одном процессе: аккаунт
+    всегда опрашивается ровно одним процессом.
+    """
+
+    def __init__(
+        self,
+        cookies: Union[str, Iterable[str]],
+        ledger_path: str,
+        processes: Optional[int] = None,
+        poll_interval: float = 5.0,
+        batch_limit: int = 1000,
+        max_pages: int = 50,
+        max_age: Optional[float] = 86400.0,
+        rate_budgets: Optional[Dict[str, Tuple[float, float]]] = None,
+        log_level: int = logging.WARNING,
+        logger: Optional[logging.Logger] = None,
+        **client_kwargs,
+    ) -> None:
+        """
+        Args:
+            cookies: Каталог с файлами cookies (*.json), glob-шаблон или список путей
+            ledger_path: Файл журнала платежей SQLite, общий для всех процессов
+            processes: Число процессов (по умолчанию - число ядер)
+            poll_interval: Период опроса каждого аккаунта в секундах
+            batch_limit: Максимум проверяемых за раз платежей аккаунта
+                (самые новые неоплаченные)
+            max_pages: Максимум загружаемых страниц списка за одну проверку
+            max_age: Платежи старше стольких секунд с создания не опрашиваются
+                (None - опрашиваются все неоплаченные)
+            rate_budgets: Лимиты частоты запросов каждого аккаунта
+                (см. RateLimiter; по умолчанию - настройки RateLimiter)
+            log_level: Уровень логов процессов-обработчиков
+            logger: Опциональный логгер
+            **client_kwargs: Параметры LolzPayment в процессах (base_url,
+                parser_backend, ...); передаются в процесс через pickle
+        """
+        if ledger_path == ":memory:":
+            raise ValueError("Журнал в памяти недоступен другим процессам")
+
+        self.cookies_paths = AccountPool._resolve_paths(cookies)
+        self.ledger_path = ledger_path
+        self.processes = processes or os.cpu_count() or 1
+        self.logger = logger or logging.getLogger("LolzPayment")
+        self._options = {
+            "poll_interval": poll_interval,
+            "batch_limit": batch_limit,
+            "max_pages": max_pages,
+            "max_age": max_age,
+            "rate_budgets": rate_budgets,
+            "log_level": log_level,
+            "client_kwargs": client_kwargs,
+        }
+        self.ring = HashRing(range(self.processes))
+        # Соединение для запросов статусов из текущего процесса
+        self.ledger = PaymentLedger(ledger_path)
+
+        # spawn: дочерний процесс не наследует потоки и соединения SQLite
+        self._context = multiprocessing.get_context("spawn")
+        # Для каждого процесса: проверено платежей, выполнено проходов
+        self._counters = self._context.Array("q", self.processes * 2)
+        self._stop_event = self._context.Event()
+        self._workers: Dict[int, multiprocessing.process.BaseProcess] = {}
+
+    def __enter__(self) -> "ShardedPoller":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+        self.ledger.close()
+
+    def shards(self) -> Dict[int, List[str]]:
+        """Файлы cookies, закрепленные за каждым процессом"""
+        shards: Dict[int, List[str]] = {shard: [] for shard in range(self.processes)}
+        for path in self.cookies_paths:
+            shards[self.ring.node_for(_account_name(path))].append(path)
+        return shards
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        for shard, paths in self.shards().items():
+            if not paths or shard in self._workers:
+                continue
+            worker = self._context.Process(
+                target=_worker_main,
+                args=(
+                    shard,
+                    paths,
+                    self.ledger_path,
+                    self._options,
+                    self._counters,
+                    self._stop_event,
+                ),
+                name=f"lolz-poller-{shard}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers[shard] = worker
+        self.logger.info(
+            f"Запущено процессов опроса: {len(self._workers)}, "
+            f"аккаунтов: {len(self.cookies_paths)}"
+        )
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Остановка процессов после завершения текущего прохода"""
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers.values():
+            worker.join(max(0.0, deadline - time.monotonic()))
+            if worker.is_alive():
+                self.logger.warning(f"Процесс {worker.name} не завершился, остановка")
+                worker.terminate()
+                worker.join()
+        self._workers.clear()
+
+    def watch(self, payment_id: str, account: str) -> bool:
+        """
+        Начать отслеживать платеж аккаунта (имя - файл cookies без .json).
+        Платежи, созданные клиентом с тем же журналом, отслеживаются сами.
+        """
+        return self.ledger.watch(payment_id, account)
+
+    def status(self, payment_id: str) -> Optional[PaymentInfo]:
+        """Последний известный статус платежа из журнала (без запроса к сайту)"""
+        entry = self.ledger.get(payment_id)
+        return entry.to_payment_info() if entry else None
+
+    def statuses(self, payment_ids: Iterable[str]) -> Dict[str, Optional[PaymentInfo]]:
+        return {payment_id: self.status(payment_id) for payment_id in payment_ids}
+
+    def stats(self) -> List[Dict[str, object]]:
+        """Состояние процессов: аккаунты, проверено платежей, проходов опроса"""
+        counters = self._counters[:]
+        return [
+            {
+                "shard": shard,
+                "accounts": [_account_name(path) for path in paths],
+                "alive": shard in self._workers and self._workers[shard].is_alive(),
+                "checked": counters[shard * 2],
+                "rounds": counters[shard * 2 + 1],
+            }
+            for shard, paths in self.shards().items()
+        ]
@@ -0,0 +1,151 @@
+"""
+Общие фикстуры тестов: фейковый сервер lzt.market (benchmarks/fake_server.py)
+в фоновом потоке и клиенты, направленные на него.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+from typing import List, Tuple
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_server import FakeServer  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+
+
+class RecordingServer(FakeServer):
+    """
+    Фейковый сервер, который запоминает принятые соединения, запросы
+    (метод, путь, заголовок Cookie) и статусы ответов.
+    """
+
+    def __init__(self, **state_kwargs) -> None:
+        super().__init__(**state_kwargs)
+        self.connections = 0
+        self.requests: List[Tuple[str, str, str]] = []
+        self.statuses: List[int] = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(self.httpd.RequestHandlerClass):
+            def setup(self) -> None:
+                # Обработчик создается на каждое принятое соединение
+                with server._lock:
+                    server.connections += 1
+                super().setup()
+
+            def _record(self) -> None:
+                with server._lock:
+                    server.requests.append(
+                        (self.command, self.path, self.headers.get("Cookie") or "")
+                    )
+
+            def send_response(self, code, message=None) -> None:
+                with server._lock:
+                    server.statuses.append(code)
+                super().send_response(code, message)
+
+            def do_GET(self) -> None:
+                self._record()
+                super().do_GET()
+
+            def do_POST(self) -> None:
+                self._record()
+                super().do_POST()
+
+        self.httpd.RequestHandlerClass = Handler
+        handle_error = self.httpd.handle_error
+
+        def quiet_disconnects(request, client_address) -> None:
+            # Потоковая проверка закрывает соединение, не дочитав страницу
+            if not isinstance(sys.exc_info()[1], ConnectionError):
+                handle_error(request, client_address)
+
+        self.httpd.handle_error = quiet_disconnects
+
+    def paths(self, prefix: str = "") -> List[str]:
+        with self._lock:
+            return [path for _, path, _ in self.requests if path.startswith(prefix)]
+
+
+@pytest.fixture
+def make_server():
+    """Фабрика серверов: make_server(rows=..., latency=...)"""
+    servers = []
+
+    def make(**state_kwargs) -> RecordingServer:
+        state_kwargs.setdefault("rows", 20)
+        server = RecordingServer(**state_kwargs).start()
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def server(make_server) -> RecordingServer:
+    return make_server()
+
+
+@pytest.fixture
+def make_cookies(tmp_path):
+    """Фабрика файлов cookies: make_cookies("account1", xf_user="...")"""
+
+    def make(name: str = "lolz", **cookies) -> str:
+        cookies = cookies or {"xf_user": name, "xf_session": f"{name}-session"}
+        path = tmp_path / f"{name}.json"
+        items = [{"name": key, "value": value} for key, value in cookies.items()]
+        path.write_text(json.dumps(items), encoding="utf-8")
+        return str(path)
+
+    return make
+
+
+@pytest.fixture
+def cookies_path(make_cookies) -> str:
+    return make_cookies()
+
+
+@pytest.fixture
+def logger() -> logging.Logger:
+    logger = logging.getLogger("LolzPaymentTests")
+    logger.setLevel(logging.CRITICAL)
+    return logger
+
+
+def no_limits() -> RateLimiter:
+    """Лимитер без ограничений частоты (тесты не ждут ведра токенов)"""
+    return RateLimiter({})
+
+
+@pytest.fixture
+def make_client(server, cookies_path, logger):
+    """Фабрика синхронных клиентов, направленных на server"""
+    from lolz_payment import LolzPayment
+
+    clients = []
+
+    def make(path: str = None, **kwargs) -> LolzPayment:
+        kwargs.setdefault("rate_limiter", no_limits())
+        kwargs.setdefault("base_url", server.url)
+        client = LolzPayment(path or cookies_path, logger, **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client()
@@ -0,0 +1,117 @@
+"""Пул аккаунтов: выбор аккаунта и переключение при сбоях"""
+
+import pytest
+import requests
+
+from account_pool import AccountPool
+from conftest import no_limits
+
+
+@pytest.fixture
+def make_pool(server, make_cookies, logger):
+    pools = []
+
+    def make(*names, **kwargs):
+        paths = [make_cookies(name) for name in names]
+        pool = AccountPool(
+            paths,
+            logger=logger,
+            base_url=server.url,
+            rate_limiter=no_limits(),
+            **kwargs,
+        )
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_payments_alternate_between_accounts(server, make_pool):
+    pool = make_pool("first", "second")
+    owners = set()
+    for _ in range(4):
+        response = pool.create_payment(100, "card")
+        owners.add(pool.owner_of(response.payment_id))
+    assert owners == {"first", "second"}
+
+    info = pool.check_payment(response.payment_id)
+    assert info.payment_id == response.payment_id
+
+
+def test_failover_before_submit(make_server, make_cookies, logger):
+    server = make_server(login_required={"expired"})
+    pool = AccountPool(
+        [make_cookies("expired"), make_cookies("valid")],
+        logger=logger,
+        base_url=server.url,
+        rate_limiter=no_limits(),
+    )
+    try:
+        for _ in range(2):
+            response = pool.create_payment(100, "card")
+            assert response.payment_id
+            assert pool.owner_of(response.payment_id) == "valid"
+        # Аккаунт с формой входа выведен из ротации
+        assert [account["healthy"] for account in pool.stats()] == [False, True]
+    finally:
+        pool.close()
+
+
+def test_no_failover_after_submit(server, make_pool):
+    pool = make_pool("first", "second")
+    sent = []
+
+    for account in pool.accounts.values():
+        session = account.client.session
+        send = session.request
+
+        def request(method, url, _send=send, **kwargs):
+            if method == "POST":
+                # Форма отправлена, но ответ не дождались
+                sent.append(url)
+                raise requests.exceptions.ReadTimeout("read timeout")
+            return _send(method, url, **kwargs)
+
+        session.request = request
+
+    response = pool.create_payment(100, "card")
+    assert response.error and not response.retryable
+    # Форма могла дойти до сайта: второй аккаунт ее не отправляет
+    assert len(sent) == 1
+
+
+def test_idempotency_key_is_shared_between_accounts(server, make_pool):
+    pool = make_pool("first", "second")
+    first = pool.create_payment(100, "card", idempotency_key="order-1")
+    second = pool.create_payment(100, "card", idempotency_key="order-1")
+
+    assert first.payment_id and second.payment_id == first.payment_id
+    assert len(server.paths("/payment/method")) == 1
+
+
+def test_lost_response_is_checked_on_sending_account(server, make_pool):
+    pool = make_pool("first", "second")
+    server.state.drop_rate = 1.0
+    assert pool.create_payment(100, "card", idempotency_key="order-1").in_doubt
+    sender = server.requests[-1][2]
+
+    server.state.drop_rate = 0.0
+    for _ in range(2):
+        response = pool.create_payment(100, "card", idempotency_key="order-1")
+        assert response.payment_id == str(server.state.next_id)
+    assert len(server.paths("/payment/method")) == 1
+    lookups = [cookie for _, path, cookie in server.requests if path == "/payment/list"]
+    assert lookups == [sender]
+
+
+def test_owner_map_keeps_recent_payments(server, make_pool):
+    pool = make_pool("first", "second", max_owners=2)
+    payment_ids = [pool.create_payment(100, "card").payment_id for _ in range(3)]
+    assert pool.owner_of(payment_ids[0]) is None
+    assert all(pool.owner_of(payment_id) for payment_id in payment_ids[1:])
+
+    # Платеж с забытым владельцем ищется на всех аккаунтах
+    assert pool.check_payment(payment_ids[0]).payment_id == payment_ids[0]
+    assert pool.owner_of(payment_ids[0]) and pool.owner_of(payment_ids[1]) is None
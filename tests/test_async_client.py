@@ -0,0 +1,67 @@
+"""Асинхронный клиент: те же модели и проверки, что у синхронного"""
+
+import asyncio
+
+from async_lolz_payment import AsyncLolzPayment
+from conftest import no_limits
+
+
+def run_async(server, cookies_path, logger, scenario, **kwargs):
+    async def main():
+        client = AsyncLolzPayment(
+            cookies_path,
+            logger,
+            base_url=server.url,
+            rate_limiter=no_limits(),
+            **kwargs,
+        )
+        try:
+            return await scenario(client)
+        finally:
+            await client.close()
+
+    return asyncio.run(main())
+
+
+def test_create_and_check_match_sync_client(server, client, cookies_path, logger):
+    async def scenario(lolz):
+        created = await lolz.create_payment(150, "card")
+        return created, await lolz.check_payment(created.payment_id)
+
+    created, info = run_async(server, cookies_path, logger, scenario)
+    assert created.payment_id and created.final_url
+    assert info == client.check_payment(created.payment_id)
+    assert info.amount_value == 150
+
+
+def test_validation_is_shared(server, cookies_path, logger):
+    async def scenario(lolz):
+        return await lolz.create_payment(1, "card")
+
+    response = run_async(server, cookies_path, logger, scenario)
+    assert response.payment_id is None
+    assert "Минимальная сумма" in response.error
+    assert server.requests == []
+
+
+def test_concurrent_creates_share_tokens(server, cookies_path, logger):
+    async def scenario(lolz):
+        return await asyncio.gather(
+            *(lolz.create_payment(100 + i, "card") for i in range(5))
+        )
+
+    responses = run_async(server, cookies_path, logger, scenario)
+    assert len({response.payment_id for response in responses}) == 5
+    assert len(server.paths("/payment/balance/deposit")) == 1
+    assert len(server.paths("/payment/method")) == 5
+
+
+def test_check_payments_with_one_list_fetch(server, cookies_path, logger):
+    async def scenario(lolz):
+        return await lolz.check_payments(["48000019", "48000003", "1"])
+
+    results = run_async(server, cookies_path, logger, scenario)
+    assert results["48000019"].payment_id == "48000019"
+    assert results["48000003"].payment_id == "48000003"
+    assert results["1"] is None
+    assert len(server.paths("/payment/list")) == 1
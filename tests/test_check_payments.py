@@ -0,0 +1,35 @@
+"""Проверка многих платежей одной загрузкой списка"""
+
+import pytest
+
+
+@pytest.fixture
+def paged(make_server, make_client):
+    server = make_server(rows=250, page_size=100)
+    return server, make_client(base_url=server.url)
+
+
+def test_loads_only_needed_pages(paged):
+    server, client = paged
+    # Страница 1: 48000249..48000150, страница 2: 48000149..48000050
+    results = client.check_payments(["48000249", "48000200", "48000120"])
+    assert all(info and info.payment_id == key for key, info in results.items())
+    assert len(server.paths("/payment/list")) == 2
+
+
+def test_matches_single_checks(paged):
+    server, client = paged
+    ids = ["48000249", "48000100", "48000010"]
+    results = client.check_payments(ids)
+    assert len(server.paths("/payment/list")) == 3
+    # check_payment читает только первую страницу списка
+    assert results["48000249"] == client.check_payment("48000249")
+    assert all(results[payment_id] for payment_id in ids)
+
+
+def test_missing_ids_are_none_and_pages_are_bounded(paged):
+    server, client = paged
+    results = client.check_payments(["48000249", "1"], max_pages=2)
+    assert results["48000249"].payment_id == "48000249"
+    assert results["1"] is None
+    assert len(server.paths("/payment/list")) == 2
@@ -0,0 +1,117 @@
+"""Перезагрузка cookies из файла (CookieStore) и переключение клиентов"""
+
+import asyncio
+import json
+import os
+
+from async_lolz_payment import AsyncLolzPayment
+from conftest import no_limits
+from cookie_store import CookieStore
+
+
+def write_cookies(path: str, xf_user: str) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump([{"name": "xf_user", "value": xf_user}], file)
+    # Подпись файла включает mtime: без сдвига запись в ту же наносекунду
+    # может остаться незамеченной
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_reload_swaps_cookies_and_keeps_them_on_broken_file(tmp_path, logger):
+    path = str(tmp_path / "lolz.json")
+    write_cookies(path, "first")
+    store = CookieStore(path, logger=logger)
+    assert store.cookies == {"xf_user": "first"}
+    assert not store.reload()
+
+    write_cookies(path, "second")
+    assert store.reload()
+    assert store.cookies == {"xf_user": "second"}
+    assert store.version == 1
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("[{")
+    assert not store.reload()
+    assert store.cookies == {"xf_user": "second"}
+
+
+def test_sync_client_warms_up_tokens_before_swap(server, make_client, tmp_path, logger):
+    path = str(tmp_path / "lolz.json")
+    write_cookies(path, "first")
+    store = CookieStore(path, logger=logger)
+    client = make_client(path, cookie_store=store)
+    assert client.create_payment(100, "card").payment_id
+
+    write_cookies(path, "second")
+    assert store.reload()
+    deposits = len(server.paths("/payment/balance/deposit"))
+    # Токены новых cookies получены при подмене, платеж их не ждет
+    assert client.create_payment(100, "card").payment_id
+    assert len(server.paths("/payment/balance/deposit")) == deposits
+    assert "xf_user=second" in server.requests[-1][2]
+
+
+def test_async_streamed_requests_send_current_cookies(server, tmp_path, logger):
+    path = str(tmp_path / "lolz.json")
+    write_cookies(path, "first")
+    store = CookieStore(path, logger=logger)
+
+    async def run():
+        client = AsyncLolzPayment(
+            path,
+            logger,
+            base_url=server.url,
+            rate_limiter=no_limits(),
+            cookie_store=store,
+        )
+        try:
+            assert await client.check_payment("48000019", stream=True)
+            await client.sync_payments()
+            write_cookies(path, "second")
+            assert store.reload()
+            assert await client.check_payment("48000019", stream=True)
+            await client.sync_payments()
+        finally:
+            await client.close()
+
+    asyncio.run(run())
+    # Смена cookies внутри цикла еще запускает загрузку токенов для них
+    cookies = [
+        cookie
+        for _, request_path, cookie in server.requests
+        if request_path.startswith("/payment/list")
+    ]
+    assert len(cookies) == 4
+    assert all("xf_user=first" in cookie for cookie in cookies[:2])
+    assert all("xf_user=second" in cookie for cookie in cookies[2:])
+
+
+def test_async_client_warms_up_tokens_before_swap(server, tmp_path, logger):
+    path = str(tmp_path / "lolz.json")
+    write_cookies(path, "first")
+    store = CookieStore(path, logger=logger)
+
+    async def run():
+        client = AsyncLolzPayment(
+            path,
+            logger,
+            base_url=server.url,
+            rate_limiter=no_limits(),
+            cookie_store=store,
+        )
+        try:
+            assert (await client.create_payment(100, "card")).payment_id
+            write_cookies(path, "second")
+            # Как из потока CookieStore: токены загружаются в цикле клиента
+            assert await asyncio.to_thread(store.reload)
+            deposits = len(server.paths("/payment/balance/deposit"))
+            assert (await client.create_payment(100, "card")).payment_id
+            return deposits
+        finally:
+            await client.close()
+
+    deposits = asyncio.run(run())
+    assert deposits == 2
+    assert len(server.paths("/payment/balance/deposit")) == deposits
+    assert "xf_user=second" in server.requests[-1][2]
@@ -0,0 +1,69 @@
+"""Пакетное создание платежей"""
+
+import asyncio
+import time
+
+from async_lolz_payment import AsyncLolzPayment
+from conftest import no_limits
+from models import PaymentMethod, PaymentRequest
+
+
+def requests_with_errors(count: int):
+    requests = [PaymentRequest(100 + i, PaymentMethod.CARD) for i in range(count)]
+    requests.insert(2, PaymentRequest(1, PaymentMethod.CARD))
+    requests.append(PaymentRequest(100, "paypal"))
+    return requests
+
+
+def test_batch_validates_first_and_summarizes(server, client):
+    batch = client.create_payments(requests_with_errors(6), max_workers=4)
+    items = list(batch)
+
+    assert [item.index for item in items[:2]] == [2, 7]
+    assert not any(item.ok for item in items[:2])
+    assert sorted(item.index for item in items) == list(range(8))
+    assert len({item.response.payment_id for item in items[2:]}) == 6
+
+    summary = batch.summary
+    assert (summary.total, summary.succeeded, summary.failed) == (8, 6, 2)
+    assert sum(summary.errors.values()) == 2
+    assert len(server.paths("/payment/balance/deposit")) == 1
+    assert len(server.paths("/payment/method")) == 6
+
+
+def test_batch_runs_requests_concurrently(server, client):
+    client.warm_up()
+    server.state.latency = 0.1
+    started = time.monotonic()
+    batch = client.create_payments(
+        [PaymentRequest(100, PaymentMethod.CARD)] * 8, max_workers=8
+    )
+    assert all(item.ok for item in batch)
+    assert time.monotonic() - started < 0.6
+
+
+def test_closing_batch_cancels_pending_requests(server, client):
+    client.warm_up()
+    server.state.latency = 0.05
+    batch = client.create_payments(
+        [PaymentRequest(100, PaymentMethod.CARD)] * 20, max_workers=2
+    )
+    for _ in batch:
+        break
+    batch.close()
+    assert len(server.paths("/payment/method")) < 20
+
+
+def test_async_batch(server, cookies_path, logger):
+    async def main():
+        async with AsyncLolzPayment(
+            cookies_path, logger, base_url=server.url, rate_limiter=no_limits()
+        ) as client:
+            batch = client.create_payments(requests_with_errors(6), max_workers=3)
+            items = [item async for item in batch]
+            return items, batch.summary
+
+    items, summary = asyncio.run(main())
+    assert sorted(item.index for item in items) == list(range(8))
+    assert (summary.succeeded, summary.failed) == (6, 2)
+    assert len(server.paths("/payment/balance/deposit")) == 1
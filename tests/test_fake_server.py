@@ -0,0 +1,62 @@
+"""Фейковый сервер lzt.market отдает страницы, которые разбирает клиент"""
+
+import requests
+
+import parsing
+from fake_server import FakeServer
+
+
+def test_list_pages_and_etag():
+    with FakeServer(rows=150, page_size=100) as server:
+        first = requests.get(f"{server.url}/payment/list")
+        page = parsing.parse_payment_list(first.text, first.url)
+        assert len(page.payments) == 100
+        assert next(iter(page.payments)) == "48000149"
+        assert page.next_url == f"{server.url}/payment/list?page=2"
+
+        last = parsing.parse_payment_list(requests.get(page.next_url).text)
+        assert len(last.payments) == 50 and last.next_url is None
+        assert "48000000" in last.payments
+
+        etag = first.headers["ETag"]
+        cached = requests.get(
+            f"{server.url}/payment/list", headers={"If-None-Match": etag}
+        )
+        assert cached.status_code == 304 and cached.content == b""
+
+
+def test_deposit_page_and_login_required():
+    with FakeServer(rows=1, login_required={"expired"}) as server:
+        url = f"{server.url}/payment/balance/deposit"
+        page = parsing.parse_deposit_page(requests.get(url).text)
+        assert page.tokens["xf_token"] == server.state.token
+
+        page = parsing.parse_deposit_page(
+            requests.get(url, cookies={"xf_user": "expired"}).text
+        )
+        assert page.login_required
+
+
+def test_injected_errors_and_token_check():
+    with FakeServer(rows=1, throttle_rate=1.0) as server:
+        response = requests.get(f"{server.url}/payment/list")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+
+    with FakeServer(rows=1) as server:
+        response = requests.post(
+            f"{server.url}/payment/method", data={"_xfToken": "stale", "amount": "100"}
+        )
+        assert "_redirectTarget" not in response.json()
+        assert server.state.next_id == 48000001
+
+
+def test_created_payment_is_listed_first(server, client):
+    server.state.pay_after = -1
+    payment_id = client.create_payment(250, "sbp", "79990000000").payment_id
+    page = parsing.parse_payment_list(
+        requests.get(f"{server.url}/payment/list").text
+    )
+    info = next(iter(page.payments.values()))
+    assert info.payment_id == payment_id
+    assert info.amount_value == 250 and not info.is_paid
@@ -0,0 +1,178 @@
+"""Ключи идемпотентности create_payment и повторы GET-запросов"""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from async_lolz_payment import AsyncLolzPayment
+from conftest import no_limits
+from idempotency import IdempotencyStore
+from models import PaymentResponse
+from retry import RetryPolicy
+
+FAST_RETRY = RetryPolicy(base_delay=0.0, jitter=0.0)
+
+
+def fail_requests(server, count: int) -> None:
+    """Следующие count запросов к серверу получат 503"""
+    outcomes = iter([False, True] * count)
+    server.state.chance = lambda rate: next(outcomes, False)
+
+
+def test_same_key_returns_same_payment(server, make_client):
+    client = make_client()
+    first = client.create_payment(100, "card", idempotency_key="order-1")
+    second = client.create_payment(100, "card", idempotency_key="order-1")
+    other = client.create_payment(100, "card", idempotency_key="order-2")
+
+    assert first.payment_id and second.payment_id == first.payment_id
+    assert other.payment_id != first.payment_id
+    assert len(server.paths("/payment/method")) == 2
+
+
+def test_same_key_with_other_params_is_rejected(server, make_client):
+    client = make_client()
+    assert client.create_payment(100, "card", idempotency_key="order-1").payment_id
+    response = client.create_payment(200, "card", idempotency_key="order-1")
+    assert response.payment_id is None
+    assert "order-1" in response.error
+    assert len(server.paths("/payment/method")) == 1
+
+
+def test_concurrent_calls_with_one_key_send_one_form(server, make_client):
+    server.state.latency = 0.05
+    client = make_client()
+    with ThreadPoolExecutor(4) as pool:
+        responses = list(
+            pool.map(
+                lambda _: client.create_payment(100, "sbp", "79990000000", "order-1"),
+                range(4),
+            )
+        )
+    assert len({response.payment_id for response in responses}) == 1
+    assert len(server.paths("/payment/method")) == 1
+
+
+def test_keys_survive_restart(server, make_client, tmp_path):
+    path = str(tmp_path / "keys.jsonl")
+    first = make_client(idempotency_store=IdempotencyStore(path)).create_payment(
+        100, "card", idempotency_key="order-1"
+    )
+    second = make_client(idempotency_store=IdempotencyStore(path)).create_payment(
+        100, "card", idempotency_key="order-1"
+    )
+    assert second.payment_id == first.payment_id
+    assert second.final_url == first.final_url
+    assert len(server.paths("/payment/method")) == 1
+
+
+def test_lost_response_is_found_in_payment_list(server, make_client, tmp_path):
+    path = str(tmp_path / "keys.jsonl")
+    server.state.drop_rate = 1.0
+    first = make_client(idempotency_store=IdempotencyStore(path)).create_payment(
+        250, "sbp", "79990000000", idempotency_key="order-1"
+    )
+    assert first.error and first.in_doubt
+    created_id = str(server.state.next_id)
+
+    # Повтор после перезапуска: форма не отправляется, счет ищется в списке
+    server.state.drop_rate = 0.0
+    client = make_client(idempotency_store=IdempotencyStore(path))
+    second = client.create_payment(
+        250, "sbp", "79990000000", idempotency_key="order-1"
+    )
+    assert second.payment_id == created_id
+    assert client.create_payment(
+        250, "sbp", "79990000000", idempotency_key="order-1"
+    ).payment_id == created_id
+    assert len(server.paths("/payment/method")) == 1
+    assert len(server.paths("/payment/list")) == 1
+
+
+def test_lost_response_without_invoice_is_not_resent(server, make_client):
+    client = make_client()
+    client.warm_up()
+
+    fail_requests(server, 1)
+    first = client.create_payment(100, "card", idempotency_key="order-1")
+    assert first.error and first.in_doubt
+
+    second = client.create_payment(100, "card", idempotency_key="order-1")
+    assert second.payment_id is None and "order-1" in second.error
+    assert len(server.paths("/payment/method")) == 1
+
+
+def test_key_is_released_when_form_was_not_sent(server, make_client):
+    client = make_client()
+    assert client.create_payment(1, "card", idempotency_key="order-1").error
+    assert client.idempotency_store.get("order-1") is None
+
+
+def test_async_lost_response_is_found_in_payment_list(
+    server, cookies_path, logger
+):
+    async def main():
+        lolz = AsyncLolzPayment(
+            cookies_path, logger, base_url=server.url, rate_limiter=no_limits()
+        )
+        try:
+            server.state.drop_rate = 1.0
+            first = await lolz.create_payment(500, "card", idempotency_key="order-1")
+            server.state.drop_rate = 0.0
+            second = await lolz.create_payment(500, "card", idempotency_key="order-1")
+            return first, second
+        finally:
+            await lolz.close()
+
+    first, second = asyncio.run(main())
+    assert first.in_doubt
+    assert second.payment_id == str(server.state.next_id)
+    assert len(server.paths("/payment/method")) == 1
+
+
+def test_store_file_is_compacted(tmp_path):
+    path = tmp_path / "keys.jsonl"
+    store = IdempotencyStore(str(path), ttl=60)
+    for index in range(5):
+        store.reserve(f"order-{index}", "fingerprint")
+        store.finish(f"order-{index}", PaymentResponse(error="Ошибка"))
+    store.reserve("order-paid", "fingerprint")
+    store.finish("order-paid", PaymentResponse(payment_id="48000001"))
+    store.reserve("order-old", "fingerprint")
+    store.finish("order-old", PaymentResponse(payment_id="48000002"))
+    lines = path.read_text(encoding="utf-8").splitlines()
+    lines[-1] = json.dumps({**json.loads(lines[-1]), "created_at": 0.0})
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    reloaded = IdempotencyStore(str(path), ttl=60)
+    assert reloaded.get("order-paid").payment_id == "48000001"
+    assert reloaded.get("order-old") is None and reloaded.get("order-0") is None
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 1
+
+
+def test_get_is_retried_on_server_errors(server, make_client):
+    client = make_client(retry_policy=FAST_RETRY)
+    payment_id = client.create_payment(100, "card").payment_id
+
+    fail_requests(server, 2)
+    assert client.check_payment(payment_id).payment_id == payment_id
+    assert len(server.paths("/payment/list")) == 3
+
+
+def test_post_is_not_retried(server, make_client):
+    client = make_client(retry_policy=FAST_RETRY)
+    client.warm_up()
+
+    fail_requests(server, 1)
+    assert client.create_payment(100, "card").error
+    assert len(server.paths("/payment/method")) == 1
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(base_delay=0.5, max_delay=3.0, jitter=0.0)
+    assert [policy.delay(attempt) for attempt in (1, 2, 3, 4)] == [0.5, 1.0, 2.0, 3.0]
+    assert policy.delay(1, {"Retry-After": "2"}) == 2.0
+    assert policy.delay(1, {"Retry-After": "60"}) == 3.0
+    assert policy.should_retry(1, 503) and policy.should_retry(1, None)
+    assert not policy.should_retry(1, 404)
+    assert not policy.should_retry(3, 503)
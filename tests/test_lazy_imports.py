@@ -0,0 +1,13 @@
+"""Импорт клиента не загружает тяжелые зависимости"""
+
+import os
+
+import pytest
+
+from bench_startup import LAZY_MODULES, eager_heavy_modules
+
+
+@pytest.mark.parametrize("module", LAZY_MODULES)
+def test_import_does_not_load_heavy_modules(module):
+    assert eager_heavy_modules(module, dict(os.environ)) == []
+
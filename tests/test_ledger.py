@@ -0,0 +1,59 @@
+"""Журнал платежей SQLite"""
+
+import time
+
+from ledger import STATUS_COMPLETED, PaymentLedger
+from models import PaymentResponse
+
+
+def test_pending_ids_skips_old_payments():
+    ledger = PaymentLedger()
+    for payment_id in ("1", "2", "3"):
+        ledger.record_created(
+            PaymentResponse(payment_id=payment_id), 100, "card", "lolz"
+        )
+    with ledger._conn:
+        ledger._conn.execute(
+            "UPDATE payments SET created_at = ? WHERE payment_id = '1'",
+            (time.time() - 2 * 86400,),
+        )
+
+    assert ledger.pending_ids("lolz") == ["3", "2", "1"]
+    assert ledger.pending_ids("lolz", max_age=86400) == ["3", "2"]
+    assert ledger.pending_ids("lolz", limit=1, max_age=86400) == ["3"]
+    assert ledger.pending_ids("other", max_age=86400) == []
+
+
+def test_completed_payment_is_answered_from_ledger(server, make_client):
+    client = make_client(ledger=PaymentLedger())
+    payment_id = client.create_payment(100, "card").payment_id
+    assert client.check_payment(payment_id).is_paid
+    assert client.ledger.get(payment_id).status == STATUS_COMPLETED
+
+    pages = len(server.paths("/payment/list"))
+    assert client.check_payment(payment_id).is_paid
+    assert client.check_payments([payment_id])[payment_id].is_paid
+    assert len(server.paths("/payment/list")) == pages
+
+
+def test_ledger_survives_restart_and_pending_goes_to_site(
+    server, make_client, tmp_path
+):
+    path = str(tmp_path / "payments.db")
+    server.state.pay_after = -1
+    pending = make_client(ledger=PaymentLedger(path)).create_payment(100, "card")
+    server.state.pay_after = 0
+    paid = make_client(ledger=PaymentLedger(path)).create_payment(200, "card")
+
+    client = make_client(ledger=PaymentLedger(path))
+    entry = client.ledger.get(pending.payment_id)
+    assert (entry.amount, entry.payment_method) == (100, "card")
+    assert entry.final_url == pending.final_url
+
+    client.check_payments([pending.payment_id, paid.payment_id])
+    pages = len(server.paths("/payment/list"))
+    assert make_client(ledger=PaymentLedger(path)).check_payment(paid.payment_id)
+    assert len(server.paths("/payment/list")) == pages
+    assert not client.check_payment(pending.payment_id).is_paid
+    assert len(server.paths("/payment/list")) == pages + 1
+    assert client.ledger.counts() == {"completed": 1, "pending": 1}
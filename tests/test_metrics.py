@@ -0,0 +1,50 @@
+"""Метрики клиента и вывод в формате Prometheus"""
+
+from metrics import Metrics, PrometheusRegistry
+
+
+def sample(text: str, prefix: str) -> str:
+    return next(line for line in text.splitlines() if line.startswith(prefix))
+
+
+def test_counters_render_without_precision_loss():
+    registry = PrometheusRegistry()
+    registry.count("http_bytes", 12345679, {"budget": "list"})
+    registry.count("cpu_seconds", 0.1, {})
+    registry.count("cpu_seconds", 0.2, {})
+    registry.count("ratio", 2.0, {})
+
+    text = registry.render()
+    assert sample(text, "lolz_http_bytes_total") == (
+        'lolz_http_bytes_total{budget="list"} 12345679'
+    )
+    assert sample(text, "lolz_cpu_seconds_total ") == (
+        f"lolz_cpu_seconds_total {0.1 + 0.2!r}"
+    )
+    assert sample(text, "lolz_ratio_total ") == "lolz_ratio_total 2"
+
+
+def test_non_finite_values_use_prometheus_names():
+    registry = PrometheusRegistry()
+    registry.count("up", float("inf"), {})
+    registry.count("down", float("-inf"), {})
+    registry.count("broken", float("nan"), {})
+
+    text = registry.render()
+    assert sample(text, "lolz_up_total ") == "lolz_up_total +Inf"
+    assert sample(text, "lolz_down_total ") == "lolz_down_total -Inf"
+    assert sample(text, "lolz_broken_total ") == "lolz_broken_total NaN"
+
+
+def test_client_reports_stages_and_counters(server, make_client):
+    registry = PrometheusRegistry()
+    client = make_client(metrics=Metrics(registry))
+    assert client.create_payment(100, "card").payment_id
+    assert client.create_payment(100, "card").payment_id
+
+    assert registry.value("token_cache", result="miss") == 1
+    assert registry.value("token_cache", result="hit") == 1
+    assert registry.value("http_responses", status="200", budget="method") == 2
+    text = registry.render()
+    assert 'lolz_stage_duration_seconds_count{stage="create_payment"} 2' in text
+    assert 'lolz_stage_duration_seconds_count{stage="get_tokens"} 1' in text
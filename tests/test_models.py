@@ -0,0 +1,84 @@
+"""Модели: разбор суммы, даты и статуса при создании"""
+
+import dataclasses
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from models import (
+    MSK,
+    PaymentInfo,
+    PaymentResponse,
+    PaymentStatus,
+    parse_amount_kopecks,
+    parse_site_datetime,
+)
+
+
+def make_info(**fields) -> PaymentInfo:
+    values = {
+        "payment_id": "48000001",
+        "creation_date": "01.09.2026 в 00:15",
+        "payment_date": "Не оплачен",
+        "amount": "1 250,50 ₽",
+        "payment_type": "Карта",
+        "status": "pending",
+    }
+    values.update(fields)
+    return PaymentInfo(**values)
+
+
+@pytest.mark.parametrize(
+    "text, kopecks",
+    [
+        ("1 250,50 ₽", 125050),
+        ("1\xa0000 ₽", 100000),
+        ("500 ₽", 50000),
+        ("99.9", 9990),
+        ("-10 ₽", -1000),
+        ("", None),
+        ("нет", None),
+    ],
+)
+def test_parse_amount(text, kopecks):
+    assert parse_amount_kopecks(text) == kopecks
+
+
+def test_parse_site_datetime():
+    assert parse_site_datetime("01.09.2026 в 00:15") == datetime(
+        2026, 9, 1, 0, 15, tzinfo=MSK
+    )
+    assert parse_site_datetime("01.09.2026") == datetime(2026, 9, 1, tzinfo=MSK)
+    assert parse_site_datetime("вчера") is None
+
+
+def test_payment_info_parses_once_and_compares_by_text():
+    info = make_info()
+    assert info.amount_value == Decimal("1250.50")
+    # 00:15 по Москве - 21:15 UTC предыдущего дня
+    utc = datetime(2026, 8, 31, 21, 15, tzinfo=timezone.utc)
+    assert info.created_ts == utc.timestamp()
+    assert info.status is PaymentStatus.PENDING and info.status == "pending"
+    assert not info.is_paid
+    assert make_info() == info
+    assert make_info(status="completed") != info
+
+
+def test_models_are_frozen_and_slotted():
+    info = make_info()
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        info.amount = "1 ₽"
+    assert not hasattr(info, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        PaymentResponse(payment_id="1").payment_id = "2"
+
+
+def test_unknown_status_and_dict_round_trip():
+    info = make_info(status="refunded", payment_date="01.09.2026 в 00:20")
+    assert info.status is PaymentStatus.UNKNOWN
+    assert info.is_paid
+    data = info.to_dict()
+    assert data.pop("is_paid") is True
+    assert PaymentInfo(**data) == info
+    assert f"{PaymentStatus.COMPLETED:>10}" == " completed"
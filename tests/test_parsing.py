@@ -0,0 +1,92 @@
+"""Бэкенды разбора HTML дают одинаковый результат"""
+
+import os
+
+import pytest
+
+import parsing
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fixtures")
+BACKENDS = list(parsing.BACKENDS)
+
+
+def fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+        return file.read()
+
+
+def chunks(text: str, size: int):
+    return [text[start : start + size] for start in range(0, len(text), size)]
+
+
+@pytest.fixture(scope="module")
+def list_html():
+    return fixture("payment_list.html")
+
+
+def test_backends_agree_on_payment_list(list_html):
+    pages = [
+        parsing.parse_payment_list(list_html, "https://lzt.market/payment/list", name)
+        for name in BACKENDS
+    ]
+    reference = pages[0]
+    assert len(reference.payments) > 10
+    assert reference.next_url == "https://lzt.market/payment/list?page=2"
+    for page in pages[1:]:
+        assert page == reference
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_find_payment(list_html, backend):
+    page = parsing.parse_payment_list(list_html, backend=parsing.SoupBackend.name)
+    payment_id, expected = list(page.payments.items())[3]
+    assert parsing.find_payment(list_html, payment_id, backend) == expected
+    assert parsing.find_payment(list_html, "1", backend) is None
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_deposit_page(backend):
+    page = parsing.parse_deposit_page(fixture("deposit.html"), backend)
+    assert page.tokens and set(page.tokens) == {"xf_token", "service_id"}
+    assert not page.login_required
+
+    page = parsing.parse_deposit_page(fixture("deposit_login.html"), backend)
+    assert page.login_required and page.tokens is None
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_row_scanner_stops_at_payment(list_html, backend):
+    page = parsing.parse_payment_list(list_html, backend=backend)
+    payment_id, expected = list(page.payments.items())[5]
+
+    scanner = parsing.payment_row_scanner(payment_id, backend)
+    found = None
+    fed = 0
+    for chunk in chunks(list_html, 512):
+        fed += len(chunk)
+        found = scanner.feed(chunk)
+        if found:
+            break
+    assert found == expected
+    assert fed < len(list_html)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_rows_scanner_reads_whole_table(list_html, backend):
+    page = parsing.parse_payment_list(list_html, backend=backend)
+    scanner = parsing.payment_rows_scanner(backend)
+    rows = []
+    for chunk in chunks(list_html, 700):
+        scanner.feed(chunk)
+        rows.extend(scanner.drain())
+    scanner.close()
+    rows.extend(scanner.drain())
+
+    assert [info.payment_id for info in rows] == list(page.payments)
+    assert rows == list(page.payments.values())
+    assert scanner.next_href == "/payment/list?page=2"
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        parsing.get_backend("html5lib")
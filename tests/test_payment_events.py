@@ -0,0 +1,131 @@
+"""События платежей: outbox, повторная доставка и дедупликация"""
+
+import hashlib
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from payment_events import (
+    EVENT_COMPLETED,
+    CallbackSink,
+    EventDispatcher,
+    EventOutbox,
+    PaymentEvent,
+    WebhookSink,
+)
+from retry import RetryPolicy
+
+NO_DELAY = RetryPolicy(max_attempts=3, base_delay=0.0, jitter=0.0)
+
+
+class FlakySink(CallbackSink):
+    """Получатель, который отказывает первые failures доставок"""
+
+    def __init__(self, failures: int = 0, name: str = "flaky") -> None:
+        super().__init__(self._receive, name)
+        self.failures = failures
+        self.attempts = 0
+        self.received = []
+
+    def _receive(self, events) -> None:
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("получатель недоступен")
+        self.received.extend(event.event_id for event in events)
+
+
+def test_failed_delivery_is_retried():
+    sink = FlakySink(failures=1)
+    events = EventDispatcher(sinks=[sink], retry_policy=NO_DELAY)
+    assert events.emit(PaymentEvent(EVENT_COMPLETED, "1"))
+
+    assert events.flush() == 0
+    assert events.outbox.counts() == {"pending": 1, "delivered": 0, "dead": 0}
+    assert events.flush() == 1
+    assert sink.received == ["1:payment.completed"]
+    assert events.outbox.counts() == {"pending": 0, "delivered": 1, "dead": 0}
+
+
+def test_delivery_stops_after_max_attempts():
+    sink = FlakySink(failures=10)
+    events = EventDispatcher(sinks=[sink], retry_policy=NO_DELAY)
+    events.emit(PaymentEvent(EVENT_COMPLETED, "1"))
+    for _ in range(5):
+        events.flush()
+    assert sink.attempts == NO_DELAY.max_attempts
+    assert events.outbox.counts()["dead"] == 1
+
+
+def test_undelivered_events_survive_restart(tmp_path):
+    path = str(tmp_path / "events.db")
+    events = EventDispatcher(
+        EventOutbox(path), sinks=[FlakySink(failures=1)], retry_policy=NO_DELAY
+    )
+    events.emit(PaymentEvent(EVENT_COMPLETED, "1"))
+    events.flush()
+    events.outbox.close()
+
+    sink = FlakySink()
+    events = EventDispatcher(EventOutbox(path), sinks=[sink], retry_policy=NO_DELAY)
+    assert events.flush() == 1
+    assert sink.received == ["1:payment.completed"]
+    events.outbox.close()
+
+
+def test_repeated_transition_is_one_event():
+    sink = FlakySink()
+    events = EventDispatcher(sinks=[sink])
+    assert events.emit(PaymentEvent(EVENT_COMPLETED, "1"))
+    assert not events.emit(PaymentEvent(EVENT_COMPLETED, "1"))
+    events.flush()
+    assert not events.emit(PaymentEvent(EVENT_COMPLETED, "1"))
+    assert sink.received == ["1:payment.completed"]
+
+
+def test_client_emits_completed_once(server, make_client):
+    sink = FlakySink()
+    events = EventDispatcher(sinks=[sink], linger=0.0)
+    client = make_client(events=events)
+    payment_id = client.create_payment(100, "card").payment_id
+    for _ in range(3):
+        assert client.check_payment(payment_id).is_paid
+    events.start()
+    events.stop()
+    assert sink.received == [f"{payment_id}:payment.completed"]
+
+
+def test_webhook_is_signed_and_retried_on_error_status():
+    received = []
+    statuses = [503, 200]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((body, self.headers.get("X-Lolz-Signature")))
+            self.send_response(statuses.pop(0))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args) -> None:
+            pass
+
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{httpd.server_address[1]}/hook"
+        sink = WebhookSink(url, secret="secret")
+        events = EventDispatcher(sinks=[sink], retry_policy=NO_DELAY)
+        events.emit(PaymentEvent(EVENT_COMPLETED, "1"))
+        assert events.flush() == 0
+        assert events.flush() == 1
+        sink.close()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert len(received) == 2
+    body, signature = received[-1]
+    digest = hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+    assert signature == f"sha256={digest}"
+    assert json.loads(body)["events"][0]["event_id"] == "1:payment.completed"
@@ -0,0 +1,74 @@
+"""Выгрузка истории платежей с контрольной точкой"""
+
+import csv
+import json
+import os
+
+import pytest
+
+
+@pytest.fixture
+def history(make_server, make_client, tmp_path):
+    server = make_server(rows=250, page_size=100)
+    return server, make_client(base_url=server.url), tmp_path
+
+
+def csv_ids(path) -> list:
+    with open(path, newline="", encoding="utf-8") as file:
+        return [row["payment_id"] for row in csv.DictReader(file)]
+
+
+def test_full_export(history):
+    server, client, tmp_path = history
+    output = tmp_path / "payments.csv"
+    summary = client.export_payments(str(output), prefetch=2)
+
+    assert summary.complete and not summary.error
+    assert (summary.rows, summary.pages) == (250, 3)
+    ids = csv_ids(output)
+    assert ids == [str(48000249 - index) for index in range(250)]
+
+
+def test_interrupted_export_resumes_without_duplicates(history):
+    server, client, tmp_path = history
+    output = str(tmp_path / "payments.csv")
+    checkpoint = str(tmp_path / "export.json")
+
+    first = client.export_payments(output, checkpoint=checkpoint, max_pages=1)
+    assert not first.complete and first.rows == 100
+    with open(checkpoint, encoding="utf-8") as file:
+        assert json.load(file)["rows"] == 100
+
+    # Новые платежи сдвигают уже выгруженные строки на следующие страницы
+    for _ in range(5):
+        client.create_payment(100, "card")
+    second = client.export_payments(output, checkpoint=checkpoint)
+
+    assert second.resumed and second.complete
+    assert second.rows == 250 and second.duplicates == 5
+    assert not os.path.exists(checkpoint)
+    ids = csv_ids(output)
+    assert ids == [str(48000249 - index) for index in range(250)]
+
+
+def test_checkpoint_of_other_export_is_rejected(history):
+    server, client, tmp_path = history
+    checkpoint = str(tmp_path / "export.json")
+    client.export_payments(str(tmp_path / "a.csv"), checkpoint=checkpoint, max_pages=1)
+    summary = client.export_payments(str(tmp_path / "b.csv"), checkpoint=checkpoint)
+    assert summary.error and summary.rows == 0
+
+
+def test_since_stops_reading_and_jsonl(history):
+    server, client, tmp_path = history
+    since = client.check_payment("48000239").created_at
+    output = tmp_path / "payments.jsonl"
+    summary = client.export_payments(str(output), since=since)
+
+    assert summary.complete and summary.pages == 1
+    with open(output, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file]
+    assert [record["payment_id"] for record in records] == [
+        str(48000249 - index) for index in range(11)
+    ]
+    assert all(record["amount_kopecks"] > 0 for record in records)
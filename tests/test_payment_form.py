@@ -0,0 +1,78 @@
+"""Шаблоны формы создания платежа совпадают с urlencode словаря формы"""
+
+from urllib.parse import parse_qs, urlencode
+
+import pytest
+
+from payment_form import MAX_TEMPLATES, PaymentForms, PaymentFormTemplate
+
+BASE_URL = "https://lzt.market"
+TOKENS = {"service_id": "12", "xf_token": "1760700000,a+b/c=="}
+
+
+def form_data(amount, method: str, phone: str = "") -> dict:
+    """Тело формы в том виде, в котором его отправлял requests (data=dict)"""
+    return {
+        "currency": "rub",
+        "amount": str(amount),
+        "method": method,
+        "extra[phone]": phone,
+        "service_type": "refill-balance",
+        "service_id": TOKENS["service_id"],
+        "redirect": f"{BASE_URL}/",
+        "_xfConfirm": "1",
+        "_xfToken": TOKENS["xf_token"],
+        "_xfRequestUri": "/payment/balance/deposit",
+        "_xfNoRedirect": "1",
+        "_xfResponseType": "json",
+    }
+
+
+@pytest.mark.parametrize(
+    "amount, method, phone",
+    [
+        (100, "Paymentlnk_Card", ""),
+        (150.5, "Paymentlnk_Sbp", "+79990000000"),
+        (1e21, "Settlepay_Binance", ""),
+    ],
+)
+def test_render_matches_urlencode(amount, method, phone):
+    template = PaymentFormTemplate(
+        BASE_URL, method, TOKENS["service_id"], TOKENS["xf_token"]
+    )
+    expected = urlencode(form_data(amount, method, phone)).encode("ascii")
+    assert template.render(amount, phone or None) == expected
+
+
+def test_client_sends_the_same_form(server, client, monkeypatch):
+    bodies = []
+    request = client.session.request
+
+    def record(method, url, **kwargs):
+        if method == "POST":
+            bodies.append(kwargs["data"])
+        return request(method, url, **kwargs)
+
+    monkeypatch.setattr(client.session, "request", record)
+    assert client.create_payment(250, "sbp", "+79990000000").payment_id
+
+    tokens = client.token_cache.peek(client._token_key).tokens
+    expected = form_data(250, "Paymentlnk_Sbp", "+79990000000")
+    expected.update(
+        redirect=f"{server.url}/",
+        service_id=tokens["service_id"],
+        _xfToken=tokens["xf_token"],
+    )
+    assert bodies == [urlencode(expected).encode("ascii")]
+
+
+def test_templates_are_reused_and_bounded():
+    forms = PaymentForms(BASE_URL)
+    template = forms.get("Paymentlnk_Card", TOKENS)
+    assert forms.get("Paymentlnk_Card", dict(TOKENS)) is template
+    assert forms.get("Paymentlnk_Sbp", TOKENS) is not template
+
+    for index in range(MAX_TEMPLATES + 1):
+        forms.get("Paymentlnk_Card", {**TOKENS, "xf_token": str(index)})
+    assert len(forms._templates) <= MAX_TEMPLATES
+    assert parse_qs(template.render(10).decode())["_xfToken"] == [TOKENS["xf_token"]]
@@ -0,0 +1,138 @@
+"""HTTP-сервис платежей поверх фейкового сервера"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import lolz_cli
+import payment_service
+from payment_service import PaymentService
+
+
+@pytest.fixture
+def service(client):
+    service = PaymentService(client)
+    httpd = service.tcp_server("127.0.0.1", 0)
+    thread = threading.Thread(target=service.serve, args=(httpd,), daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    service.url = f"http://{host}:{port}"
+    yield service
+    service.stop()
+    thread.join(10)
+
+
+def call(service, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(service.url + path, data=data, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_create_and_check(service):
+    status, created = call(
+        service, "POST", "/payments", {"amount": 100, "payment_method": "card"}
+    )
+    assert status == 201
+    status, info = call(service, "GET", f"/payments/{created['payment_id']}")
+    assert status == 200
+    assert info["payment_id"] == created["payment_id"]
+    assert info["is_paid"] is True
+
+
+def test_cli_check_through_service(service, server, capsys):
+    server.state.pay_after = -1
+    _, created = call(
+        service, "POST", "/payments", {"amount": 100, "payment_method": "card"}
+    )
+    args = argparse.Namespace(service=service.url, id=created["payment_id"])
+    assert lolz_cli.check_payment(args) == 0
+    assert "Оплачен: Нет" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("wait", ["nan", "inf", "-inf", "abc"])
+def test_non_finite_wait_is_rejected(service, wait):
+    status, body = call(service, "GET", f"/payments/48000001?wait={wait}")
+    assert status == 400
+    assert "wait" in body["error"]
+
+
+def test_wait_bounds_watch_timeout(service, server, monkeypatch):
+    server.state.pay_after = 3600
+    _, created = call(
+        service, "POST", "/payments", {"amount": 100, "payment_method": "card"}
+    )
+    timeouts = []
+    watch = service.watcher.watch
+
+    def spy(payment_id, *args, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        return watch(payment_id, *args, timeout=timeout, **kwargs)
+
+    monkeypatch.setattr(service.watcher, "watch", spy)
+
+    started = time.monotonic()
+    status, info = call(service, "GET", f"/payments/{created['payment_id']}?wait=0.3")
+    assert status == 200
+    assert time.monotonic() - started < 5
+    assert timeouts == [0.3]
+
+    monkeypatch.setattr(payment_service, "MAX_WAIT", 0.2)
+    call(service, "GET", f"/payments/{created['payment_id']}?wait=1e9")
+    assert timeouts[-1] == 0.2
+
+
+def test_stop_does_not_wait_for_pending_waits(client, server):
+    server.state.pay_after = -1
+    payment_id = client.create_payment(100, "card").payment_id
+    service = PaymentService(client)
+    httpd = service.tcp_server("127.0.0.1", 0)
+    thread = threading.Thread(target=service.serve, args=(httpd,), daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    service.url = f"http://{host}:{port}"
+
+    responses = []
+    waiter = threading.Thread(
+        target=lambda: responses.append(
+            call(service, "GET", f"/payments/{payment_id}?wait=60")
+        )
+    )
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while not len(service.watcher) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    started = time.monotonic()
+    service.stop()
+    thread.join(10)
+    waiter.join(10)
+    assert time.monotonic() - started < 5
+    assert responses[0][0] == 200
+    assert responses[0][1]["payment_id"] == payment_id
+
+
+def test_batch_workers_are_capped(service, monkeypatch):
+    used = []
+    create_payments = service.client.create_payments
+
+    def spy(requests, max_workers):
+        used.append(max_workers)
+        return create_payments(requests, max_workers=max_workers)
+
+    monkeypatch.setattr(service.client, "create_payments", spy)
+    body = {
+        "requests": [{"amount": 100, "payment_method": "card"}],
+        "max_workers": 10**6,
+    }
+    status, _ = call(service, "POST", "/payments/batch", body)
+    assert status == 200
+    assert used == [payment_service.MAX_BATCH_WORKERS]
@@ -0,0 +1,53 @@
+"""Инкрементальная синхронизация списка платежей"""
+
+import time
+
+import pytest
+
+
+@pytest.fixture
+def synced(make_server, make_client):
+    server = make_server(rows=250, page_size=100)
+    client = make_client(base_url=server.url)
+    client.payment_sync.pending_window = 5
+    first = client.sync_payments()
+    return server, client, first
+
+
+def mark_paid(server, payment_id: str) -> None:
+    with server.state.lock:
+        for index, row in enumerate(server.state.payments):
+            if row[0] == int(payment_id):
+                server.state.payments[index] = row[:4] + (time.time(),)
+
+
+def test_first_sync_returns_whole_history(synced):
+    server, client, first = synced
+    assert len(first.new) == 250 and not first.changed
+    assert first.pages == 3
+    assert client.payment_sync.high_water_id == 48000249
+    assert len(client.payment_sync.pending) == 5
+
+
+def test_unchanged_list_stops_early(synced):
+    server, client, _ = synced
+    lists = len(server.paths("/payment/list"))
+    diff = client.sync_payments()
+    assert not diff
+    assert diff.pages == 1 and diff.rows_scanned < 20
+    assert len(server.paths("/payment/list")) == lists + 1
+
+
+def test_new_and_changed_payments(synced):
+    server, client, _ = synced
+    server.state.pay_after = -1
+    created = client.create_payment(100, "card").payment_id
+    pending_id = min(client.payment_sync.pending, key=int)
+    mark_paid(server, pending_id)
+
+    diff = client.sync_payments()
+    assert [info.payment_id for info in diff.new] == [created]
+    assert [info.payment_id for info in diff.changed] == [pending_id]
+    assert diff.changed[0].is_paid
+    assert pending_id not in client.payment_sync.pending
+    assert created in client.payment_sync.pending
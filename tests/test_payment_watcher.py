@@ -0,0 +1,83 @@
+"""Наблюдение за многими платежами одним опросом списка"""
+
+import time
+
+from payment_watcher import (
+    WATCH_COMPLETED,
+    WATCH_TIMEOUT,
+    PaymentWatcher,
+    PollSchedule,
+)
+
+
+def test_one_list_request_per_tick(server, client):
+    server.state.pay_after = -1
+    pending = [client.create_payment(100, "card").payment_id for _ in range(5)]
+    server.state.pay_after = 0
+    paid = client.create_payment(100, "card").payment_id
+
+    results = []
+    watcher = PaymentWatcher(client, on_result=results.append)
+    futures = {payment_id: watcher.watch(payment_id) for payment_id in pending}
+    futures[paid] = watcher.watch(paid)
+    lists = len(server.paths("/payment/list"))
+
+    finished = watcher.tick()
+    assert len(server.paths("/payment/list")) == lists + 1
+    assert [result.payment_id for result in finished] == [paid]
+    assert futures[paid].result(0).status == WATCH_COMPLETED
+    assert results == finished
+    assert sorted(watcher.watched_ids()) == sorted(pending)
+
+    # Следующая проверка - по расписанию, а не на каждом такте
+    assert watcher.tick() == []
+    assert len(server.paths("/payment/list")) == lists + 1
+
+
+def test_unpaid_payment_times_out(server, client):
+    server.state.pay_after = -1
+    payment_id = client.create_payment(100, "card").payment_id
+    with PaymentWatcher(client, tick_interval=0.05) as watcher:
+        result = watcher.watch(payment_id, timeout=0.2).result(5)
+    assert result.status == WATCH_TIMEOUT
+    assert result.payment_info.payment_id == payment_id
+    assert len(watcher) == 0
+
+
+def test_background_thread_completes_future(server, client):
+    server.state.pay_after = 0.3
+    payment_id = client.create_payment(100, "card").payment_id
+    schedule = PollSchedule(base_interval=0.1)
+    started = time.monotonic()
+    with PaymentWatcher(client, schedule=schedule, tick_interval=0.05) as watcher:
+        result = watcher.watch(payment_id, timeout=10).result(10)
+    assert result.status == WATCH_COMPLETED
+    assert result.payment_info.is_paid
+    assert time.monotonic() - started < 5
+
+
+def test_repeated_watch_keeps_callbacks_and_later_deadline(server, client):
+    server.state.pay_after = -1
+    payment_id = client.create_payment(100, "card").payment_id
+    first, second = [], []
+    watcher = PaymentWatcher(client)
+    future = watcher.watch(payment_id, timeout=0, callback=first.append)
+    assert watcher.watch(payment_id, timeout=0.3, callback=second.append) is future
+
+    # Первый срок уже истек, но действует более поздний
+    assert watcher.tick() == []
+    assert watcher.watched_ids() == [payment_id]
+
+    time.sleep(0.35)
+    [result] = watcher.tick()
+    assert result.status == WATCH_TIMEOUT
+    assert first == second == [result]
+    assert future.result(0) is result
+
+
+def test_poll_interval_grows_with_age_and_method():
+    schedule = PollSchedule(base_interval=5, max_interval=120, doubling_age=300)
+    assert schedule.interval(0) == 5
+    assert schedule.interval(300) == 10
+    assert schedule.interval(300, "steam") == 30
+    assert schedule.interval(10_000) == 120
@@ -0,0 +1,85 @@
+"""Ведра токенов и адаптивный лимит одновременных запросов"""
+
+import asyncio
+import threading
+import time
+
+from rate_limiter import BUDGET_LIST, AdaptiveConcurrency, RateLimiter, TokenBucket
+
+
+def test_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=20.0, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    delay = bucket.reserve()
+    assert 0.04 < delay <= 0.05
+    assert bucket.waits == 1
+
+    started = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    # Долг ведра: 5 запросов сверх всплеска по 1/20 с
+    assert time.monotonic() - started >= 0.15
+
+
+def test_aimd_limit():
+    concurrency = AdaptiveConcurrency(initial=4, maximum=5, cooldown=60)
+    for _ in range(8):
+        concurrency.acquire()
+        concurrency.release(200, 0.01)
+    assert 5 - 1e-9 <= concurrency.limit <= 5
+
+    concurrency.acquire()
+    concurrency.release(429, 0.01)
+    assert concurrency.limit == 2.5
+    # Снижение не чаще раза в cooldown
+    concurrency.acquire()
+    concurrency.release(503, 0.01)
+    assert concurrency.limit == 2.5
+    assert concurrency.throttled == 2
+
+
+def test_concurrency_blocks_over_limit():
+    concurrency = AdaptiveConcurrency(initial=1)
+    concurrency.acquire()
+    entered = threading.Event()
+
+    def worker():
+        concurrency.acquire()
+        entered.set()
+        concurrency.release(200, 0.01)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert not entered.wait(0.1)
+    concurrency.release(200, 0.01)
+    assert entered.wait(5)
+    thread.join()
+    assert concurrency.in_flight == 0
+
+
+def test_async_waiters_are_woken():
+    limiter = RateLimiter({}, AdaptiveConcurrency(initial=2, maximum=2))
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        await limiter.acquire_async(None)
+        peak = max(peak, limiter.concurrency.in_flight)
+        await asyncio.sleep(0.01)
+        limiter.release(200, 0.01)
+
+    async def main():
+        await asyncio.wait_for(asyncio.gather(*(request() for _ in range(10))), 5)
+
+    asyncio.run(main())
+    assert peak == 2
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_client_respects_list_budget(server, make_client):
+    client = make_client(rate_limiter=RateLimiter({BUDGET_LIST: (10.0, 1)}))
+    started = time.monotonic()
+    for _ in range(4):
+        assert client.check_payment("48000019")
+    assert time.monotonic() - started >= 0.25
+    assert client.rate_limiter.stats()["budgets"][BUDGET_LIST]["waits"] == 3
@@ -0,0 +1,78 @@
+"""Кэш GET-страниц: свежие ответы, условный перезапрос и общая загрузка"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from response_cache import (
+    CACHE_COALESCED,
+    CACHE_HIT,
+    CACHE_MISS,
+    CACHE_REVALIDATED,
+    CachedPage,
+    ResponseCache,
+)
+
+
+def test_fresh_page_is_served_without_request(server, make_client):
+    client = make_client(response_cache=ResponseCache(ttl=60))
+    payment_id = client.create_payment(100, "card").payment_id
+    lists = len(server.paths("/payment/list"))
+
+    for _ in range(3):
+        assert client.check_payment(payment_id).payment_id == payment_id
+    assert len(server.paths("/payment/list")) == lists + 1
+    assert client.response_cache.stats()[CACHE_HIT] == 2
+
+
+def test_stale_page_is_revalidated_with_etag(server, make_client):
+    client = make_client(response_cache=ResponseCache(ttl=0))
+    payment_id = client.create_payment(100, "card").payment_id
+
+    first = client.check_payment(payment_id)
+    sent = server.state.bytes_sent
+    second = client.check_payment(payment_id)
+
+    assert second == first
+    assert client.response_cache.stats()[CACHE_REVALIDATED] == 1
+    # Ответ 304 без тела страницы
+    assert server.statuses[-1] == 304
+    assert server.state.bytes_sent - sent < 100
+
+
+def test_created_payment_invalidates_list(server, make_client):
+    client = make_client(response_cache=ResponseCache(ttl=60))
+    first = client.create_payment(100, "card").payment_id
+    assert client.check_payment(first)
+    second = client.create_payment(200, "card").payment_id
+    assert client.check_payment(second).payment_id == second
+
+
+def test_concurrent_requests_share_one_fetch():
+    cache = ResponseCache(ttl=60)
+    calls = []
+
+    def fetch(validators):
+        calls.append(validators)
+        time.sleep(0.1)
+        return CachedPage(200, "page", etag='"1"')
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: cache.get("key", fetch), range(4)))
+
+    assert len(calls) == 1
+    outcomes = sorted(outcome for _, outcome in results)
+    assert outcomes == [CACHE_COALESCED] * 3 + [CACHE_MISS]
+    assert {page.text for page, _ in results} == {"page"}
+
+
+def test_errors_are_not_cached_and_entries_are_bounded():
+    cache = ResponseCache(ttl=60, max_entries=2)
+    page, _ = cache.get("key", lambda validators: CachedPage(503, ""))
+    assert page.status_code == 503
+    assert cache.stats()["entries"] == 0
+
+    for key in ("a", "b", "c"):
+        cache.get(key, lambda validators: CachedPage(200, key))
+    assert cache.stats()["entries"] == 2
+    _, outcome = cache.get("a", lambda validators: CachedPage(200, "a"))
+    assert outcome == CACHE_MISS
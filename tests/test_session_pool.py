@@ -0,0 +1,23 @@
+"""Общий пул соединений LolzPayment (requests.Session)"""
+
+
+def test_checks_reuse_one_connection(server, client):
+    payment_ids = [str(48000000 + index) for index in range(15, 20)]
+    for payment_id in payment_ids:
+        assert client.check_payment(payment_id).payment_id == payment_id
+
+    assert len(server.paths("/payment/list")) == len(payment_ids)
+    assert server.connections == 1
+
+
+def test_keep_alive_disabled_opens_connection_per_request(server, make_client):
+    client = make_client(keep_alive=False)
+    for _ in range(3):
+        assert client.check_payment("48000019")
+
+    assert server.connections == 3
+
+
+def test_session_is_created_once(client):
+    assert client.session is client.session
+    client.close()
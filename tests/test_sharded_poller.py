@@ -0,0 +1,51 @@
+"""Опрос платежей несколькими процессами"""
+
+import time
+
+from ledger import STATUS_COMPLETED, STATUS_PENDING, PaymentLedger
+from sharded_poller import HashRing, ShardedPoller
+
+
+def test_hash_ring_moves_few_keys():
+    keys = [f"account{i}" for i in range(1000)]
+    before = HashRing(range(4))
+    after = HashRing(range(5))
+    moved = sum(before.node_for(key) != after.node_for(key) for key in keys)
+    # При hash % n переехало бы около 80% ключей
+    assert moved < 350
+    assert {before.node_for(key) for key in keys} == {0, 1, 2, 3}
+
+
+def test_poller_updates_recent_pending_payments(
+    server, client, cookies_path, tmp_path
+):
+    fresh = client.create_payment(100, "card").payment_id
+    old = client.create_payment(200, "card").payment_id
+    ledger_path = str(tmp_path / "payments.db")
+    with PaymentLedger(ledger_path) as ledger:
+        ledger.watch(fresh, client.account_name)
+        ledger.watch(old, client.account_name)
+        with ledger._conn:
+            ledger._conn.execute(
+                "UPDATE payments SET created_at = ? WHERE payment_id = ?",
+                (time.time() - 2 * 86400, old),
+            )
+
+    poller = ShardedPoller(
+        [cookies_path],
+        ledger_path,
+        processes=1,
+        poll_interval=0.1,
+        max_age=86400,
+        rate_budgets={},
+        base_url=server.url,
+    )
+    with poller:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if poller.ledger.get(fresh).status == STATUS_COMPLETED:
+                break
+            time.sleep(0.1)
+        assert poller.status(fresh).is_paid
+        assert poller.ledger.get(old).status == STATUS_PENDING
+        assert poller.stats()[0]["checked"] >= 1
@@ -0,0 +1,46 @@
+"""Потоковая проверка платежа: чтение списка до строки платежа"""
+
+import pytest
+
+from metrics import Metrics, PrometheusRegistry
+
+
+@pytest.fixture
+def big_page(make_server, make_client):
+    server = make_server(rows=100, page_size=100)
+
+    def make(**kwargs):
+        registry = PrometheusRegistry()
+        client = make_client(base_url=server.url, metrics=Metrics(registry), **kwargs)
+        return client, registry
+
+    return make
+
+
+def list_bytes(registry: PrometheusRegistry) -> float:
+    return registry.value("http_bytes", budget="list")
+
+
+def test_streamed_check_matches_full_page(big_page):
+    client, registry = big_page(stream_chunk_size=2048)
+    full = client.check_payment("48000098", stream=False)
+    full_bytes = list_bytes(registry)
+
+    streamed = client.check_payment("48000098", stream=True)
+    assert streamed == full
+    assert list_bytes(registry) - full_bytes < full_bytes / 4
+
+
+def test_small_chunks_split_multibyte_characters(big_page):
+    client, _ = big_page(stream_list=True, stream_chunk_size=7)
+    expected = client.check_payment("48000050", stream=False)
+    assert client.check_payment("48000050") == expected
+    assert "₽" in expected.amount
+
+
+def test_missing_payment_reads_whole_page(big_page):
+    client, registry = big_page(stream_list=True, stream_chunk_size=2048)
+    assert client.check_payment("1") is None
+    streamed_bytes = list_bytes(registry)
+    assert client.check_payment("1", stream=False) is None
+    assert list_bytes(registry) == 2 * streamed_bytes
@@ -0,0 +1,77 @@
+"""Кэш токенов депозита: срок жизни и единственная загрузка на ключ"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from token_cache import TokenCache
+
+TOKENS = {"xf_token": "token", "service_id": "1"}
+
+
+def test_concurrent_get_fetches_once():
+    cache = TokenCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return dict(TOKENS)
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(cache.get, "key", fetch) for _ in range(8)]
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert results == [TOKENS] * 8
+    assert cache.get("key", fetch) == TOKENS
+    assert len(calls) == 1
+
+
+def test_failed_fetch_is_not_cached_and_ttl_expires():
+    cache = TokenCache(ttl=0.05)
+    assert cache.get("key", lambda: None) is None
+    assert cache.peek("key") is None
+
+    assert cache.get("key", lambda: dict(TOKENS)) == TOKENS
+    assert cache.peek("key").tokens == TOKENS
+    time.sleep(0.1)
+    assert cache.peek("key") is None
+    assert cache.get("key", lambda: {"xf_token": "new"}) == {"xf_token": "new"}
+
+
+def test_invalidate_keeps_newer_tokens():
+    cache = TokenCache()
+    cache.put("key", {"xf_token": "new"})
+    cache.invalidate("key", {"xf_token": "old"})
+    assert cache.peek("key").tokens == {"xf_token": "new"}
+    cache.invalidate("key")
+    assert cache.peek("key") is None
+
+
+def test_concurrent_aget_fetches_once():
+    cache = TokenCache()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return dict(TOKENS)
+
+    async def main():
+        return await asyncio.gather(*(cache.aget("key", fetch) for _ in range(8)))
+
+    assert asyncio.run(main()) == [TOKENS] * 8
+    assert len(calls) == 1
+    assert cache.peek("key").tokens == TOKENS
+
+
+def test_client_loads_deposit_page_once(server, make_client):
+    server.state.latency = 0.05
+    client = make_client()
+    with ThreadPoolExecutor(4) as pool:
+        responses = list(
+            pool.map(lambda _: client.create_payment(100, "card"), range(4))
+        )
+    assert all(response.payment_id for response in responses)
+    assert len(server.paths("/payment/balance/deposit")) == 1
@@ -0,0 +1,75 @@
+"""Фоновое обновление токенов и ожидаемый срок их жизни"""
+
+import time
+
+from token_cache import TokenCache
+from token_refresher import TokenRefresher
+
+TOKENS = {"xf_token": "token", "service_id": "1"}
+
+
+def test_lifetime_is_median_of_rejections_capped_by_ttl():
+    cache = TokenCache(ttl=300)
+    assert cache.lifetime() == 300
+    for fetched_ago in (100, 120, 5):
+        cache.put("key", dict(TOKENS))
+        cache._entries["key"].fetched_at -= fetched_ago
+        cache.rejected("key", TOKENS)
+    # Случайный ранний отказ (5 с) медиану почти не сдвигает
+    assert 99 < cache.lifetime() < 101
+
+    # Повторный отказ уже удаленной записи - не новое наблюдение
+    cache.rejected("key", TOKENS)
+    assert len(cache._lifetimes) == 3
+
+
+def test_refresh_keeps_serving_old_tokens():
+    cache = TokenCache()
+    cache.put("key", dict(TOKENS))
+    served = []
+
+    def fetch():
+        served.append(cache.get("key", lambda: None))
+        return {"xf_token": "new", "service_id": "1"}
+
+    assert cache.refresh("key", fetch)["xf_token"] == "new"
+    assert served == [TOKENS]
+    assert cache.peek("key").tokens["xf_token"] == "new"
+    assert cache.refresh("key", lambda: None) is None
+    assert cache.peek("key").tokens["xf_token"] == "new"
+
+
+def test_next_delay(client):
+    refresher = TokenRefresher(
+        client, refresh_ratio=0.5, min_interval=1, check_interval=60
+    )
+    assert refresher.next_delay() == 0.0
+    client.warm_up()
+    assert 59 < refresher.next_delay() <= 60
+
+    client.token_cache.ttl = 10
+    assert 4.9 < refresher.next_delay() <= 5
+    refresher.failures = 3
+    assert refresher.next_delay() == 4
+
+
+def test_background_refresh_replaces_tokens(server, make_client):
+    client = make_client(token_ttl=0.5)
+    assert client.warm_up()
+    deposits = len(server.paths("/payment/balance/deposit"))
+    with TokenRefresher(client, min_interval=0.05, check_interval=0.1) as refresher:
+        deadline = time.monotonic() + 10
+        while refresher.refreshes < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    assert refresher.refreshes >= 2
+    assert len(server.paths("/payment/balance/deposit")) >= deposits + 2
+    assert client.token_cache.peek(client._token_key)
+
+
+def test_refresh_detects_expired_session(server, make_client, make_cookies):
+    server.state.login_required = {"expired"}
+    client = make_client(make_cookies("expired"))
+    refresher = TokenRefresher(client)
+    assert not refresher.refresh()
+    assert client.authorized is False
+    assert refresher.failures == 1
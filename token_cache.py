@@ -0,0 +1,213 @@
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+@dataclass
+class TokenEntry:
+    tokens: Dict[str, str]
+    fetched_at: float
+    expires_at: float
+
+
+@dataclass
+class _Flight:
+    """Запрос токенов, который уже выполняется одним из потоков"""
+
+    event: threading.Event = field(default_factory=threading.Event)
+    result: Optional[Dict[str, str]] = None
+
+
+class TokenCache:
+    """
+    Кэш токенов xf_token/service_id, привязанный к набору cookies.
+    Одновременные запросы с одним ключом ждут единственную загрузку
+    со страницы депозита вместо того, чтобы запускать каждый свою.
+    """
+
+    def __init__(self, ttl: float = 300.0, lifetime_samples: int = 16) -> None:
+        """
+        Args:
+            ttl: Время жизни токенов в секундах
+            lifetime_samples: Сколько последних наблюдений срока жизни токенов
+                (от загрузки до отказа сервера) учитывается в lifetime()
+        """
+        self.ttl = ttl
+        self._lifetimes: Deque[float] = deque(maxlen=lifetime_samples)
+        self._entries: Dict[str, TokenEntry] = {}
+        self._inflight: Dict[str, _Flight] = {}
+        self._async_inflight: Dict[Tuple[int, str], "asyncio.Future"] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cookie_key(cookies: Dict[str, str]) -> str:
+        """Ключ кэша по содержимому cookies"""
+        raw = json.dumps(cookies, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def peek(self, key: str) -> Optional[TokenEntry]:
+        """Актуальная запись без загрузки"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry.expires_at > time.monotonic():
+            return entry
+        return None
+
+    def get(
+        self, key: str, fetch: Callable[[], Optional[Dict[str, str]]]
+    ) -> Optional[Dict[str, str]]:
+        """
+        Получение токенов из кэша или загрузка через fetch.
+
+        Args:
+            key: Ключ cookies (см. cookie_key)
+            fetch: Функция загрузки токенов, возвращает None при ошибке
+
+        Returns:
+            Optional[Dict[str, str]]: Токены или None, если загрузить не удалось
+        """
+        return self._fetch(key, fetch, cached=True)
+
+    def refresh(
+        self, key: str, fetch: Callable[[], Optional[Dict[str, str]]]
+    ) -> Optional[Dict[str, str]]:
+        """
+        Загрузка новых токенов на замену действующим. Пока загрузка идет,
+        get продолжает отдавать прежние токены; при ошибке они остаются в кэше
+        до истечения срока.
+        """
+        return self._fetch(key, fetch)
+
+    def _fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Optional[Dict[str, str]]],
+        cached: bool = False,
+    ) -> Optional[Dict[str, str]]:
+        """
+        Загрузка токенов (одна на ключ, остальные потоки ждут ее результат).
+        С cached=True действующие токены из кэша возвращаются без загрузки.
+        """
+        with self._lock:
+            if cached:
+                # Проверка под той же блокировкой, что и запуск загрузки:
+                # иначе поток, опоздавший к завершенной загрузке, начал бы новую
+                entry = self._entries.get(key)
+                if entry and entry.expires_at > time.monotonic():
+                    return entry.tokens
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+
+        if not leader:
+            flight.event.wait()
+            return flight.result
+
+        tokens = None
+        try:
+            tokens = fetch()
+        finally:
+            self._finish(key, flight, tokens)
+        return tokens
+
+    async def aget(
+        self, key: str, fetch: Callable[[], Awaitable[Optional[Dict[str, str]]]]
+    ) -> Optional[Dict[str, str]]:
+        """
+        Асинхронный вариант get: одновременные корутины одного цикла событий
+        ждут одну загрузку.
+
+        Args:
+            key: Ключ cookies (см. cookie_key)
+            fetch: Корутинная функция загрузки токенов
+        """
+        entry = self.peek(key)
+        if entry:
+            return entry.tokens
+
+        import asyncio
+
+        flight_key = (id(asyncio.get_running_loop()), key)
+        task = self._async_inflight.get(flight_key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._async_inflight[flight_key] = task
+            task.add_done_callback(
+                lambda done: self._finish_async(flight_key, done)
+            )
+        # shield: отмена одного ожидающего не отменяет общую загрузку
+        return await asyncio.shield(task)
+
+    def put(self, key: str, tokens: Dict[str, str]) -> None:
+        """Сохранение токенов в кэш"""
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = TokenEntry(tokens, now, now + self.ttl)
+
+    def invalidate(self, key: str, tokens: Optional[Dict[str, str]] = None) -> None:
+        """
+        Удаление токенов из кэша.
+
+        Args:
+            key: Ключ cookies
+            tokens: Если указаны, запись удаляется только когда она совпадает
+                с ними (чтобы не сбросить уже обновленные другим потоком токены)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and (tokens is None or entry.tokens == tokens):
+                del self._entries[key]
+
+    def rejected(self, key: str, tokens: Dict[str, str]) -> None:
+        """
+        Сервер отклонил токены: запись удаляется, а время от ее загрузки
+        до отказа учитывается как наблюдаемый срок жизни токенов.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.tokens == tokens:
+                self._lifetimes.append(now - entry.fetched_at)
+                del self._entries[key]
+
+    def lifetime(self) -> float:
+        """
+        Ожидаемый срок жизни токенов: медиана наблюдавшихся сроков (случайный
+        ранний отказ ее почти не сдвигает), но не больше ttl
+        """
+        with self._lock:
+            observed = sorted(self._lifetimes)
+        if not observed:
+            return self.ttl
+        return min(self.ttl, observed[len(observed) // 2])
+
+    def clear(self) -> None:
+        """Очистка всего кэша"""
+        with self._lock:
+            self._entries.clear()
+
+    def _finish(
+        self, key: str, flight: _Flight, tokens: Optional[Dict[str, str]]
+    ) -> None:
+        if tokens:
+            self.put(key, tokens)
+        with self._lock:
+            self._inflight.pop(key, None)
+        flight.result = tokens
+        flight.event.set()
+
+    def _finish_async(
+        self, flight_key: Tuple[int, str], task: "asyncio.Future"
+    ) -> None:
+        self._async_inflight.pop(flight_key, None)
+        if not task.cancelled() and task.exception() is None and task.result():
+            self.put(flight_key[1], task.result())
@@ -0,0 +1,132 @@
+"""
+Фоновое обновление токенов xf_token/service_id.
+
+Без обновления первый платеж после запуска и после истечения токенов ждет
+загрузку и разбор страницы депозита. TokenRefresher загружает новые токены
+заранее, до истечения ожидаемого срока жизни (TokenCache.lifetime: ttl или
+медиана наблюдавшихся отказов сервера), и заодно проверяет, что сессия
+еще действительна: страница депозита с формой входа означает, что cookies
+устарели. Пока идет загрузка, платежи используют прежние токены.
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+
+class TokenRefresher:
+    """
+    Обновление токенов синхронного клиента в фоновом потоке.
+
+    Асинхронный клиент может пользоваться тем же обновлением, если у него
+    общий кэш токенов с синхронным клиентом того же аккаунта.
+
+    Пример:
+        lolz.warm_up()
+        with TokenRefresher(lolz):
+            ...  # create_payment не ждет загрузку токенов
+    """
+
+    def __init__(
+        self,
+        client,
+        refresh_ratio: float = 0.8,
+        min_interval: float = 5.0,
+        check_interval: float = 60.0,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        """
+        Args:
+            client: Экземпляр LolzPayment
+            refresh_ratio: Доля ожидаемого срока жизни токенов, после которой
+                они обновляются
+            min_interval: Минимальная пауза между загрузками (и первая пауза
+                перед повтором после ошибки) в секундах
+            check_interval: Максимальная пауза между проверками сессии
+                в секундах
+            logger: Опциональный логгер
+        """
+        self.client = client
+        self.refresh_ratio = refresh_ratio
+        self.min_interval = min_interval
+        self.check_interval = check_interval
+        self.logger = logger or client.logger
+        # Подряд неудачных обновлений (для паузы перед повтором)
+        self.failures = 0
+        self.refreshes = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "TokenRefresher":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Запуск фонового потока обновления"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="TokenRefresher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Остановка фонового потока"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def next_delay(self) -> float:
+        """Пауза до следующего обновления в секундах"""
+        if self.failures:
+            # Повторы после ошибок: min_interval, 2 * min_interval, ...
+            backoff = self.min_interval * 2 ** (self.failures - 1)
+            return min(backoff, self.check_interval)
+
+        cache = self.client.token_cache
+        entry = cache.peek(self.client._token_key)
+        if entry is None:
+            return 0.0
+        due = entry.fetched_at + cache.lifetime() * self.refresh_ratio
+        delay = min(due - time.monotonic(), self.check_interval)
+        return max(self.min_interval, delay)
+
+    def refresh(self) -> bool:
+        """
+        Загрузка новых токенов.
+
+        Returns:
+            bool: True, если токены получены (сессия действительна)
+        """
+        tokens = self.client._refresh_tokens()
+        self.client.metrics.count("token_refresh", result="ok" if tokens else "error")
+        if tokens:
+            self.failures = 0
+            self.refreshes += 1
+            self.logger.debug("Токены обновлены заранее")
+            return True
+
+        self.failures += 1
+        if self.client.authorized is False:
+            self.logger.error(
+                "Фоновое обновление токенов: сессия недействительна, обновите cookies"
+            )
+        else:
+            self.logger.warning(
+                f"Фоновое обновление токенов не удалось (попытка {self.failures})"
+            )
+        return False
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.next_delay()):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.failures += 1
+                self.logger.error(f"Ошибка фонового обновления токенов: {e}")